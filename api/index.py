@@ -1,124 +1,111 @@
 """
-Vercel entry point for WordPress Publisher - Simplified version
+Vercel entry point for WordPress Publisher - the full backend API
+
+Vercel imports this module once per instance and reuses it for every warm
+invocation, so module-level state (the shared HTTP session, decrypted
+profiles, taxonomy lists) carries over between requests. Storage lives
+under /tmp (see backend/main.py), which also survives within an instance.
+Heavy dependencies (aiohttp, cryptography) are imported lazily, so routes
+that don't talk to WordPress never load them.
+
+A public deployment must not expose the API (profiles, local file reads,
+metrics) to anyone: without WPP_API_TOKEN only the page, static assets and
+the health check are served, as before; with it set, every other route
+needs "Authorization: Bearer <token>" or the cookie POST /api/login sets
+for the browser UI (which asks for the token on its first 401).
 """
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.middleware.cors import CORSMiddleware
+from http.cookies import SimpleCookie
 from pathlib import Path
+import hashlib
+import hmac
+import json
 import os
+import sys
 
-# Create FastAPI app
-app = FastAPI(title="WordPress Publisher")
-
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Get base directory
-base_dir = Path(__file__).parent.parent
-
-# Mount static files if they exist
-static_path = base_dir / "static"
-if static_path.exists():
-    app.mount("/static", StaticFiles(directory=str(static_path)), name="static")
-
-# Basic HTML template
-HTML_TEMPLATE = """
-<!DOCTYPE html>
-<html lang="es">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>WordPress Publisher</title>
-    <style>
-        body {
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-            max-width: 800px;
-            margin: 0 auto;
-            padding: 20px;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-        }
-        .container {
-            background: white;
-            padding: 40px;
-            border-radius: 20px;
-            box-shadow: 0 20px 40px rgba(0,0,0,0.1);
-        }
-        h1 {
-            color: #2d3748;
-            margin-bottom: 20px;
-        }
-        .status {
-            background: #48bb78;
-            color: white;
-            padding: 10px 20px;
-            border-radius: 8px;
-            margin: 20px 0;
-        }
-        .info {
-            background: #f7fafc;
-            padding: 20px;
-            border-radius: 8px;
-            border-left: 4px solid #667eea;
-            margin: 20px 0;
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>🚀 WordPress Publisher</h1>
-        <div class="status">✅ Aplicación desplegada exitosamente en Vercel</div>
-        
-        <div class="info">
-            <h3>📁 Próximos pasos:</h3>
-            <p>Esta es la versión web simplificada de WordPress Publisher.</p>
-            <p>Para usar la aplicación completa, ejecuta el código localmente:</p>
-            <pre>cd web-app/backend && python main.py</pre>
-        </div>
-        
-        <div class="info">
-            <h3>🔗 Enlaces útiles:</h3>
-            <ul>
-                <li><a href="/api/health">Health Check</a></li>
-                <li><a href="https://github.com/ninjaseo/wordpress-publisher-web">Código en GitHub</a></li>
-            </ul>
-        </div>
-    </div>
-</body>
-</html>
-"""
+backend_dir = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(backend_dir))
+os.environ.setdefault('BASE_DIR', str(backend_dir.parent))
 
-@app.get("/", response_class=HTMLResponse)
-async def read_root():
-    """Serve the main application page"""
-    return HTMLResponse(content=HTML_TEMPLATE)
-
-@app.get("/api/health")
-async def health_check():
-    """Health check endpoint"""
-    return JSONResponse({
-        "status": "ok",
-        "message": "WordPress Publisher API is running",
-        "version": "1.0.0",
-        "deployment": "vercel"
-    })
+from main import app as backend_app  # noqa: E402
 
-@app.get("/api/info")
-async def info():
-    """App information"""
-    return JSONResponse({
-        "app": "WordPress Publisher",
-        "status": "deployed",
-        "platform": "vercel",
-        "note": "This is a simplified web version. For full functionality, run locally."
+PUBLIC_PATHS = {"/", "/api/health"}
+PUBLIC_PREFIXES = ("/static/",)
+LOGIN_PATH = "/api/login"
+LOGIN_COOKIE = "wpp_api_auth"
+LOGIN_MAX_AGE = 30 * 24 * 3600
+
+
+async def send_json(send, status: int, content: dict, headers=()):
+    body = json.dumps(content).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode('latin-1')), *headers],
     })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class TokenGuard:
+    """Let public paths through; everything else needs the API token"""
+
+    def __init__(self, app, token: str):
+        self.app = app
+        self.token = token.encode('utf-8') if token else None
+        self.expected = f"Bearer {token}".encode('latin-1') if token else None
+        # The login cookie holds a value derived from the token, not the token itself
+        self.cookie_value = (hmac.new(self.token, b"wpp-ui-login", hashlib.sha256).hexdigest()
+                             if token else None)
+
+    def _allowed(self, scope) -> bool:
+        path = scope.get('path', '')
+        if path in PUBLIC_PATHS or path.startswith(PUBLIC_PREFIXES):
+            return True
+        if self.expected is None:
+            return False
+        headers = dict(scope['headers'])
+        if hmac.compare_digest(headers.get(b'authorization', b''), self.expected):
+            return True
+        cookie = SimpleCookie(headers.get(b'cookie', b'').decode('latin-1')).get(LOGIN_COOKIE)
+        return cookie is not None and hmac.compare_digest(cookie.value, self.cookie_value)
+
+    async def _login(self, receive, send):
+        """Exchange the token (JSON {"token": ...}) for an httponly cookie"""
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        try:
+            given = str(json.loads(body or b'{}').get('token', '')).encode('utf-8')
+        except (ValueError, AttributeError):
+            given = b''
+        if not hmac.compare_digest(given, self.token):
+            await send_json(send, 401, {"detail": "Invalid API token"})
+            return
+        cookie = (f"{LOGIN_COOKIE}={self.cookie_value}; Max-Age={LOGIN_MAX_AGE}; Path=/; "
+                  f"HttpOnly; Secure; SameSite=Strict")
+        await send_json(send, 200, {"success": True}, [(b'set-cookie', cookie.encode('latin-1'))])
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        if self.token is not None and scope['path'] == LOGIN_PATH and scope['method'] == 'POST':
+            await self._login(receive, send)
+            return
+        if self._allowed(scope):
+            await self.app(scope, receive, send)
+            return
+        if self.expected is None:
+            await send_json(send, 404, {"detail": "Not available on this deployment"})
+        else:
+            await send_json(send, 401, {"detail": "Missing or invalid API token"},
+                            [(b'www-authenticate', b'Bearer')])
+
+
+app = TokenGuard(backend_app, os.environ.get('WPP_API_TOKEN', ''))
 
 # Export app for Vercel
-handler = app
\ No newline at end of file
+handler = app
@@ -0,0 +1,304 @@
+"""
+Streaming readers for ZIP and tar archives uploaded as request bodies
+
+Members are yielded one at a time while the upload is still arriving; only
+the member currently being read is held in memory.
+"""
+from typing import AsyncIterator, Optional
+import bz2
+import lzma
+import struct
+import tarfile
+import zlib
+
+MAX_MEMBER_SIZE = 50 * 1024 * 1024  # 50MB
+INFLATE_STEP = 1024 * 1024  # most bytes one decompress call may produce
+
+ZIP_LOCAL_HEADER = b'PK\x03\x04'
+ZIP_CENTRAL_HEADER = b'PK\x01\x02'
+ZIP_END_RECORD = b'PK\x05\x06'
+ZIP_DATA_DESCRIPTOR = b'PK\x07\x08'
+
+
+class ArchiveError(Exception):
+    """Raised when an uploaded archive cannot be read"""
+
+
+class ArchiveEntry:
+    """A regular file read from an archive"""
+
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self.data = data
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+
+class _ByteStream:
+    """Buffered reads over an async iterator of byte chunks.
+
+    With a decompressor (zlib, bz2 or lzma), input is inflated in steps of
+    at most INFLATE_STEP bytes and only as far as reads need, and the
+    buffer never holds more than max_buffer bytes: a tiny upload can
+    stand for gigabytes of output.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes], decompressor=None,
+                 max_buffer: int = MAX_MEMBER_SIZE + tarfile.BLOCKSIZE):
+        self._chunks = chunks.__aiter__()
+        self._decompressor = decompressor
+        self._max_buffer = max_buffer
+        self._buffer = bytearray()
+        self._eof = False
+        self._pending = b''  # zlib input not inflated yet
+        self._more = False  # the decompressor has output left without more input
+
+    def _inflate(self, data: bytes) -> bytes:
+        room = self._max_buffer - len(self._buffer)
+        if room <= 0:
+            raise ArchiveError(f"Archive needs more than {self._max_buffer // (1024*1024)}MB buffered")
+        step = min(INFLATE_STEP, room)
+        decompressor = self._decompressor
+        if hasattr(decompressor, 'unconsumed_tail'):
+            output = decompressor.decompress(self._pending + data, step)
+            self._pending = decompressor.unconsumed_tail
+            # A full step may leave output pending even after all input was taken
+            self._more = not decompressor.eof and (bool(self._pending) or len(output) == step)
+        else:
+            # bz2 and lzma keep unconsumed input themselves
+            output = decompressor.decompress(data, step)
+            self._more = not decompressor.eof and not decompressor.needs_input
+        return output
+
+    async def _fill(self) -> bool:
+        while True:
+            if self._more:
+                chunk = self._inflate(b'')
+            elif self._eof:
+                return False
+            else:
+                try:
+                    chunk = await self._chunks.__anext__()
+                except StopAsyncIteration:
+                    self._eof = True
+                    if self._decompressor is not None and hasattr(self._decompressor, 'flush'):
+                        self._buffer += self._decompressor.flush()
+                    return False
+                if self._decompressor is not None:
+                    chunk = self._inflate(chunk)
+            if chunk:
+                self._buffer += chunk
+                return True
+
+    async def peek(self, size: int) -> bytes:
+        while len(self._buffer) < size and await self._fill():
+            pass
+        return bytes(self._buffer[:size])
+
+    async def read_exactly(self, size: int) -> bytes:
+        while len(self._buffer) < size:
+            if not await self._fill():
+                raise ArchiveError("Unexpected end of archive")
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    async def read_some(self) -> bytes:
+        """Return whatever is buffered (reading more if empty); b'' at EOF"""
+        if not self._buffer:
+            await self._fill()
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+    def unread(self, data: bytes):
+        self._buffer[:0] = data
+
+
+def _check_member_size(size: int, name: str):
+    if size > MAX_MEMBER_SIZE:
+        raise ArchiveError(f"Archive member {name} exceeds {MAX_MEMBER_SIZE // (1024*1024)}MB")
+
+
+def _inflate(inflater, data: bytes, limit: int, name: str) -> bytes:
+    """Decompress data in steps, failing as soon as more than limit bytes come out.
+
+    Sizes in a ZIP header are whatever the uploader wrote there, so only
+    the bytes actually produced can be trusted.
+    """
+    parts = []
+    produced = 0
+    part = b''
+    # A full step may leave output pending even after all input was taken
+    while not inflater.eof and (data or len(part) == INFLATE_STEP):
+        part = inflater.decompress(data, INFLATE_STEP)
+        produced += len(part)
+        if produced > limit:
+            raise ArchiveError(f"Archive member {name} inflates to more than {limit} bytes")
+        parts.append(part)
+        data = inflater.unconsumed_tail
+    return b''.join(parts)
+
+
+async def iter_zip(stream: _ByteStream) -> AsyncIterator[ArchiveEntry]:
+    """Read ZIP members from their local headers, without the central directory"""
+    while True:
+        signature = await stream.peek(4)
+        if signature in (ZIP_CENTRAL_HEADER, ZIP_END_RECORD, b''):
+            return
+        if signature != ZIP_LOCAL_HEADER:
+            raise ArchiveError("Invalid ZIP local file header")
+
+        header = await stream.read_exactly(30)
+        (_, _, flags, method, _, _, crc, compressed_size, size,
+         name_length, extra_length) = struct.unpack('<4sHHHHHIIIHH', header)
+        raw_name = await stream.read_exactly(name_length)
+        extra = await stream.read_exactly(extra_length)
+        name = raw_name.decode('utf-8' if flags & 0x800 else 'cp437')
+
+        # Zip64 sizes live in the extra field
+        zip64 = False
+        offset = 0
+        while offset + 4 <= len(extra):
+            field_id, field_size = struct.unpack_from('<HH', extra, offset)
+            if field_id == 0x0001 and field_size >= 16:
+                size, compressed_size = struct.unpack_from('<QQ', extra, offset + 4)
+                zip64 = True
+            offset += 4 + field_size
+
+        if flags & 0x1:
+            raise ArchiveError(f"Encrypted ZIP member {name} is not supported")
+        if method not in (0, 8):
+            raise ArchiveError(f"Unsupported ZIP compression method {method} for {name}")
+
+        has_descriptor = bool(flags & 0x8)
+        if has_descriptor and method == 0:
+            raise ArchiveError(f"Stored ZIP member {name} without sizes cannot be streamed")
+
+        if not has_descriptor:
+            _check_member_size(size, name)
+            _check_member_size(compressed_size, name)
+            payload = await stream.read_exactly(compressed_size)
+            data = payload
+            if method == 8:
+                inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+                data = _inflate(inflater, payload, size, name)
+                if not inflater.eof:
+                    raise ArchiveError(f"Truncated ZIP member {name}")
+            if len(data) != size:
+                raise ArchiveError(f"Size mismatch for ZIP member {name}")
+        else:
+            # Inflate until the deflate stream ends, then push back the remainder
+            inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+            parts = []
+            total = 0
+            while not inflater.eof:
+                chunk = await stream.read_some()
+                if not chunk:
+                    raise ArchiveError("Unexpected end of archive")
+                part = _inflate(inflater, chunk, MAX_MEMBER_SIZE - total, name)
+                total += len(part)
+                parts.append(part)
+            stream.unread(inflater.unused_data)
+            data = b''.join(parts)
+
+            if await stream.peek(4) == ZIP_DATA_DESCRIPTOR:
+                await stream.read_exactly(4)
+            descriptor = await stream.read_exactly(20 if zip64 else 12)
+            crc = struct.unpack_from('<I', descriptor)[0]
+
+        if zlib.crc32(data) & 0xFFFFFFFF != crc:
+            raise ArchiveError(f"CRC mismatch for ZIP member {name}")
+        if not name.endswith('/'):
+            yield ArchiveEntry(name, data)
+
+
+def _tar_string(field: bytes) -> str:
+    return field.split(b'\0', 1)[0].decode('utf-8', 'replace')
+
+
+def _tar_number(field: bytes) -> int:
+    if field[:1] == b'\x80':
+        return int.from_bytes(field[1:], 'big')
+    text = field.split(b'\0', 1)[0].strip()
+    return int(text, 8) if text else 0
+
+
+async def iter_tar(stream: _ByteStream) -> AsyncIterator[ArchiveEntry]:
+    """Read tar members (ustar, GNU long names, pax paths) sequentially"""
+    long_name: Optional[str] = None
+    while True:
+        header = await stream.peek(tarfile.BLOCKSIZE)
+        if not header or header == tarfile.NUL * tarfile.BLOCKSIZE:
+            return
+        if len(header) < tarfile.BLOCKSIZE:
+            raise ArchiveError("Not a ZIP or tar archive")
+        header = await stream.read_exactly(tarfile.BLOCKSIZE)
+        if _tar_number(header[148:156]) != sum(header[:148]) + 256 + sum(header[156:]):
+            raise ArchiveError("Invalid tar header checksum")
+
+        name = _tar_string(header[0:100])
+        size = _tar_number(header[124:136])
+        kind = header[156:157]
+        prefix = _tar_string(header[345:500]) if header[257:262] == b'ustar' else ''
+        if prefix:
+            name = f"{prefix}/{name}"
+
+        padded = -(-size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+        if kind in (tarfile.REGTYPE, tarfile.AREGTYPE):
+            _check_member_size(size, name)
+        elif size > MAX_MEMBER_SIZE:
+            raise ArchiveError(f"Tar header for {name} is too large")
+        payload = await stream.read_exactly(padded)
+        data = payload[:size]
+
+        if kind == tarfile.GNUTYPE_LONGNAME:
+            long_name = _tar_string(data)
+            continue
+        if kind == tarfile.XHDTYPE:
+            for record in data.decode('utf-8', 'replace').splitlines():
+                _, _, keyword_value = record.partition(' ')
+                keyword, _, value = keyword_value.partition('=')
+                if keyword == 'path':
+                    long_name = value
+            continue
+        if kind in (tarfile.REGTYPE, tarfile.AREGTYPE):
+            yield ArchiveEntry(long_name or name, data)
+        long_name = None
+
+
+async def iter_archive(chunks: AsyncIterator[bytes]) -> AsyncIterator[ArchiveEntry]:
+    """Detect the archive type from its first bytes and yield its regular files"""
+    stream = _ByteStream(chunks)
+    magic = await stream.peek(6)
+    if magic[:4] in (ZIP_LOCAL_HEADER, ZIP_END_RECORD):
+        async for entry in iter_zip(stream):
+            yield entry
+        return
+
+    decompressor = None
+    if magic[:2] == b'\x1f\x8b':
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif magic[:3] == b'BZh':
+        decompressor = bz2.BZ2Decompressor()
+    elif magic[:6] == b'\xfd7zXZ\x00':
+        decompressor = lzma.LZMADecompressor()
+    if decompressor is not None:
+        compressed = stream
+
+        async def remaining():
+            while True:
+                chunk = await compressed.read_some()
+                if not chunk:
+                    return
+                yield chunk
+
+        stream = _ByteStream(remaining(), decompressor)
+
+    try:
+        async for entry in iter_tar(stream):
+            yield entry
+    except ValueError as e:
+        raise ArchiveError(f"Not a ZIP or tar archive: {e}")
@@ -0,0 +1,160 @@
+"""
+Per-article stage timings of publish jobs, with percentiles and trace export
+"""
+from typing import Dict, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+import math
+import time
+
+# Spans, in the order they show up in reports
+STAGES = (
+    'parse_queue', 'parse', 'media_queue', 'media_upload', 'post_queue', 'post_create',
+    'pool_wait', 'retry_backoff',
+)
+# Which kind of bottleneck a dominant span points at
+BOUND_BY = {
+    'parse': 'disk',
+    'media_upload': 'upload',
+    'post_create': 'wordpress',
+    'retry_backoff': 'wordpress',
+    'pool_wait': 'rate_limit',
+    'parse_queue': 'pipeline',
+    'media_queue': 'pipeline',
+    'post_queue': 'pipeline',
+}
+# Stage each queue span waits for: a full queue means that stage can't keep up
+QUEUED_FOR = {
+    'parse_queue': 'parse',
+    'media_queue': 'media_upload',
+    'post_queue': 'post_create',
+}
+
+# Spans recorded inside the stage span that is running at the time
+NESTED = ('pool_wait', 'retry_backoff')
+
+# Trace of the article the current task is working on; None elsewhere
+_current: ContextVar[Optional['ItemTrace']] = ContextVar('item_trace', default=None)
+
+
+class ItemTrace:
+    """Spans (name, wall-clock start, duration in seconds) of one article"""
+
+    def __init__(self):
+        self.spans: List[Dict] = []
+
+    def add(self, name: str, start: float, duration: float):
+        self.spans.append({'name': name, 'start': round(start, 6), 'duration': round(duration, 6)})
+
+    @contextmanager
+    def span(self, name: str):
+        wall, started = time.time(), time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, wall, time.perf_counter() - started)
+
+    @contextmanager
+    def activate(self):
+        """Make this the trace that span() below records into"""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def to_list(self) -> List[Dict]:
+        return list(self.spans)
+
+
+@contextmanager
+def span(name: str):
+    """Time a block into the active item trace, if any (e.g. retries deep in the API client)"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(name):
+        yield
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """q-th percentile (0-100) of sorted values, linearly interpolated"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower, upper = math.floor(position), math.ceil(position)
+    if lower == upper:
+        return sorted_values[lower]
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(traces: List[List[Dict]]) -> Dict:
+    """Per-stage count, total and p50/p90/p99/max seconds over the traced items.
+
+    Durations of one stage within an item are added up first, so an item
+    with three retries counts once with their combined wait. Stage spans
+    include the pool waits and retry backoffs nested in them; time_by_kind
+    counts those only once, and bound_by names the kind of work (disk,
+    upload, wordpress, rate_limit) with the largest share, charging time
+    spent in a queue to the stage it was waiting for.
+    """
+    per_stage: Dict[str, List[float]] = {}
+    work: Dict[str, float] = {}
+    vote: Dict[str, float] = {}
+    for spans in traces:
+        item_totals: Dict[str, float] = {}
+        for entry in spans:
+            item_totals[entry['name']] = item_totals.get(entry['name'], 0.0) + entry['duration']
+            duration = entry['duration']
+            if entry['name'] not in NESTED:
+                end = entry['start'] + duration
+                duration -= sum(inner['duration'] for inner in spans
+                                if inner['name'] in NESTED and entry['start'] <= inner['start'] < end)
+            kind = BOUND_BY.get(entry['name'], entry['name'])
+            work[kind] = work.get(kind, 0.0) + max(duration, 0.0)
+            culprit = BOUND_BY.get(QUEUED_FOR.get(entry['name'], entry['name']), entry['name'])
+            vote[culprit] = vote.get(culprit, 0.0) + max(duration, 0.0)
+        for name, total in item_totals.items():
+            per_stage.setdefault(name, []).append(total)
+
+    stages = {}
+    for name in sorted(per_stage, key=lambda n: STAGES.index(n) if n in STAGES else len(STAGES)):
+        values = sorted(per_stage[name])
+        stages[name] = {
+            'count': len(values),
+            'total': round(sum(values), 4),
+            'p50': round(percentile(values, 50), 4),
+            'p90': round(percentile(values, 90), 4),
+            'p99': round(percentile(values, 99), 4),
+            'max': round(values[-1], 4),
+        }
+    return {
+        'items': len(traces),
+        'stages': stages,
+        'time_by_kind': {kind: round(total, 4) for kind, total in work.items()},
+        'bound_by': max(vote, key=vote.get) if vote else None,
+    }
+
+
+def chrome_trace(items: List[Dict]) -> Dict:
+    """Trace Event Format (chrome://tracing, Perfetto): one track per article.
+
+    items are dicts with seq, filename and trace (a list of spans).
+    """
+    events = []
+    origin = min((entry['start'] for item in items for entry in item['trace'] or []), default=0.0)
+    for item in items:
+        events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': item['seq'],
+                       'args': {'name': f"{item['seq']}: {item['filename']}"}})
+        for entry in item['trace'] or []:
+            events.append({
+                'name': entry['name'],
+                'cat': BOUND_BY.get(entry['name'], 'other'),
+                'ph': 'X',
+                'pid': 1,
+                'tid': item['seq'],
+                'ts': round((entry['start'] - origin) * 1e6),
+                'dur': round(entry['duration'] * 1e6),
+            })
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
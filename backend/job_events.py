@@ -0,0 +1,87 @@
+"""
+In-process publish job event bus and Server-Sent Events formatting
+"""
+from typing import Dict, Set, Optional, Any
+from contextlib import contextmanager
+import asyncio
+import json
+import time
+
+
+def format_sse(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """Encode one Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class JobEventBus:
+    """Fan-out of job events to the SSE streams subscribed in this process.
+
+    Publishing never blocks: a subscriber that falls more than max_queue
+    events behind loses its oldest events, and can rely on the job store
+    snapshot sent by the stream for the authoritative counts.
+    """
+
+    def __init__(self, max_queue: int = 1000):
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._counters: Dict[str, int] = {}
+        # Finished jobs whose counters wait for their last stream to unsubscribe
+        self._finished: Set[str] = set()
+
+    def publish(self, job_id: str, event: str, **data):
+        subscribers = self._subscribers.get(job_id)
+        event_id = self._counters.get(job_id, 0) + 1
+        self._counters[job_id] = event_id
+        if event not in ("done", "waiting"):
+            self._finished.discard(job_id)  # resumed
+        if not subscribers:
+            return
+        message = {"id": event_id, "event": event, "data": {"task_id": job_id, "time": time.time(), **data}}
+        for queue in subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    def forget(self, job_id: str):
+        """Drop the event counter of a finished job, or once its last listener leaves"""
+        if self._subscribers.get(job_id):
+            self._finished.add(job_id)
+        else:
+            self._counters.pop(job_id, None)
+
+    @contextmanager
+    def subscribe(self, job_id: str):
+        queue: asyncio.Queue = asyncio.Queue(self.max_queue)
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[job_id]
+                    if job_id in self._finished:
+                        self._finished.discard(job_id)
+                        self._counters.pop(job_id, None)
+
+
+class ThroughputMeter:
+    """Items-per-minute for a running job"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.done = 0
+
+    def tick(self) -> Dict[str, float]:
+        self.done += 1
+        elapsed = time.monotonic() - self.started
+        return {
+            "elapsed": round(elapsed, 2),
+            "items_per_minute": round(self.done / elapsed * 60, 2) if elapsed > 0 else 0.0
+        }
@@ -0,0 +1,500 @@
+"""
+Durable publication job storage backed by SQLite
+"""
+from typing import List, Dict, Optional, Any
+from pathlib import Path
+from contextlib import contextmanager
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from models import PublicationResult
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    profile TEXT,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL DEFAULT '{}',
+    total INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL REFERENCES jobs (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    success INTEGER,
+    details TEXT,
+    url TEXT,
+    post_id INTEGER,
+    idempotency_key TEXT,
+    started_at REAL,
+    options TEXT NOT NULL DEFAULT '{}',
+    scheduled_at REAL,
+    trace TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    profile TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    maybe_sent INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    FOREIGN KEY (job_id, seq) REFERENCES job_items (job_id, seq) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS outbox_profile ON outbox (profile, id);
+"""
+
+# Created after MIGRATIONS so the columns they index exist
+INDEXES = """
+CREATE INDEX IF NOT EXISTS job_items_schedule ON job_items (status, scheduled_at);
+"""
+
+# Columns added after the first release: (table, column, definition)
+MIGRATIONS = [
+    ('job_items', 'post_id', 'INTEGER'),
+    ('job_items', 'idempotency_key', 'TEXT'),
+    ('job_items', 'started_at', 'REAL'),
+    ('job_items', 'options', "TEXT NOT NULL DEFAULT '{}'"),
+    ('job_items', 'scheduled_at', 'REAL'),
+    ('job_items', 'trace', 'TEXT'),
+]
+
+FINISHED_STATUSES = ('completed', 'error')
+
+
+class JobStore:
+    """Publication jobs and their per-item results.
+
+    Every call opens its own short-lived connection, so the store can be
+    shared by several uvicorn workers pointing at the same database file.
+    """
+
+    def __init__(self, db_path: Path, retention_seconds: float = 7 * 24 * 3600):
+        self.db_path = Path(db_path)
+        self.retention_seconds = retention_seconds
+        self._last_purge = 0.0
+        self._ready = False
+        self._init_lock = threading.Lock()
+
+    def _initialize(self):
+        """Create or migrate the database on first use instead of at import"""
+        with self._init_lock:
+            if self._ready:
+                return
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.row_factory = sqlite3.Row
+            try:
+                with conn:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(SCHEMA)
+                    self._migrate(conn)
+                    conn.executescript(INDEXES)
+            finally:
+                conn.close()
+            self._ready = True
+        self.purge_expired()
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        for table, column, definition in MIGRATIONS:
+            columns = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    @contextmanager
+    def _connect(self):
+        if not self._ready:
+            self._initialize()
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys=ON")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # Jobs
+
+    def create_job(self, kind: str, profile: Optional[str], paths: List[str],
+                   params: Optional[Dict[str, Any]] = None,
+                   item_options: Optional[List[Dict[str, Any]]] = None,
+                   scheduled_at: Optional[List[Optional[float]]] = None) -> str:
+        """Create a job with one pending item per path and return its ID.
+
+        item_options, when given, holds per-item overrides of the job params
+        (status, categories, tags, featured image) in the same order as paths.
+        Items with a scheduled_at timestamp are held as scheduled until the
+        scheduler releases them.
+        """
+        self._maybe_purge()
+        item_options = item_options or [{} for _ in paths]
+        scheduled_at = scheduled_at or [None for _ in paths]
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        status = 'scheduled' if any(due is not None for due in scheduled_at) else 'pending'
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, profile, status, params, total, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, profile, status, json.dumps(params or {}), len(paths), now, now)
+            )
+            conn.executemany(
+                "INSERT INTO job_items (job_id, seq, path, filename, status, options, scheduled_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (job_id, seq, path, Path(path).name, 'pending' if due is None else 'scheduled',
+                     json.dumps(options), due, now)
+                    for seq, (path, options, due) in enumerate(zip(paths, item_options, scheduled_at))
+                ]
+            )
+        return job_id
+
+    def set_status(self, job_id: str, status: str):
+        now = time.time()
+        finished_at = now if status in FINISHED_STATUSES else None
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, finished_at = ? WHERE id = ?",
+                (status, now, finished_at, job_id)
+            )
+
+    def update_params(self, job_id: str, **updates):
+        """Merge values into the job's params (e.g. an uploaded media ID)"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT params FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            params = json.loads(row['params'])
+            params.update(updates)
+            conn.execute(
+                "UPDATE jobs SET params = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(params), time.time(), job_id)
+            )
+
+    def touch(self, job_id: str):
+        """Refresh the job's heartbeat"""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def claim(self, job_id: str, stale_seconds: float) -> bool:
+        """Atomically mark a job running unless another worker is still on it.
+
+        A running job whose heartbeat is older than stale_seconds is assumed
+        to belong to a dead worker and can be taken over.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'running', updated_at = ?, finished_at = NULL "
+                "WHERE id = ? AND (status != 'running' OR updated_at < ?)",
+                (now, job_id, now - stale_seconds)
+            )
+        return cursor.rowcount == 1
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            counts = dict(conn.execute(
+                "SELECT status, COUNT(*) FROM job_items WHERE job_id = ? GROUP BY status",
+                (job_id,)
+            ).fetchall())
+        return self._job_dict(row, counts)
+
+    def list_jobs(self, status: Optional[str] = None, profile: Optional[str] = None,
+                  limit: int = 50, offset: int = 0) -> List[Dict]:
+        """Most recent jobs first, optionally filtered by status and profile"""
+        clauses, args = [], []
+        if status:
+            clauses.append("j.status = ?")
+            args.append(status)
+        if profile:
+            clauses.append("j.profile = ?")
+            args.append(profile)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT j.*, "
+                f"(SELECT COUNT(*) FROM job_items i WHERE i.job_id = j.id AND i.status = 'completed') AS n_completed, "
+                f"(SELECT COUNT(*) FROM job_items i WHERE i.job_id = j.id AND i.status = 'failed') AS n_failed, "
+                f"(SELECT COUNT(*) FROM job_items i WHERE i.job_id = j.id AND i.status = 'scheduled') AS n_scheduled "
+                f"FROM jobs j {where} ORDER BY j.created_at DESC LIMIT ? OFFSET ?",
+                (*args, limit, offset)
+            ).fetchall()
+        return [
+            self._job_dict(row, {'completed': row['n_completed'], 'failed': row['n_failed'],
+                                 'scheduled': row['n_scheduled']})
+            for row in rows
+        ]
+
+    @staticmethod
+    def _job_dict(row: sqlite3.Row, counts: Dict[str, int]) -> Dict:
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'profile': row['profile'],
+            'status': row['status'],
+            'params': json.loads(row['params']),
+            'total': row['total'],
+            'completed': counts.get('completed', 0),
+            'failed': counts.get('failed', 0),
+            'scheduled': counts.get('scheduled', 0),
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+            'finished_at': row['finished_at'],
+        }
+
+    # Items
+
+    def add_item(self, job_id: str, path: str) -> int:
+        """Append an item discovered while the job runs and return its seq"""
+        now = time.time()
+        with self._connect() as conn:
+            seq = conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM job_items WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO job_items (job_id, seq, path, filename, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, seq, path, Path(path).name, now)
+            )
+            conn.execute(
+                "UPDATE jobs SET total = total + 1, updated_at = ? WHERE id = ?", (now, job_id)
+            )
+        return seq
+
+    def update_item_options(self, job_id: str, seq: int, **updates):
+        """Merge values into one item's options"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT options FROM job_items WHERE job_id = ? AND seq = ?", (job_id, seq)
+            ).fetchone()
+            options = json.loads(row['options'])
+            options.update(updates)
+            conn.execute(
+                "UPDATE job_items SET options = ?, updated_at = ? WHERE job_id = ? AND seq = ?",
+                (json.dumps(options), time.time(), job_id, seq)
+            )
+
+    def mark_in_flight(self, job_id: str, seq: int, idempotency_key: str):
+        """Checkpoint that an item's post is about to be created"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE job_items SET status = 'in_flight', idempotency_key = ?, started_at = ?, "
+                "updated_at = ? WHERE job_id = ? AND seq = ?",
+                (idempotency_key, now, now, job_id, seq)
+            )
+            conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (now, job_id))
+
+    def reset_items(self, job_id: str, statuses: List[str]) -> int:
+        """Put items in the given statuses back to pending"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE job_items SET status = 'pending', success = NULL, details = NULL, "
+                f"updated_at = ? WHERE job_id = ? AND status IN ({','.join('?' * len(statuses))})",
+                (time.time(), job_id, *statuses)
+            )
+        return cursor.rowcount
+
+    def record_result(self, job_id: str, seq: int, result: PublicationResult,
+                      post_id: Optional[int] = None):
+        """Store the outcome of one item"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE job_items SET status = ?, success = ?, details = ?, url = ?, post_id = ?, "
+                "updated_at = ? WHERE job_id = ? AND seq = ?",
+                ('completed' if result.success else 'failed', int(result.success),
+                 result.details, result.url, post_id, now, job_id, seq)
+            )
+            conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (now, job_id))
+
+    def add_result(self, job_id: str, result: PublicationResult) -> int:
+        """Append an item that is already finished (e.g. a job-level failure)"""
+        seq = self.add_item(job_id, result.filename)
+        self.record_result(job_id, seq, result)
+        return seq
+
+    def count_items(self, job_id: str, statuses: List[str]) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                f"SELECT COUNT(*) FROM job_items WHERE job_id = ? "
+                f"AND status IN ({','.join('?' * len(statuses))})",
+                (job_id, *statuses)
+            ).fetchone()[0]
+
+    def queue_depth(self, statuses=("pending", "in_flight", "scheduled", "outbox")) -> Dict[tuple, int]:
+        """Unfinished items across all jobs, keyed by (profile, status)"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT COALESCE(j.profile, '') AS profile, i.status, COUNT(*) AS n "
+                f"FROM job_items i JOIN jobs j ON j.id = i.job_id "
+                f"WHERE i.status IN ({','.join('?' * len(statuses))}) GROUP BY j.profile, i.status",
+                tuple(statuses)
+            ).fetchall()
+        return {(row['profile'], row['status']): row['n'] for row in rows}
+
+    def get_items(self, job_id: str, status: Optional[str] = None) -> List[Dict]:
+        query = "SELECT * FROM job_items WHERE job_id = ?"
+        args: list = [job_id]
+        if status:
+            query += " AND status = ?"
+            args.append(status)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY seq", args).fetchall()
+        items = [dict(row) for row in rows]
+        for item in items:
+            item['options'] = json.loads(item['options'])
+        return items
+
+    def get_results(self, job_id: str, with_trace: bool = False) -> List[PublicationResult]:
+        """Finished items as PublicationResult objects, in item order"""
+        return [
+            PublicationResult(item['filename'], bool(item['success']), item['details'], item['url'],
+                              json.loads(item['trace']) if with_trace and item['trace'] else None)
+            for item in self.get_items(job_id)
+            if item['status'] in ('completed', 'failed')
+        ]
+
+    def save_trace(self, job_id: str, seq: int, trace: List[Dict]):
+        """Store the stage timings of one item"""
+        with self._connect() as conn:
+            conn.execute("UPDATE job_items SET trace = ? WHERE job_id = ? AND seq = ?",
+                         (json.dumps(trace), job_id, seq))
+
+    def get_traces(self, job_id: str) -> List[Dict]:
+        """seq, filename, status and trace of every traced item"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT seq, filename, status, trace FROM job_items "
+                "WHERE job_id = ? AND trace IS NOT NULL ORDER BY seq", (job_id,)
+            ).fetchall()
+        return [{'seq': row['seq'], 'filename': row['filename'], 'status': row['status'],
+                 'trace': json.loads(row['trace'])} for row in rows]
+
+    # Scheduling
+
+    def next_scheduled_time(self) -> Optional[float]:
+        """Earliest release time of any scheduled item, across all jobs"""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT MIN(scheduled_at) FROM job_items WHERE status = 'scheduled'"
+            ).fetchone()[0]
+
+    def release_due_items(self, now: float, limit: int = 100) -> Dict[str, List[int]]:
+        """Move due scheduled items to pending and return their seqs by job.
+
+        The write lock is taken before reading, so workers sharing the
+        database never release the same item twice.
+        """
+        released: Dict[str, List[int]] = {}
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT job_id, seq FROM job_items WHERE status = 'scheduled' AND scheduled_at <= ? "
+                "ORDER BY scheduled_at LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE job_items SET status = 'pending', updated_at = ? WHERE job_id = ? AND seq = ?",
+                [(now, row['job_id'], row['seq']) for row in rows]
+            )
+        for row in rows:
+            released.setdefault(row['job_id'], []).append(row['seq'])
+        return released
+
+    def cancel_scheduled(self, job_id: str) -> int:
+        """Drop a job's items that have not been released yet"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE job_items SET status = 'cancelled', updated_at = ? "
+                "WHERE job_id = ? AND status = 'scheduled'",
+                (time.time(), job_id)
+            )
+        return cursor.rowcount
+
+    # Outbox
+
+    def add_to_outbox(self, job_id: str, seq: int, profile: str, payload: Dict[str, Any],
+                      error: str, maybe_sent: bool):
+        """Park an item that failed for a transient reason until its site is back.
+
+        payload holds everything needed to create the post without the
+        original files (title, content, status, taxonomy, media).
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO outbox (profile, job_id, seq, payload, maybe_sent, last_error, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (profile, job_id, seq, json.dumps(payload), int(maybe_sent), error, now)
+            )
+            conn.execute(
+                "UPDATE job_items SET status = 'outbox', details = ?, updated_at = ? "
+                "WHERE job_id = ? AND seq = ?",
+                (error, now, job_id, seq)
+            )
+            conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (now, job_id))
+
+    def outbox_profiles(self) -> Dict[str, int]:
+        """Number of parked items per profile"""
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT profile, COUNT(*) FROM outbox GROUP BY profile").fetchall())
+
+    def get_outbox(self, profile: str, limit: int = 25) -> List[Dict]:
+        """Oldest parked items of a profile"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM outbox WHERE profile = ? ORDER BY id LIMIT ?", (profile, limit)
+            ).fetchall()
+        entries = [dict(row) for row in rows]
+        for entry in entries:
+            entry['payload'] = json.loads(entry['payload'])
+        return entries
+
+    def remove_from_outbox(self, entry_id: int):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+
+    def defer_outbox(self, entry_id: int, error: str, maybe_sent: bool = True,
+                     payload: Optional[Dict[str, Any]] = None):
+        """Count a failed flush attempt of a parked item, saving payload changes"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE outbox SET attempts = attempts + 1, last_error = ?, "
+                "maybe_sent = MAX(maybe_sent, ?), payload = COALESCE(?, payload) WHERE id = ?",
+                (error, int(maybe_sent), json.dumps(payload) if payload is not None else None, entry_id)
+            )
+
+    # Retention
+
+    def purge_expired(self) -> int:
+        """Delete finished jobs older than the retention period"""
+        self._last_purge = time.time()
+        cutoff = self._last_purge - self.retention_seconds
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"DELETE FROM jobs WHERE created_at < ? AND status IN ({','.join('?' * len(FINISHED_STATUSES))})",
+                (cutoff, *FINISHED_STATUSES)
+            )
+        return cursor.rowcount
+
+    def _maybe_purge(self):
+        if time.time() - self._last_purge > 3600:
+            self.purge_expired()
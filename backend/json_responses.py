@@ -0,0 +1,109 @@
+"""
+Fast, compressed and projectable JSON API responses
+"""
+from typing import Any, Dict, List, Optional
+from contextvars import ContextVar
+from urllib.parse import parse_qs
+import gzip
+import json
+
+from fastapi.responses import JSONResponse
+
+from static_assets import choose_encoding
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = 1024
+
+# Accept-Encoding header and ?fields= projection of the request being served
+_accept_encoding: ContextVar[str] = ContextVar('accept_encoding', default='')
+_fields: ContextVar[Optional[List[str]]] = ContextVar('fields', default=None)
+
+
+def dumps(content: Any) -> bytes:
+    """Compact JSON bytes, through orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _project_records(records: list, fields: List[str]) -> list:
+    return [{field: record[field] for field in fields if field in record}
+            if isinstance(record, dict) else record for record in records]
+
+
+def project(content: Any, fields: List[str]) -> Any:
+    """Keep only the named keys of the records in content.
+
+    Records are the dicts in a top-level list or in the list values of a
+    wrapper object (e.g. the results of a job), so ?fields=filename,url
+    works on both; the wrapper's own keys are always kept, even when one
+    is named like a field (a job's status).
+    """
+    if isinstance(content, list):
+        return _project_records(content, fields)
+    if isinstance(content, dict):
+        return {key: _project_records(value, fields) if isinstance(value, list) else value
+                for key, value in content.items()}
+    return content
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=4)
+    return gzip.compress(body, compresslevel=5)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that projects, encodes fast and compresses large bodies"""
+
+    def __init__(self, content: Any, *args, **kwargs):
+        fields = _fields.get()
+        if fields and 200 <= kwargs.get('status_code', 200) < 300:
+            content = project(content, fields)
+        super().__init__(content, *args, **kwargs)
+        if len(self.body) >= COMPRESS_MIN_BYTES:
+            available = ('br', 'gzip') if brotli is not None else ('gzip',)
+            encoding = choose_encoding(_accept_encoding.get(), available)
+            if encoding:
+                self.body = compress(self.body, encoding)
+                self.headers['content-encoding'] = encoding
+                self.headers['content-length'] = str(len(self.body))
+        self.headers['vary'] = 'Accept-Encoding'
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class ResponseOptionsMiddleware:
+    """Expose the request's Accept-Encoding and ?fields= to FastJSONResponse"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope: Dict, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        accept = ''
+        for name, value in scope['headers']:
+            if name == b'accept-encoding':
+                accept = value.decode('latin-1')
+                break
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        fields = [f.strip() for value in query.get('fields', []) for f in value.split(',') if f.strip()]
+        accept_token = _accept_encoding.set(accept)
+        fields_token = _fields.set(fields or None)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _accept_encoding.reset(accept_token)
+            _fields.reset(fields_token)
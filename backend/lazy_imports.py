@@ -0,0 +1,26 @@
+"""
+Deferred imports of heavy dependencies
+"""
+import importlib.util
+import sys
+
+
+def lazy_import(name: str):
+    """Module object for name whose code only runs on first attribute access.
+
+    Used for aiohttp, requests and cryptography, which cost more to import
+    than the rest of the backend together but are not needed to serve the
+    UI or answer the first request.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,269 @@
+"""
+Event-loop lag watchdog and blocking-call detection
+"""
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import asyncio
+import importlib
+import logging
+import sys
+import threading
+import time
+import traceback
+import types
+
+from metrics import EVENT_LOOP_LAG, EVENT_LOOP_BLOCKS
+
+logger = logging.getLogger(__name__)
+
+# Calls that block whatever runs them; guard_blocking_calls() makes them
+# fail on the event loop. Modules not imported yet (or still lazy) are skipped.
+BLOCKING_CALLS = (
+    ('time', 'sleep'),
+    ('builtins', 'open'),
+    ('io', 'open'),
+    ('shutil', 'copyfileobj'),
+    ('requests.sessions', 'Session.request'),
+    ('cryptography.fernet', 'Fernet.decrypt'),
+    ('sqlite3', 'connect'),
+)
+# Methods of connections opened while guarded (earlier ones are not covered)
+SQLITE_METHODS = ('execute', 'executemany', 'executescript', 'commit')
+
+# Set by allow_blocking() for code known to block briefly on purpose
+_allowed: ContextVar[bool] = ContextVar('blocking_allowed', default=False)
+# Code of functions registered with exempt_blocking()
+_exempt_code: Set[types.CodeType] = set()
+# Loops guarded by guard_blocking_calls(), and the calls it replaced
+_guarded_loops: Set[asyncio.AbstractEventLoop] = set()
+_patched: List[Tuple] = []
+# Guarded calls made on a guarded loop
+_violations: List[Dict] = []
+
+
+class BlockingCallError(RuntimeError):
+    """A blocking call ran on the event loop, or the loop stalled, under detect_blocking()"""
+
+
+class LoopWatchdog:
+    """Measures event-loop lag and logs what the loop runs when it stalls.
+
+    A timer on the loop fires every interval and records how late it ran;
+    a separate thread checks that timer and, once it is more than
+    threshold late, logs the stack of the loop thread, i.e. the callback
+    that is blocking every request. Each stall is reported once, then
+    again with its full duration when the loop gets going again.
+    """
+
+    def __init__(self, threshold: float = 0.25, interval: float = 0.05, log: bool = True,
+                 max_blocks: int = 50):
+        self.threshold = threshold
+        self.interval = interval
+        self.log = log
+        self.blocks = deque(maxlen=max_blocks)
+        self.max_lag = 0.0
+        self._beat = 0.0
+        self._reported = 0.0
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start watching the running loop (call from a coroutine on it)"""
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - self._beat - self.interval)
+            self._beat = now
+            self.max_lag = max(self.max_lag, lag)
+            EVENT_LOOP_LAG.observe(lag)
+            if lag > self.threshold and self.blocks and self.blocks[-1]['duration'] is None:
+                block = self.blocks[-1]
+                block['duration'] = round(lag, 4)
+                if self.log:
+                    logger.warning(f"Event loop was blocked for {lag * 1000:.0f} ms")
+
+    def _watch(self):
+        while not self._stop.wait(self.interval / 2):
+            beat = self._beat
+            stalled = time.monotonic() - beat - self.interval
+            if stalled <= self.threshold or beat == self._reported:
+                continue
+            self._reported = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            self.blocks.append({'at': time.time(), 'duration': None, 'stack': stack})
+            EVENT_LOOP_BLOCKS.inc()
+            if self.log:
+                logger.warning(f"Event loop blocked for more than {self.threshold * 1000:.0f} ms in:\n{stack}")
+
+
+def _resolve(module_name: str, path: str):
+    """(owner, attribute name) of a guarded call, or None if its module is not loaded"""
+    module = sys.modules.get(module_name)
+    # A lazy module is still a subclass of ModuleType until first use
+    if module is None or type(module) is not types.ModuleType:
+        return None
+    owner = importlib.import_module(module_name)
+    *parents, name = path.split(".")
+    for parent in parents:
+        owner = getattr(owner, parent)
+    return owner, name
+
+
+def _on_guarded_loop() -> bool:
+    try:
+        return asyncio.get_running_loop() in _guarded_loops
+    except RuntimeError:
+        return False
+
+
+def _called_from_exempt() -> bool:
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_code in _exempt_code:
+            return True
+        frame = frame.f_back
+    return False
+
+
+def _guard(name: str, func: Callable) -> Callable:
+    @wraps(func)
+    def guarded(*args, **kwargs):
+        if not _allowed.get() and _on_guarded_loop() and not _called_from_exempt():
+            stack = "".join(traceback.format_stack(limit=15)[:-1])
+            _violations.append({'call': name, 'stack': stack})
+            raise BlockingCallError(f"{name}() called on the event loop:\n{stack}")
+        return func(*args, **kwargs)
+    return guarded
+
+
+def _guard_sqlite_connect(name: str, connect: Callable) -> Callable:
+    """Guard connect() and hand out connections whose SQLITE_METHODS are guarded"""
+    import sqlite3
+
+    class GuardedConnection(sqlite3.Connection):
+        pass
+
+    for method in SQLITE_METHODS:
+        setattr(GuardedConnection, method,
+                _guard(f"sqlite3.Connection.{method}", getattr(sqlite3.Connection, method)))
+
+    def connect_guarded(*args, **kwargs):
+        kwargs.setdefault('factory', GuardedConnection)
+        return connect(*args, **kwargs)
+    return _guard(name, wraps(connect)(connect_guarded))
+
+
+# Calls needing more than replacing the function itself
+_GUARDS = {'sqlite3.connect': _guard_sqlite_connect}
+
+
+def guard_blocking_calls() -> Callable[[], None]:
+    """Make BLOCKING_CALLS raise BlockingCallError on the running event loop.
+
+    For tests and debugging (STRICT_BLOCKING=1): other threads and loops,
+    e.g. to_thread workers or a load generator sharing the process, run
+    the calls normally. Returns a function undoing it.
+    """
+    loop = asyncio.get_running_loop()
+    if not _guarded_loops:
+        for module_name, path in BLOCKING_CALLS:
+            target = _resolve(module_name, path)
+            if target is None:
+                continue
+            owner, name = target
+            original = getattr(owner, name)
+            qualified = f"{module_name}.{path}"
+            setattr(owner, name, _GUARDS.get(qualified, _guard)(qualified, original))
+            _patched.append((owner, name, original))
+    _guarded_loops.add(loop)
+
+    def restore():
+        _guarded_loops.discard(loop)
+        if not _guarded_loops:
+            while _patched:
+                owner, name, original = _patched.pop()
+                setattr(owner, name, original)
+    return restore
+
+
+def exempt_blocking(*targets):
+    """Let guarded calls through when made by these functions or methods of these classes.
+
+    For work deliberately left on the loop because it is short and local,
+    e.g. the SQLite session lookup every request does; anything they call
+    is exempt too.
+    """
+    for target in targets:
+        functions = vars(target).values() if isinstance(target, type) else [target]
+        for function in functions:
+            function = getattr(function, '__func__', function)  # classmethod, staticmethod
+            function = getattr(function, '__wrapped__', function)
+            code = getattr(function, '__code__', None)
+            if code is not None:
+                _exempt_code.add(code)
+
+
+@contextmanager
+def allow_blocking():
+    """Let guarded calls through for a block known to be short"""
+    token = _allowed.set(True)
+    try:
+        yield
+    finally:
+        _allowed.reset(token)
+
+
+@asynccontextmanager
+async def detect_blocking(threshold: float = 0.05, strict: bool = True):
+    """Fail with BlockingCallError if the loop stalled past threshold inside the block.
+
+    With strict, BLOCKING_CALLS also raise as soon as they run on the loop,
+    and are reported here even if the code under test swallowed the error:
+
+        async with detect_blocking():
+            await client.get("/api/files")
+    """
+    watchdog = LoopWatchdog(threshold, interval=threshold / 4, log=False)
+    restore = guard_blocking_calls() if strict else None
+    seen = len(_violations)
+    watchdog.start()
+    try:
+        yield watchdog
+    finally:
+        await watchdog.stop()
+        if restore is not None:
+            restore()
+    problems = [f"{v['call']}() on the event loop:\n{v['stack']}" for v in _violations[seen:]]
+    del _violations[seen:]
+    for block in watchdog.blocks:
+        duration = block['duration'] or threshold
+        problems.append(f"event loop blocked for {duration * 1000:.0f} ms in:\n{block['stack']}")
+    if problems:
+        raise BlockingCallError(f"{len(problems)} blocking call(s):\n\n" + "\n\n".join(problems))
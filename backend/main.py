@@ -1,41 +1,121 @@
 """
 FastAPI backend for WordPress Publisher
 """
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks, Request
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks, Request, Response, Depends
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List, Optional, Dict, Any
 from pathlib import Path
+from collections import OrderedDict
 import asyncio
+import hashlib
 import json
 import os
 import tempfile
 import shutil
 import logging
+import threading
 import time
 from functools import wraps
+from contextlib import asynccontextmanager
 
-from models import WordPressProfile, SecureStorage, PublicationResult, ArticleFile
-from wordpress_api import WordPressAPI
-from wordpress_api_async import WordPressAPIAsync
+from models import WordPressProfile, SecureStorage, PublicationResult, ArticleFile, parse_article_text
+from wordpress_api_async import WordPressAPIAsync, WordPressUnavailableError, close_shared_session
 from article_manager import ArticleManager
+from search_index import SearchIndex
+from similarity import MinHasher, find_near_duplicates, strip_html
+from archive_stream import iter_archive, ArchiveError
+from job_store import JobStore
+from job_events import JobEventBus, ThroughputMeter, format_sse
+from publish_pipeline import PublishPipeline, PipelineItem
+from item_trace import summarize as summarize_traces, chrome_trace
+from scheduler import PublishScheduler, parse_time, plan_times
+from worker_pool import FairWorkerPool, INTERACTIVE, BULK
+from outbox import OutboxFlusher
+from preflight import SiteCache, run_preflight, check_image_data
+from term_cache import TermCache
+from sessions import SessionStore, SESSION_FIELDS
+from static_assets import AssetBundle
+from json_responses import FastJSONResponse, ResponseOptionsMiddleware
+from server_timing import ServerTimingMiddleware, timed
+from metrics import registry, Gauge, MetricsMiddleware, PUBLISHED_ITEMS
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from loop_watchdog import LoopWatchdog, exempt_blocking, guard_blocking_calls
+from profiling import ProfileStore, ProfilingMiddleware, Capture, check_token, cprofile_text, new_capture_id
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the drip-feed scheduler, outbox flusher and loop watchdog for as long as the server is up"""
+    restore_blocking_calls = None
+    if STRICT_BLOCKING:
+        # Stores kept on the loop on purpose: small local files and SQLite rows
+        exempt_blocking(SecureStorage, SessionStore, JobStore, TermCache, AssetBundle, MinHasher)
+        restore_blocking_calls = guard_blocking_calls()
+    if loop_watchdog:
+        loop_watchdog.start()
+    scheduler.start()
+    outbox_flusher.start()
+    yield
+    await scheduler.stop()
+    await outbox_flusher.stop()
+    await close_shared_session()
+    if loop_watchdog:
+        await loop_watchdog.stop()
+    if restore_blocking_calls:
+        restore_blocking_calls()
+
 # Initialize FastAPI app with enhanced configuration
 app = FastAPI(
     title="WordPress Publisher", 
     version="1.0.0",
-    description="WordPress Publisher API with enhanced error handling and timeouts"
+    description="WordPress Publisher API with enhanced error handling and timeouts",
+    lifespan=lifespan,
+    # orjson encoding, gzip/brotli above 1KB and ?fields= projection
+    default_response_class=FastJSONResponse
 )
 
 # Request timeout configuration
 REQUEST_TIMEOUT = 30  # seconds
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
 MAX_RETRIES = 3
+JOB_RETENTION_SECONDS = int(os.environ.get('JOB_RETENTION_DAYS', 7)) * 24 * 3600
+JOB_STALE_SECONDS = 120  # a running job without progress for this long is resumable
+# Worker counts and queue size of the parse -> media -> post pipeline;
+# a job can override them through its "pipeline" parameter
+PIPELINE_DEFAULTS = {
+    'parse_workers': int(os.environ.get('PIPELINE_PARSE_WORKERS', 2)),
+    'media_workers': int(os.environ.get('PIPELINE_MEDIA_WORKERS', 2)),
+    'post_workers': int(os.environ.get('PIPELINE_POST_WORKERS', 4)),
+    'queue_size': int(os.environ.get('PIPELINE_QUEUE_SIZE', 16)),
+}
+# WordPress requests in flight across all profiles, per profile, and kept
+# free for interactive publishes while bulk jobs run
+POOL_MAX_WORKERS = int(os.environ.get('POOL_MAX_WORKERS', 8))
+POOL_PER_PROFILE = int(os.environ.get('POOL_PER_PROFILE', 4))
+POOL_INTERACTIVE_RESERVE = int(os.environ.get('POOL_INTERACTIVE_RESERVE', 2))
+INTERACTIVE_JOB_MAX_ITEMS = 5  # smaller jobs are treated as interactive
+PREFLIGHT_MAX_ARTICLE_BYTES = int(os.environ.get('PREFLIGHT_MAX_ARTICLE_BYTES', 8 * 1024 * 1024))
+PREFLIGHT_MAX_IMAGE_BYTES = int(os.environ.get('PREFLIGHT_MAX_IMAGE_BYTES', 20 * 1024 * 1024))
+SESSION_COOKIE = "wpp_session"
+SESSION_TTL_SECONDS = int(os.environ.get('SESSION_TTL_DAYS', 30)) * 24 * 3600
+TERM_CACHE_TTL_SECONDS = int(os.environ.get('TERM_CACHE_TTL_SECONDS', 300))
+# Profiling endpoints and the X-Profile header only work when a token is set
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN') or None
+PROFILING_MAX_SECONDS = 120
+# Log the loop thread's stack when a callback blocks the event loop this long (0 disables)
+LOOP_WATCHDOG_MS = int(os.environ.get('LOOP_WATCHDOG_MS', 250))
+# Debugging: time.sleep, open, sqlite3, requests, ... raise when called on the event loop
+STRICT_BLOCKING = os.environ.get('STRICT_BLOCKING') == '1'
+SSE_POLL_SECONDS = 5  # fall back to the job store for jobs run by other workers
+ARCHIVE_PUBLISH_CONCURRENCY = 4
+# Search indexes kept in memory; older directories reload from disk when searched again
+MAX_SEARCH_INDEXES = 8
+ARTICLE_EXTENSIONS = {'.md', '.txt'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
 
 # Error handling decorator
 def handle_errors(func):
@@ -63,24 +143,15 @@ def handle_errors(func):
             raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
     return wrapper
 
-# Request size middleware
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
-    
-    # Check request size
-    if hasattr(request, "headers") and "content-length" in request.headers:
-        content_length = int(request.headers["content-length"])
-        if content_length > MAX_FILE_SIZE:
-            return JSONResponse(
-                status_code=413,
-                content={"detail": f"Request too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"}
-            )
-    
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
+profile_store = ProfileStore()
+loop_watchdog = LoopWatchdog(LOOP_WATCHDOG_MS / 1000) if LOOP_WATCHDOG_MS > 0 else None
+
+# Per-request cProfile/sampling on X-Profile; not installed without a token
+if PROFILING_TOKEN:
+    app.add_middleware(ProfilingMiddleware, token=PROFILING_TOKEN, store=profile_store)
+
+# Body size limit and Server-Timing (profile, session, parse, wordpress, total)
+app.add_middleware(ServerTimingMiddleware, max_body_size=MAX_FILE_SIZE)
 
 # Add CORS middleware for local development
 app.add_middleware(
@@ -91,27 +162,172 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(ResponseOptionsMiddleware)
+
+# Outermost, so every request and response (413s included) is counted
+app.add_middleware(MetricsMiddleware)
+
 # Global state - Handle Vercel environment
 base_dir = Path(os.environ.get('BASE_DIR', Path(__file__).parent.parent))
 temp_dir = Path("/tmp") if os.environ.get('VERCEL') else Path.home()
 
-storage = SecureStorage(temp_dir / ".publicador")
-article_manager = ArticleManager(temp_dir / "Articles")
-current_profile: Optional[WordPressProfile] = None
+# Point every worker (or node) at the same STORAGE_DIR to share profiles,
+# jobs and sessions; nothing per-client is kept in process memory
+storage = SecureStorage(Path(os.environ.get('STORAGE_DIR', temp_dir / ".publicador")))
+session_store = SessionStore(storage.storage_path / "sessions.db", SESSION_TTL_SECONDS)
+job_store = JobStore(storage.storage_path / "jobs.db", JOB_RETENTION_SECONDS)
+job_events = JobEventBus()
+# Category/tag lists, kept on local disk (/tmp on serverless) between requests
+term_cache = TermCache(storage.storage_path / "cache", TERM_CACHE_TTL_SECONDS)
+active_pipelines: Dict[str, PublishPipeline] = {}
+site_cache = SiteCache()
+worker_pool = FairWorkerPool(POOL_MAX_WORKERS, POOL_PER_PROFILE, POOL_INTERACTIVE_RESERVE)
+registry.register(Gauge(
+    "wpp_job_queue_depth", "Unfinished job items by profile and status (pending, in_flight, scheduled, outbox)",
+    ("profile", "status"), collect=job_store.queue_depth))
+registry.register(Gauge(
+    "wpp_worker_pool_active", "WordPress requests holding a worker pool slot", ("profile",),
+    collect=lambda: {(profile,): n for profile, n in worker_pool.stats()['active'].items()}))
+registry.register(Gauge(
+    "wpp_worker_pool_waiting", "Publish steps waiting for a worker pool slot", ("priority", "profile"),
+    collect=lambda: {(priority, profile): n for priority, queues in worker_pool.stats()['waiting'].items()
+                     for profile, n in queues.items()}))
+default_articles_dir = Path(os.environ.get('ARTICLES_DIR', temp_dir / "Articles"))
+search_indexes: 'OrderedDict[str, SearchIndex]' = OrderedDict()  # least recently used first
+min_hasher: Optional[MinHasher] = None
+job_run_locks: Dict[str, asyncio.Lock] = {}
+job_run_users: Dict[str, int] = {}  # runs holding or waiting for each job's lock
+
+
+async def release_scheduled_items(task_id: str, seqs: List[int]):
+    """Publish items the scheduler released, one run per job at a time"""
+    lock = job_run_locks.setdefault(task_id, asyncio.Lock())
+    job_run_users[task_id] = job_run_users.get(task_id, 0) + 1
+    try:
+        async with lock:
+            await run_publish_job(task_id, seqs)
+    finally:
+        # A released lock looks free before its next waiter wakes up, so
+        # only drop it once nobody holds or waits for it
+        job_run_users[task_id] -= 1
+        if not job_run_users[task_id]:
+            del job_run_users[task_id]
+            del job_run_locks[task_id]
+
+
+scheduler = PublishScheduler(job_store, release_scheduled_items)
+
+
+def outbox_api(profile_name: str) -> Optional[WordPressAPIAsync]:
+    profiles = storage.load_profiles()
+    profile = next((p for p in profiles if p.name == profile_name), None)
+    return WordPressAPIAsync(profile) if profile else None
+
+
+def finish_waiting_job(task_id: str):
+    """Complete a job that was only waiting for its outbox to drain"""
+    job = job_store.get_job(task_id)
+    if job and job['status'] == "waiting" and not job_store.count_items(
+            task_id, ["outbox", "pending", "in_flight", "scheduled"]):
+        job_store.set_status(task_id, "completed")
+        job_events.publish(task_id, "done", **job_store.get_job(task_id))
+        job_events.forget(task_id)
+
+
+async def publish_from_outbox(entry: Dict, post: Dict):
+    name = entry['payload']['filename']
+    job_store.record_result(entry['job_id'], entry['seq'], PublicationResult(
+        name, True, "Published successfully (from outbox)", post.get('link', 'N/A')
+    ), post_id=post.get('id'))
+    job_events.publish(entry['job_id'], "post_created", seq=entry['seq'], file=name,
+                       id=post.get('id'), url=post.get('link'), status=post.get('status'))
+    PUBLISHED_ITEMS.inc(profile=entry['profile'], result="published")
+    finish_waiting_job(entry['job_id'])
+
+
+async def fail_from_outbox(entry: Dict, error: str):
+    name = entry['payload']['filename']
+    job_store.record_result(entry['job_id'], entry['seq'], PublicationResult(name, False, error))
+    job_events.publish(entry['job_id'], "failed", seq=entry['seq'], file=name, error=error)
+    PUBLISHED_ITEMS.inc(profile=entry['profile'], result="failed")
+    finish_waiting_job(entry['job_id'])
+
+
+outbox_flusher = OutboxFlusher(job_store, outbox_api, publish_from_outbox, fail_from_outbox)
+
+def set_session_cookie(response: Response, session_id: str):
+    response.set_cookie(SESSION_COOKIE, session_id, max_age=SESSION_TTL_SECONDS,
+                        httponly=True, samesite="lax")
+    response.headers['X-Session-Id'] = session_id
+
+
+def get_session(request: Request, response: Response) -> Dict:
+    """Session of the calling client.
+
+    The ID comes from the session cookie or an X-Session-Id header (for API
+    clients); `profile` and `directory` query parameters override the
+    stored values for a single request. Clients without a stored session
+    get a blank one that is only saved (and its cookie sent) by
+    update_session().
+    """
+    session_id = request.cookies.get(SESSION_COOKIE) or request.headers.get('X-Session-Id')
+    with timed("session"):
+        session = session_store.get(session_id) if session_id else None
+        if session is None:
+            session = session_store.new()
+        else:
+            set_session_cookie(response, session['id'])
+    overrides = {key: request.query_params[key] for key in SESSION_FIELDS if request.query_params.get(key)}
+    return {**session, **overrides}
+
+
+def update_session(session: Dict, response: Response, **values):
+    """Store session values and hand the client its session cookie"""
+    session_store.update(session['id'], **values)
+    set_session_cookie(response, session['id'])
+
+
+def session_profile(session: Dict) -> Optional[WordPressProfile]:
+    """The session's selected profile, if it still exists"""
+    if not session['profile']:
+        return None
+    profiles = storage.load_profiles()
+    return next((p for p in profiles if p.name == session['profile']), None)
+
 
-# Mount static files
+def session_articles(session: Dict) -> ArticleManager:
+    """Article manager for the session's articles directory"""
+    return ArticleManager(Path(session['directory']) if session['directory'] else default_articles_dir)
+
+
+def with_session_headers(result: Response, response: Response) -> Response:
+    """Copy the cookie and X-Session-Id that get_session set on the injected
+    response onto a response the route returns itself (FastAPI drops them)"""
+    result.raw_headers.extend(response.headers.raw)
+    return result
+
+
+# Static files and the index page, loaded and precompressed on the first request
 static_path = base_dir / "static"
-if static_path.exists():
-    app.mount("/static", StaticFiles(directory=str(static_path)), name="static")
+assets = AssetBundle(static_path, base_dir / "frontend" / "index.html")
+
+
+@app.api_route("/static/{asset_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_static(asset_path: str, request: Request):
+    """Serve a static asset; content-hashed URLs are cached as immutable"""
+    response = assets.serve(request, asset_path)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return response
+
 
 # Serve the main HTML file
 @app.get("/", response_class=HTMLResponse)
-async def read_root():
+async def read_root(request: Request):
     """Serve the main application page"""
-    html_file = base_dir / "frontend" / "index.html"
-    if html_file.exists():
-        with open(html_file, 'r', encoding='utf-8') as f:
-            return HTMLResponse(content=f.read())
+    response = assets.serve_index(request)
+    if response is not None:
+        return response
     return HTMLResponse(content="<h1>WordPress Publisher</h1><p>Frontend not found</p><p>Base dir: " + str(base_dir) + "</p>")
 
 
@@ -120,7 +336,7 @@ async def read_root():
 async def get_profiles():
     """Get all WordPress profiles"""
     profiles = storage.load_profiles()
-    return [profile.to_dict() for profile in profiles]
+    return [profile.to_public_dict() for profile in profiles]
 
 
 @app.post("/api/profiles")
@@ -153,7 +369,7 @@ async def get_profile(profile_name: str):
         if not profile:
             raise HTTPException(status_code=404, detail="Profile not found")
         
-        return profile.to_dict()
+        return profile.to_public_dict()
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -165,6 +381,7 @@ async def delete_profile(profile_name: str):
         profiles = storage.load_profiles()
         profiles = [p for p in profiles if p.name != profile_name]
         storage.save_profiles(profiles)
+        term_cache.invalidate(profile_name)
         
         return {"success": True, "message": "Profile deleted successfully"}
     except Exception as e:
@@ -181,7 +398,7 @@ async def test_profile_connection(profile_name: str):
         if not profile:
             raise HTTPException(status_code=404, detail="Profile not found")
         
-        api = WordPressAPI(profile)
+        api = WordPressAPIAsync(profile)
         success = await api.test_connection()
         
         return {
@@ -193,9 +410,8 @@ async def test_profile_connection(profile_name: str):
 
 
 @app.post("/api/profiles/{profile_name}/select")
-async def select_profile(profile_name: str):
-    """Select a profile as the current active profile"""
-    global current_profile
+async def select_profile(profile_name: str, response: Response, session: Dict = Depends(get_session)):
+    """Select a profile as the session's active profile"""
     try:
         profiles = storage.load_profiles()
         profile = next((p for p in profiles if p.name == profile_name), None)
@@ -203,73 +419,79 @@ async def select_profile(profile_name: str):
         if not profile:
             raise HTTPException(status_code=404, detail="Profile not found")
         
-        current_profile = profile
+        update_session(session, response, profile=profile.name)
         return {"success": True, "message": f"Profile '{profile_name}' selected"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.get("/api/current-profile")
-async def get_current_profile():
-    """Get the currently selected profile"""
+async def get_current_profile(session: Dict = Depends(get_session)):
+    """Get the session's selected profile"""
+    current_profile = session_profile(session)
     if current_profile:
-        return current_profile.to_dict()
+        return current_profile.to_public_dict()
     return None
 
 
 # WordPress Data Endpoints
 @app.get("/api/wordpress/categories")
-async def get_categories():
-    """Get WordPress categories for current profile"""
+async def get_categories(response: Response, refresh: bool = False, session: Dict = Depends(get_session)):
+    """Get WordPress categories for the session's profile"""
+    current_profile = session_profile(session)
     if not current_profile:
         raise HTTPException(status_code=400, detail="No profile selected")
     
     try:
-        api = WordPressAPI(current_profile)
-        categories = await api.get_categories()
-        return categories
+        api = WordPressAPIAsync(current_profile)
+        categories = await term_cache.get(api, "categories", refresh)
+        return with_session_headers(FastJSONResponse(categories), response)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.get("/api/wordpress/tags")
-async def get_tags():
-    """Get WordPress tags for current profile"""
+async def get_tags(response: Response, refresh: bool = False, session: Dict = Depends(get_session)):
+    """Get WordPress tags for the session's profile"""
+    current_profile = session_profile(session)
     if not current_profile:
         raise HTTPException(status_code=400, detail="No profile selected")
     
     try:
-        api = WordPressAPI(current_profile)
-        tags = await api.get_tags()
-        return tags
+        api = WordPressAPIAsync(current_profile)
+        tags = await term_cache.get(api, "tags", refresh)
+        return with_session_headers(FastJSONResponse(tags), response)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 # Article Management Endpoints
 @app.get("/api/articles/directory")
-async def get_articles_directory():
+async def get_articles_directory(session: Dict = Depends(get_session)):
     """Get current articles directory"""
-    return {"directory": str(article_manager.articles_dir)}
+    return {"directory": str(session_articles(session).articles_dir)}
 
 
 @app.post("/api/articles/directory")
-async def set_articles_directory(directory_data: dict):
+async def set_articles_directory(directory_data: dict, response: Response,
+                                 session: Dict = Depends(get_session)):
     """Set articles directory"""
     try:
         new_dir = directory_data['directory']
+        article_manager = session_articles(session)
         article_manager.set_articles_directory(new_dir)
+        update_session(session, response, directory=str(article_manager.articles_dir))
         return {"success": True, "directory": str(article_manager.articles_dir)}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.get("/api/articles/files")
-async def get_article_files():
+async def get_article_files(response: Response, session: Dict = Depends(get_session)):
     """Get all article files in the current directory"""
     try:
-        files = article_manager.get_article_files()
-        return [file.to_dict() for file in files]
+        files = session_articles(session).get_article_files()
+        return with_session_headers(FastJSONResponse([file.to_dict() for file in files]), response)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -278,7 +500,7 @@ async def get_article_files():
 async def parse_article(file_path: str):
     """Parse an article file and return title and content"""
     try:
-        article_file = article_manager.get_file_by_path(file_path)
+        article_file = ArticleFile(Path(file_path))
         title, content = article_file.parse()
         return {
             "title": title,
@@ -315,8 +537,10 @@ async def upload_featured_image(file: UploadFile = File(...)):
 
 # Publication Endpoint
 @app.post("/api/publish")
-async def publish_articles(publication_data: dict, background_tasks: BackgroundTasks):
+async def publish_articles(publication_data: dict, background_tasks: BackgroundTasks, response: Response,
+                           session: Dict = Depends(get_session)):
     """Publish selected articles to WordPress"""
+    current_profile = session_profile(session)
     if not current_profile:
         raise HTTPException(status_code=400, detail="No profile selected")
     
@@ -329,16 +553,34 @@ async def publish_articles(publication_data: dict, background_tasks: BackgroundT
         if not selected_files:
             raise HTTPException(status_code=400, detail="No files selected")
         
+        if publication_data.get('check_duplicates'):
+            report = await find_article_duplicates(
+                current_profile, selected_files,
+                threshold=publication_data.get('duplicate_threshold', 0.8)
+            )
+            if report['local'] or report['remote']:
+                return with_session_headers(JSONResponse(status_code=409, content={
+                    "success": False,
+                    "message": "Near-duplicate articles found",
+                    "duplicates": report
+                }), response)
+        
+        if publication_data.get('abort_on_preflight'):
+            report = await preflight(current_profile, [
+                {'file_path': path, 'categories': categories, 'tags': tags} for path in selected_files
+            ], featured_image_path)
+            if not report['ok']:
+                return with_session_headers(preflight_failed(report), response)
+        
         # Start background publication task
-        task_id = f"publish_{len(selected_files)}_{hash(str(selected_files))}"
-        background_tasks.add_task(
-            publish_articles_task, 
-            task_id, 
-            selected_files, 
-            categories, 
-            tags, 
-            featured_image_path
-        )
+        task_id = job_store.create_job("publish", current_profile.name, selected_files, {
+            "categories": categories,
+            "tags": tags,
+            "featured_image_path": featured_image_path,
+            "pipeline": publication_data.get('pipeline', {}),
+            "priority": publication_data.get('priority')
+        })
+        background_tasks.add_task(run_publish_job, task_id)
         
         return {
             "success": True,
@@ -349,82 +591,841 @@ async def publish_articles(publication_data: dict, background_tasks: BackgroundT
         raise HTTPException(status_code=400, detail=str(e))
 
 
-# Publication task storage (in production, use Redis or similar)
-publication_results: Dict[str, List[PublicationResult]] = {}
-publication_status: Dict[str, str] = {}
+async def preflight(profile: Optional[WordPressProfile], items: List[Dict],
+                    featured_image_path: Optional[str] = None) -> Dict:
+    """Validate a job's items against local files and the site's cached taxonomy and media"""
+    return await run_preflight(
+        items, WordPressAPIAsync(profile) if profile else None, site_cache, featured_image_path,
+        max_article_bytes=PREFLIGHT_MAX_ARTICLE_BYTES, max_image_bytes=PREFLIGHT_MAX_IMAGE_BYTES
+    )
+
+
+def preflight_failed(report: Dict) -> JSONResponse:
+    return JSONResponse(status_code=422, content={
+        "success": False,
+        "message": f"Preflight failed for {report['failed']} of {report['checked']} articles",
+        "preflight": report
+    })
+
+
+@app.post("/api/preflight/{profile_name}")
+async def preflight_articles(profile_name: str, data: dict, refresh: bool = False):
+    """Check articles before publishing, without writing anything to WordPress.
+
+    JSON body with `articles` (list of {file_path, categories, tags,
+    featured_media, image_path}) or plain `files`, plus job-wide
+    `categories`, `tags` and `featured_image_path` used where an article
+    has none. `refresh` drops the cached taxonomy and media first.
+    """
+    profiles = storage.load_profiles()
+    profile = next((p for p in profiles if p.name == profile_name), None)
+    
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if refresh:
+        site_cache.invalidate(profile.name)
+        term_cache.invalidate(profile.name)
+    
+    try:
+        articles = data.get('articles') or [{'file_path': path} for path in data.get('files', [])]
+        if not articles:
+            raise HTTPException(status_code=400, detail="No articles selected")
+        items = [
+            {
+                **article,
+                'categories': article.get('categories') or data.get('categories'),
+                'tags': article.get('tags') or data.get('tags'),
+            }
+            for article in articles
+        ]
+        return await preflight(profile, items, data.get('featured_image_path'))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def get_min_hasher() -> MinHasher:
+    """Get the shared MinHash signature cache"""
+    global min_hasher
+    if min_hasher is None:
+        min_hasher = MinHasher(storage.storage_path / "signatures.db")
+    return min_hasher
+
+
+async def find_article_duplicates(profile: Optional[WordPressProfile], files: List[str],
+                                  include_remote: bool = True, threshold: float = 0.8) -> Dict:
+    """Near-duplicate report for files against each other and the site's posts"""
+    def read_bodies():
+        bodies = {}
+        for file_path in files:
+            _, content = ArticleFile(Path(file_path)).parse()
+            bodies[file_path] = content
+        return bodies
+
+    local_docs = await asyncio.to_thread(read_bodies)
+
+    remote_docs = {}
+    posts_by_key = {}
+    if include_remote and profile:
+        api = WordPressAPIAsync(profile)
+        for post in await api.get_posts():
+            key = str(post.get('id'))
+            remote_docs[key] = strip_html(post.get('content', {}).get('rendered', ''))
+            posts_by_key[key] = {
+                "id": post.get('id'),
+                "link": post.get('link'),
+                "title": strip_html(post.get('title', {}).get('rendered', ''))
+            }
+
+    report = await asyncio.to_thread(
+        find_near_duplicates, get_min_hasher(), local_docs, remote_docs, threshold
+    )
+    for entry in report['remote']:
+        for match in entry['matches']:
+            match['post'] = posts_by_key[match['post']]
+    return report
+
+
+@app.post("/api/duplicates/{profile_name}")
+@handle_errors
+async def check_duplicates(profile_name: str, data: dict, session: Dict = Depends(get_session)):
+    """Flag near-duplicate articles locally and against the site's published posts"""
+    try:
+        profiles = storage.load_profiles()
+        profile = next((p for p in profiles if p.name == profile_name), None)
+        
+        if not profile:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        
+        files = data.get('files') or [str(f.path) for f in session_articles(session).get_article_files()]
+        report = await find_article_duplicates(
+            profile, files,
+            include_remote=data.get('include_remote', True),
+            threshold=data.get('threshold', 0.8)
+        )
+        return {
+            "success": True,
+            "checked": len(files),
+            "duplicates": report
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def job_upload_dir(task_id: str) -> Path:
+    """Directory holding the images uploaded with a batch job"""
+    return storage.storage_path / "uploads" / task_id
+
 
+@app.post("/api/publish/batch/{profile_name}")
+async def publish_batch(profile_name: str, request: Request, background_tasks: BackgroundTasks):
+    """Publish many articles in one request, each with its own options.
 
-async def publish_articles_task(task_id: str, selected_files: List[str], 
-                               categories: List[int], tags: List[int], 
-                               featured_image_path: Optional[str]):
-    """Background task to publish articles"""
-    global publication_results, publication_status
+    Multipart form with an `articles` field holding a JSON list of
+    {file_path, status, categories, tags, featured_media, image}, where
+    `image` names another form field carrying that article's featured image.
+    An optional `pipeline` field (JSON) overrides the pipeline worker counts
+    and `priority` ("interactive" or "bulk") the worker pool priority. With
+    `abort_on_preflight` set to true nothing is published unless every
+    article passes the preflight checks.
+    The job runs server-side concurrently; follow it via
+    /api/publish/events/{task_id}.
+    """
+    profiles = storage.load_profiles()
+    profile = next((p for p in profiles if p.name == profile_name), None)
     
-    publication_status[task_id] = "running"
-    results = []
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
     
+    form = await request.form()
     try:
-        api = WordPressAPI(current_profile)
-        
-        # Upload featured image if provided
-        featured_media_id = None
-        if featured_image_path:
-            featured_media_id = await api.upload_image(Path(featured_image_path))
-            if not featured_media_id:
-                results.append(PublicationResult(
+        articles = json.loads(form.get('articles') or '[]')
+    except ValueError:
+        raise HTTPException(status_code=400, detail="articles must be a JSON list")
+    if not articles:
+        raise HTTPException(status_code=400, detail="No articles selected")
+    if any(not article.get('file_path') for article in articles):
+        raise HTTPException(status_code=400, detail="File path is required")
+    
+    item_options = [
+        {
+            key: article[key]
+            for key in ('status', 'categories', 'tags', 'featured_media')
+            if article.get(key) is not None
+        }
+        for article in articles
+    ]
+    
+    if form.get('abort_on_preflight') in ('1', 'true'):
+        report = await preflight(profile, articles)
+        for seq, article in enumerate(articles):
+            upload = form.get(article['image']) if article.get('image') else None
+            if upload is None or not hasattr(upload, 'filename'):
+                continue
+            head = await upload.read(16)
+            await upload.seek(0)
+            errors = check_image_data(upload.filename, head, upload.size or 0, PREFLIGHT_MAX_IMAGE_BYTES)
+            if errors:
+                entry = next((e for e in report['items'] if e['seq'] == seq), None)
+                if entry is None:
+                    entry = {'seq': seq, 'file': Path(article['file_path']).name, 'errors': [], 'warnings': []}
+                    report['items'].append(entry)
+                    report['failed'] += 1
+                entry['errors'].extend(errors)
+                report['ok'] = False
+        if not report['ok']:
+            return preflight_failed(report)
+    
+    task_id = job_store.create_job(
+        "batch", profile.name, [article['file_path'] for article in articles],
+        {"status": "publish", "pipeline": json.loads(form.get('pipeline') or '{}'),
+         "priority": form.get('priority')}, item_options
+    )
+    
+    # Keep images on disk next to the job so a resume can still upload them
+    upload_dir = job_upload_dir(task_id)
+    for seq, article in enumerate(articles):
+        upload = form.get(article['image']) if article.get('image') else None
+        if upload is None or not hasattr(upload, 'filename'):
+            continue
+        upload_dir.mkdir(parents=True, exist_ok=True)
+        image_path = upload_dir / f"{seq}_{Path(upload.filename).name}"
+        
+        def save(source=upload.file, destination=image_path):
+            with open(destination, "wb") as buffer:
+                shutil.copyfileobj(source, buffer)
+        
+        await asyncio.to_thread(save)
+        job_store.update_item_options(task_id, seq, image_path=str(image_path))
+    
+    background_tasks.add_task(run_publish_job, task_id)
+    return {
+        "success": True,
+        "message": f"Publishing {len(articles)} articles...",
+        "task_id": task_id
+    }
+
+
+def idempotency_key(job_id: str, seq: int, path: str) -> str:
+    """Stable key for one job item, embedded in the post to detect duplicates"""
+    return hashlib.sha256(f"{job_id}:{seq}:{path}".encode()).hexdigest()[:32]
+
+
+def idempotency_marker(key: str) -> str:
+    """Invisible HTML comment carrying the key; WordPress search can find it"""
+    return f"<!-- wpp-idempotency-key:{key} -->"
+
+
+async def run_publish_job(task_id: str, seqs: Optional[List[int]] = None):
+    """Background task to publish a job's unfinished items.
+
+    Each item is checkpointed as in_flight (with its idempotency key) before
+    the post is created and marked completed/failed afterwards, so the job
+    can be resumed after a crash without republishing finished items.
+    With seqs, only those pending items are published (a scheduler release).
+    """
+    job = job_store.get_job(task_id)
+    job_store.set_status(task_id, "running")
+    
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(JOB_STALE_SECONDS / 4)
+            job_store.touch(task_id)
+    
+    heartbeat_task = asyncio.create_task(heartbeat())
+    meter = ThroughputMeter()
+    
+    def progress():
+        counts = job_store.get_job(task_id)
+        pipeline = active_pipelines.get(task_id)
+        job_events.publish(task_id, "progress", total=counts['total'], completed=counts['completed'],
+                           failed=counts['failed'], pipeline=pipeline.stats() if pipeline else None,
+                           **meter.tick())
+    
+    job_events.publish(task_id, "started", total=job['total'])
+    try:
+        profiles = storage.load_profiles()
+        profile = next((p for p in profiles if p.name == job['profile']), None)
+        if not profile:
+            raise Exception(f"Profile '{job['profile']}' not found")
+        
+        params = job['params']
+        categories = params.get('categories')
+        tags = params.get('tags')
+        api = WordPressAPIAsync(profile)
+        if params.get('priority') in ('interactive', 'bulk'):
+            priority = INTERACTIVE if params['priority'] == 'interactive' else BULK
+        else:
+            priority = INTERACTIVE if job['total'] <= INTERACTIVE_JOB_MAX_ITEMS and seqs is None else BULK
+        
+        # Upload featured image once; the media ID survives a resume
+        featured_media_id = params.get('featured_media_id')
+        featured_image_path = params.get('featured_image_path')
+        if featured_image_path and not featured_media_id:
+            async with worker_pool.slot(profile.name, priority):
+                featured_media_id = await api.upload_image(Path(featured_image_path))
+            if featured_media_id:
+                job_store.update_params(task_id, featured_media_id=featured_media_id)
+                job_events.publish(task_id, "media_uploaded", file=Path(featured_image_path).name,
+                                   media_id=featured_media_id)
+            else:
+                job_store.add_result(task_id, PublicationResult(
                     "featured_image", False, "Failed to upload featured image"
                 ))
         
-        # Publish each file
-        for file_path in selected_files:
+        # Items caught mid-request by a crash may already exist on the site;
+        # scheduler releases leave them to an explicit resume
+        for item in job_store.get_items(task_id, status="in_flight") if seqs is None else []:
+            existing = None
             try:
-                article_file = article_manager.get_file_by_path(file_path)
-                title, content = article_file.parse()
-                
-                result = await api.create_post(
-                    title=title,
-                    content=content,
-                    categories=categories if categories else None,
-                    tags=tags if tags else None,
-                    featured_media=featured_media_id
-                )
-                
-                if result:
-                    results.append(PublicationResult(
-                        article_file.name, True, "Published successfully", 
-                        result.get('link', 'N/A')
-                    ))
-                else:
-                    results.append(PublicationResult(
-                        article_file.name, False, "Unknown error during publication"
-                    ))
-                    
+                existing = await api.find_post(item['idempotency_key'])
             except Exception as e:
-                results.append(PublicationResult(
-                    Path(file_path).name, False, str(e)
-                ))
+                logger.warning(f"Could not check {item['filename']} for an existing post: {e}")
+            if existing:
+                job_store.record_result(task_id, item['seq'], PublicationResult(
+                    item['filename'], True, "Published successfully (recovered)", existing.get('link')
+                ), post_id=existing.get('id'))
+        if seqs is None:
+            job_store.reset_items(task_id, ["in_flight"])
         
-        publication_results[task_id] = results
-        publication_status[task_id] = "completed"
+        async def parse_stage(item: PipelineItem):
+            item.title, item.content = await asyncio.to_thread(
+                ArticleFile(Path(item.path)).parse
+            )
+            # Per-item options override the job-wide ones
+            item.media_id = item.options.get('featured_media') or featured_media_id
+            item.needs_media = bool(item.options.get('image_path') and not item.options.get('featured_media'))
+        
+        def check_site():
+            # A site known to be down is not worth a full retry cycle per item
+            if outbox_flusher.is_down(profile.name):
+                raise WordPressUnavailableError(f"{profile.url} is down", maybe_sent=False)
+        
+        async def media_stage(item: PipelineItem):
+            check_site()
+            async with worker_pool.slot(profile.name, priority):
+                item.media_id = await api.upload_image(Path(item.options['image_path']))
+            if not item.media_id:
+                raise Exception("Failed to upload featured image")
+            job_store.update_item_options(task_id, item.seq, featured_media=item.media_id)
+            job_events.publish(task_id, "media_uploaded", seq=item.seq, file=Path(item.path).name,
+                               media_id=item.media_id)
+        
+        def post_fields(item: PipelineItem) -> Dict[str, Any]:
+            key = idempotency_key(task_id, item.seq, item.path)
+            fields = {
+                'title': item.title,
+                'content': f"{item.content}\n{idempotency_marker(key)}",
+                'status': item.options.get('status', params.get('status', 'publish')),
+                'categories': item.options.get('categories') or categories,
+                'tags': item.options.get('tags') or tags,
+                'featured_media': item.media_id,
+                'date_gmt': item.options.get('date_gmt'),
+            }
+            return {name: value for name, value in fields.items() if value}
+        
+        async def post_stage(item: PipelineItem):
+            name = Path(item.path).name
+            key = idempotency_key(task_id, item.seq, item.path)
+            job_store.mark_in_flight(task_id, item.seq, key)
+            job_events.publish(task_id, "item_started", seq=item.seq, file=name)
+            check_site()
+            async with worker_pool.slot(profile.name, priority):
+                result = await api.create_post(**post_fields(item))
+            if not result:
+                raise Exception("Unknown error during publication")
+            
+            job_store.record_result(task_id, item.seq, PublicationResult(
+                name, True, "Published successfully", result.get('link', 'N/A')
+            ), post_id=result.get('id'))
+            job_events.publish(task_id, "post_created", seq=item.seq, file=name,
+                               id=result.get('id'), url=result.get('link'), status=result.get('status'))
+            PUBLISHED_ITEMS.inc(profile=profile.name, result="published")
+            progress()
+        
+        async def on_error(item: PipelineItem, error: Exception):
+            name = Path(item.path).name
+            if isinstance(error, WordPressUnavailableError) and item.content is not None:
+                # Park the post until the site is back instead of failing it
+                outbox_flusher.mark_down(profile.name)
+                job_store.add_to_outbox(task_id, item.seq, profile.name, {
+                    'filename': name,
+                    'idempotency_key': idempotency_key(task_id, item.seq, item.path),
+                    'image_path': item.options.get('image_path') if not item.media_id else None,
+                    'post': post_fields(item),
+                }, str(error), error.maybe_sent)
+                job_events.publish(task_id, "queued", seq=item.seq, file=name, error=str(error))
+                PUBLISHED_ITEMS.inc(profile=profile.name, result="queued")
+                progress()
+                return
+            job_store.record_result(task_id, item.seq, PublicationResult(name, False, str(error)))
+            job_events.publish(task_id, "failed", seq=item.seq, file=name, error=str(error))
+            PUBLISHED_ITEMS.inc(profile=profile.name, result="failed")
+            progress()
+        
+        # Publish each unfinished file
+        knobs = {**PIPELINE_DEFAULTS, **params.get('pipeline', {})}
+        pipeline = PublishPipeline(
+            parse_stage, media_stage, post_stage, on_error,
+            parse_workers=int(knobs['parse_workers']),
+            media_workers=int(knobs['media_workers']),
+            post_workers=int(knobs['post_workers']),
+            queue_size=int(knobs['queue_size']),
+            on_finished=lambda item: job_store.save_trace(task_id, item.seq, item.trace.to_list())
+        )
+        active_pipelines[task_id] = pipeline
+        await pipeline.run(
+            PipelineItem(item['seq'], item['path'], item['options'])
+            for item in job_store.get_items(task_id, status="pending")
+            if seqs is None or item['seq'] in seqs
+        )
+        
+        if job_store.count_items(task_id, ["scheduled"]):
+            job_store.set_status(task_id, "scheduled")
+        elif job_store.count_items(task_id, ["outbox"]):
+            job_store.set_status(task_id, "waiting")
+        elif not job_store.count_items(task_id, ["pending", "in_flight"]):
+            job_store.set_status(task_id, "completed")
         
     except Exception as e:
-        publication_status[task_id] = "error"
-        publication_results[task_id] = [PublicationResult(
+        job_store.add_result(task_id, PublicationResult(
             "task", False, f"Task failed: {str(e)}"
-        )]
+        ))
+        job_store.set_status(task_id, "error")
+    finally:
+        heartbeat_task.cancel()
+        active_pipelines.pop(task_id, None)
+        job = job_store.get_job(task_id)
+        if job['failed'] == 0 and job['status'] == "completed":
+            shutil.rmtree(job_upload_dir(task_id), ignore_errors=True)
+        if job['status'] in ("scheduled", "waiting"):
+            job_events.publish(task_id, "waiting", **job)
+        else:
+            job_events.publish(task_id, "done", **job)
+            job_events.forget(task_id)
+
+
+@app.post("/api/publish/resume/{task_id}")
+async def resume_publication(task_id: str, background_tasks: BackgroundTasks, retry_failed: bool = False):
+    """Resume a crashed or interrupted job, publishing only unfinished items"""
+    job = job_store.get_job(task_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job['kind'] not in ("publish", "batch", "scheduled"):
+        raise HTTPException(status_code=400, detail=f"Jobs of kind '{job['kind']}' cannot be resumed")
+    if not job_store.claim(task_id, JOB_STALE_SECONDS):
+        raise HTTPException(status_code=409, detail="Job is still running")
+    
+    if retry_failed:
+        job_store.reset_items(task_id, ["failed"])
+    unfinished = len(job_store.get_items(task_id, status="pending")) + \
+        len(job_store.get_items(task_id, status="in_flight"))
+    if not unfinished:
+        job_store.set_status(task_id, job['status'] if job['status'] != "running" else "completed")
+        return {"success": True, "message": "Nothing left to publish", "task_id": task_id}
+    
+    background_tasks.add_task(run_publish_job, task_id)
+    return {
+        "success": True,
+        "message": f"Resuming {unfinished} articles...",
+        "task_id": task_id
+    }
+
+
+@app.post("/api/publish/schedule/{profile_name}")
+async def schedule_publication(profile_name: str, data: dict, background_tasks: BackgroundTasks):
+    """Drip-feed articles to WordPress over time.
+
+    JSON body with `articles` (list of {file_path, publish_at, status,
+    categories, tags, featured_media}) or plain `files`, plus `start_at`
+    (ISO 8601 or Unix time, default now) and `rate_per_hour` or
+    `interval_seconds` to space out the articles without an explicit
+    publish_at. Items are held in the job store and released by the
+    scheduler when due. With `use_wp_schedule` every post is created right
+    away as status=future with its date, and WordPress publishes it.
+    """
+    profiles = storage.load_profiles()
+    profile = next((p for p in profiles if p.name == profile_name), None)
+    
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    try:
+        articles = data.get('articles') or [{'file_path': path} for path in data.get('files', [])]
+        if not articles:
+            raise HTTPException(status_code=400, detail="No articles selected")
+        if any(not article.get('file_path') for article in articles):
+            raise HTTPException(status_code=400, detail="File path is required")
+        
+        rate_per_hour = data.get('rate_per_hour')
+        if data.get('interval_seconds'):
+            rate_per_hour = 3600.0 / float(data['interval_seconds'])
+        if rate_per_hour is not None and float(rate_per_hour) <= 0:
+            raise HTTPException(status_code=400, detail="rate_per_hour must be positive")
+        start_at = parse_time(data['start_at']) if data.get('start_at') else time.time()
+        release_times = plan_times(
+            len(articles), start_at, float(rate_per_hour) if rate_per_hour else None,
+            [parse_time(article['publish_at']) if article.get('publish_at') else None
+             for article in articles]
+        )
+        
+        item_options = [
+            {
+                key: article[key]
+                for key in ('status', 'categories', 'tags', 'featured_media')
+                if article.get(key) is not None
+            }
+            for article in articles
+        ]
+        if data.get('abort_on_preflight'):
+            report = await preflight(profile, [
+                {
+                    **article,
+                    'categories': article.get('categories') or data.get('categories'),
+                    'tags': article.get('tags') or data.get('tags'),
+                }
+                for article in articles
+            ])
+            if not report['ok']:
+                return preflight_failed(report)
+        
+        use_wp_schedule = bool(data.get('use_wp_schedule'))
+        if use_wp_schedule:
+            # WordPress holds the posts; only times in the past publish at once
+            now = time.time()
+            for options, due in zip(item_options, release_times):
+                if due > now:
+                    options['status'] = 'future'
+                    options['date_gmt'] = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(due))
+        
+        task_id = job_store.create_job(
+            "scheduled", profile.name, [article['file_path'] for article in articles],
+            {
+                "status": data.get('status', 'publish'),
+                "categories": data.get('categories', []),
+                "tags": data.get('tags', []),
+                "rate_per_hour": rate_per_hour,
+                "use_wp_schedule": use_wp_schedule,
+                "pipeline": data.get('pipeline', {})
+            },
+            item_options,
+            None if use_wp_schedule else release_times
+        )
+        if use_wp_schedule:
+            background_tasks.add_task(run_publish_job, task_id)
+        else:
+            scheduler.notify()
+        
+        return {
+            "success": True,
+            "message": f"Scheduled {len(articles)} articles",
+            "task_id": task_id,
+            "first_at": min(release_times),
+            "last_at": max(release_times)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.delete("/api/publish/schedule/{task_id}")
+async def cancel_scheduled_publication(task_id: str):
+    """Cancel a drip-feed job's articles that have not been released yet"""
+    job = job_store.get_job(task_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    cancelled = job_store.cancel_scheduled(task_id)
+    if job['status'] == "scheduled":
+        job_store.set_status(task_id, "completed")
+    return {"success": True, "message": f"Cancelled {cancelled} articles", "task_id": task_id}
 
 
 @app.get("/api/publish/status/{task_id}")
-async def get_publication_status(task_id: str):
-    """Get publication task status"""
-    status = publication_status.get(task_id, "not_found")
-    results = publication_results.get(task_id, [])
+async def get_publication_status(task_id: str, trace: bool = False):
+    """Get publication task status; `trace` adds per-item stage timings and their percentiles"""
+    job = job_store.get_job(task_id)
+    if not job:
+        return {"task_id": task_id, "status": "not_found", "results": []}
     
-    return {
+    results = job_store.get_results(task_id, with_trace=trace)
+    status = {
         "task_id": task_id,
-        "status": status,
-        "results": [result.to_dict() for result in results]
+        "status": job['status'],
+        "total": job['total'],
+        "completed": job['completed'],
+        "failed": job['failed'],
+        "scheduled": job['scheduled'],
+        "pipeline": active_pipelines[task_id].stats() if task_id in active_pipelines else None,
+        "results": [result.to_dict() for result in results],
+        # Waiting in the outbox for their site to come back
+        "parked": [item['filename'] for item in job_store.get_items(task_id, status="outbox")]
     }
+    if trace:
+        status["timing"] = summarize_traces([item['trace'] for item in job_store.get_traces(task_id)])
+    return FastJSONResponse(status)
+
+
+@app.get("/api/publish/trace/{task_id}")
+async def get_publication_trace(task_id: str, format: str = "json"):
+    """Stage timings of a job's articles: per-item spans plus percentiles (json),
+    or a Trace Event file for chrome://tracing / Perfetto (chrome)"""
+    job = job_store.get_job(task_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if format not in ("json", "chrome"):
+        raise HTTPException(status_code=400, detail="format must be json or chrome")
+    
+    items = job_store.get_traces(task_id)
+    if format == "chrome":
+        return FastJSONResponse(chrome_trace(items), headers={
+            "Content-Disposition": f'attachment; filename="trace-{task_id}.json"'
+        })
+    return FastJSONResponse({
+        "task_id": task_id,
+        "status": job['status'],
+        "summary": summarize_traces([item['trace'] for item in items]),
+        "items": items
+    })
+
+
+@app.get("/api/publish/events/{task_id}")
+async def stream_publication_events(task_id: str):
+    """Server-Sent Events stream of a job's per-item progress, ending with done (or
+    waiting, once only parked or scheduled items are left)"""
+    job = job_store.get_job(task_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def event_stream():
+        with job_events.subscribe(task_id) as queue:
+            # Snapshot first so late subscribers start from the current counts
+            snapshot = job_store.get_job(task_id)
+            yield format_sse("snapshot", snapshot)
+            if snapshot['status'] in ("completed", "error"):
+                yield format_sse("done", snapshot)
+                return
+            # Parked or drip-fed items can take hours: the stream ends here too
+            if snapshot['status'] in ("scheduled", "waiting"):
+                yield format_sse("waiting", snapshot)
+                return
+            
+            last_seen = snapshot['updated_at']
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=SSE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    # The job may be running in another worker process
+                    current = job_store.get_job(task_id)
+                    if current['status'] in ("completed", "error"):
+                        yield format_sse("done", current)
+                        return
+                    if current['status'] in ("scheduled", "waiting"):
+                        yield format_sse("waiting", current)
+                        return
+                    if current['updated_at'] != last_seen:
+                        last_seen = current['updated_at']
+                        yield format_sse("snapshot", current)
+                    else:
+                        yield ": keepalive\n\n"
+                    continue
+                yield format_sse(message['event'], message['data'], message['id'])
+                if message['event'] in ("done", "waiting"):
+                    return
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/publish/pool")
+async def get_worker_pool_stats():
+    """Request slots in use and waiting, per profile and priority"""
+    return worker_pool.stats()
+
+
+@app.get("/api/publish/outbox")
+async def get_outbox_status():
+    """Posts parked per profile while their site is unreachable"""
+    return outbox_flusher.status()
+
+
+@app.post("/api/publish/outbox/{profile_name}/flush")
+async def flush_outbox(profile_name: str):
+    """Probe a profile's site now and send its parked posts if it is up"""
+    await outbox_flusher.flush_profile(profile_name)
+    return outbox_flusher.status().get(profile_name, {"parked": 0, "down": False, "next_probe_at": None})
+
+
+@app.get("/api/publish/jobs")
+async def list_publication_jobs(status: Optional[str] = None, profile: Optional[str] = None,
+                                limit: int = 50, offset: int = 0):
+    """Publication job history, most recent first"""
+    return FastJSONResponse(job_store.list_jobs(status=status, profile=profile,
+                                                limit=max(1, min(limit, 500)), offset=max(0, offset)))
+
+
+class RequestStreamingResponse(StreamingResponse):
+    """StreamingResponse whose body iterator itself consumes the request body.
+
+    StreamingResponse normally drains `receive()` to watch for disconnects,
+    which would steal the request body chunks the iterator is still reading.
+    """
+    
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+@app.post("/api/publish/archive/{profile_name}")
+async def publish_archive(profile_name: str, request: Request, status: str = 'publish',
+                          categories: str = '', tags: str = ''):
+    """Publish articles from a ZIP/tar upload while it is still being received.
+
+    The request body is the raw archive. `.md`/`.txt` members are published
+    as they are read; an image member with the same stem (placed before the
+    article or right after it) becomes its featured image. Progress is
+    streamed back as one JSON object per line.
+    """
+    profiles = storage.load_profiles()
+    profile = next((p for p in profiles if p.name == profile_name), None)
+    
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    category_ids = [int(c) for c in categories.split(',') if c.strip()]
+    tag_ids = [int(t) for t in tags.split(',') if t.strip()]
+    task_id = job_store.create_job("archive", profile.name, [], {
+        "status": status,
+        "categories": category_ids,
+        "tags": tag_ids
+    })
+    job_store.set_status(task_id, "running")
+    api = WordPressAPIAsync(profile)
+    events: asyncio.Queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(ARCHIVE_PUBLISH_CONCURRENCY)
+    
+    async def emit(event: dict):
+        await events.put(event)
+        job_events.publish(task_id, event['event'], **{k: v for k, v in event.items() if k != 'event'})
+    
+    async def publish_entry(seq: int, name: str, text: str, image: Optional[tuple]):
+        async with semaphore:
+            try:
+                title, content = parse_article_text(text, Path(name).stem)
+                featured_media = None
+                if image:
+                    async with worker_pool.slot(profile.name, BULK):
+                        featured_media = await api.upload_image_data(image[1], Path(image[0]).name)
+                    await emit({"event": "media_uploaded", "file": name,
+                                      "image": image[0], "media_id": featured_media})
+                async with worker_pool.slot(profile.name, BULK):
+                    result = await api.create_post(
+                        title=title,
+                        content=content,
+                        status=status,
+                        categories=category_ids or None,
+                        tags=tag_ids or None,
+                        featured_media=featured_media
+                    )
+                if not result:
+                    raise Exception("Unknown error during publication")
+                job_store.record_result(task_id, seq, PublicationResult(
+                    name, True, "Published successfully", result.get('link', 'N/A')
+                ))
+                PUBLISHED_ITEMS.inc(profile=profile.name, result="published")
+                await emit({"event": "published", "file": name,
+                                  "id": result.get('id'), "url": result.get('link')})
+            except Exception as e:
+                job_store.record_result(task_id, seq, PublicationResult(name, False, str(e)))
+                PUBLISHED_ITEMS.inc(profile=profile.name, result="failed")
+                await emit({"event": "failed", "file": name, "error": str(e)})
+    
+    async def read_archive():
+        articles: Dict[str, tuple] = {}  # stem -> (seq, name, text) waiting for an image
+        images: Dict[str, tuple] = {}  # stem -> (name, bytes) waiting for an article
+        tasks = []
+        
+        def dispatch(stem: str):
+            seq, name, text = articles.pop(stem)
+            tasks.append(asyncio.create_task(publish_entry(seq, name, text, images.pop(stem, None))))
+        
+        try:
+            async for entry in iter_archive(request.stream()):
+                path = Path(entry.name)
+                stem = str(path.with_suffix(''))
+                suffix = path.suffix.lower()
+                if path.name.startswith('.') or '__MACOSX' in path.parts:
+                    kind = "skipped"
+                elif suffix in ARTICLE_EXTENSIONS:
+                    kind = "article"
+                elif suffix in IMAGE_EXTENSIONS:
+                    kind = "image"
+                else:
+                    kind = "skipped"
+                await emit({"event": "entry", "name": entry.name, "kind": kind, "size": entry.size})
+                
+                # An article's image is expected next to it; anything else releases it
+                for waiting in [s for s in articles if s != stem]:
+                    dispatch(waiting)
+                
+                if kind == "article":
+                    seq = job_store.add_item(task_id, entry.name)
+                    articles[stem] = (seq, entry.name, entry.data.decode('utf-8', 'replace'))
+                    if stem in images:
+                        dispatch(stem)
+                elif kind == "image":
+                    images[stem] = (entry.name, entry.data)
+                    if stem in articles:
+                        dispatch(stem)
+            
+            for waiting in list(articles):
+                dispatch(waiting)
+            for name, _ in images.values():
+                await emit({"event": "unmatched_image", "name": name})
+            await asyncio.gather(*tasks)
+            job_store.set_status(task_id, "completed")
+        except Exception as e:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            message = str(e) if isinstance(e, ArchiveError) else f"Archive ingestion failed: {e}"
+            job_store.add_result(task_id, PublicationResult("archive", False, message))
+            job_store.set_status(task_id, "error")
+            await emit({"event": "error", "error": message})
+        finally:
+            await events.put(None)
+            job_events.publish(task_id, "done", **job_store.get_job(task_id))
+            job_events.forget(task_id)
+    
+    async def stream_events():
+        reader = asyncio.create_task(read_archive())
+        yield json.dumps({"event": "started", "task_id": task_id}) + "\n"
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield json.dumps(event) + "\n"
+        await reader
+        job = job_store.get_job(task_id)
+        yield json.dumps({
+            "event": "done",
+            "task_id": task_id,
+            "status": job['status'],
+            "published": job['completed'],
+            "failed": job['failed']
+        }) + "\n"
+    
+    return RequestStreamingResponse(
+        stream_events(),
+        media_type="application/x-ndjson",
+        headers={"X-Task-Id": task_id}
+    )
 
 
 # New endpoints for the redesigned frontend
@@ -449,7 +1450,8 @@ async def upload_image(profile_name: str, file: UploadFile = File(...)):
         try:
             # Use async API
             api = WordPressAPIAsync(profile)
-            media_id = await api.upload_image(Path(tmp_file_path))
+            async with worker_pool.slot(profile.name, INTERACTIVE):
+                media_id = await api.upload_image(Path(tmp_file_path))
             
             if media_id:
                 return {"success": True, "media_id": media_id}
@@ -485,19 +1487,20 @@ async def publish_single_article(profile_name: str, article_data: dict):
             raise HTTPException(status_code=400, detail="File path is required")
         
         # Parse article content (async file reading)
-        article_file = article_manager.get_file_by_path(file_path)
+        article_file = ArticleFile(Path(file_path))
         title, content = article_file.parse()
         
         # Publish to WordPress using async API
         api = WordPressAPIAsync(profile)
-        result = await api.create_post(
-            title=title,
-            content=content,
-            status=status,
-            categories=categories if categories else None,
-            tags=tags if tags else None,
-            featured_media=featured_media
-        )
+        async with worker_pool.slot(profile.name, INTERACTIVE):
+            result = await api.create_post(
+                title=title,
+                content=content,
+                status=status,
+                categories=categories if categories else None,
+                tags=tags if tags else None,
+                featured_media=featured_media
+            )
         
         if result:
             return {
@@ -509,13 +1512,15 @@ async def publish_single_article(profile_name: str, article_data: dict):
         else:
             raise HTTPException(status_code=400, detail="Failed to publish article")
             
+    except WordPressUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.get("/api/categories/{profile_name}")
 @handle_errors
-async def get_profile_categories(profile_name: str):
+async def get_profile_categories(profile_name: str, refresh: bool = False):
     """Get WordPress categories for specific profile - Async version"""
     try:
         profiles = storage.load_profiles()
@@ -525,15 +1530,15 @@ async def get_profile_categories(profile_name: str):
             raise HTTPException(status_code=404, detail="Profile not found")
         
         api = WordPressAPIAsync(profile)
-        categories = await api.get_categories()
-        return categories
+        categories = await term_cache.get(api, "categories", refresh)
+        return FastJSONResponse(categories)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.get("/api/tags/{profile_name}")
 @handle_errors
-async def get_profile_tags(profile_name: str):
+async def get_profile_tags(profile_name: str, refresh: bool = False):
     """Get WordPress tags for specific profile - Async version"""
     try:
         profiles = storage.load_profiles()
@@ -543,8 +1548,8 @@ async def get_profile_tags(profile_name: str):
             raise HTTPException(status_code=404, detail="Profile not found")
         
         api = WordPressAPIAsync(profile)
-        tags = await api.get_tags()
-        return tags
+        tags = await term_cache.get(api, "tags", refresh)
+        return FastJSONResponse(tags)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -617,9 +1622,9 @@ async def test_profile_connection(profile_name: str):
 
 
 @app.get("/api/current-directory")
-async def get_current_directory():
+async def get_current_directory(session: Dict = Depends(get_session)):
     """Get current articles directory"""
-    return {"directory": str(article_manager.articles_dir)}
+    return {"directory": str(session_articles(session).articles_dir)}
 
 
 @app.post("/api/change-directory")
@@ -631,27 +1636,29 @@ async def change_directory():
 
 
 @app.post("/api/set-directory")
-async def set_directory(data: dict):
+async def set_directory(data: dict, response: Response, session: Dict = Depends(get_session)):
     """Set articles directory from native app"""
-    global article_manager
     try:
         new_directory = data.get('directory')
         if not new_directory:
             raise HTTPException(status_code=400, detail="Directory path is required")
         
-        # Update article manager with new directory
+        # Remember the directory for this session only
+        article_manager = session_articles(session)
         article_manager.set_articles_directory(new_directory)
+        update_session(session, response, directory=str(article_manager.articles_dir))
         return {"success": True, "message": f"Directory changed to {new_directory}"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.get("/api/files")
-async def get_article_files():
+async def get_article_files(response: Response, session: Dict = Depends(get_session)):
     """Get list of article files"""
     try:
-        files = article_manager.get_article_files()
-        return [
+        files = session_articles(session).get_article_files()
+        # Returned directly: large lists skip FastAPI's jsonable_encoder pass
+        return with_session_headers(FastJSONResponse([
             {
                 "name": f.name,
                 "path": str(f.path),
@@ -659,7 +1666,40 @@ async def get_article_files():
                 "modified": f.modified.isoformat()
             }
             for f in files
-        ]
+        ]), response)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def get_search_index(articles_dir: Path) -> SearchIndex:
+    """Get (or create) the search index for an articles directory"""
+    key = str(articles_dir)
+    index = search_indexes.get(key)
+    if index is None:
+        index = SearchIndex.for_directory(articles_dir, storage.storage_path)
+        search_indexes[key] = index
+        while len(search_indexes) > MAX_SEARCH_INDEXES:
+            search_indexes.popitem(last=False)
+    else:
+        search_indexes.move_to_end(key)
+    return index
+
+
+@app.get("/api/files/search")
+async def search_article_files(q: str, limit: int = 20, session: Dict = Depends(get_session)):
+    """Full-text search over article files (terms and "quoted phrases")"""
+    try:
+        start_time = time.perf_counter()
+        index = get_search_index(session_articles(session).articles_dir)
+        # Only files whose mtime changed are re-read; run off the event loop
+        await asyncio.to_thread(index.refresh)
+        results = await asyncio.to_thread(index.search, q, max(1, min(limit, 200)))
+        return {
+            "query": q,
+            "total": len(results),
+            "results": results,
+            "took_ms": round((time.perf_counter() - start_time) * 1000, 2)
+        }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -671,6 +1711,73 @@ async def health_check():
     return {"status": "healthy", "message": "WordPress Publisher API is running"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics: route and WordPress latency, retries, queue depth, throughput"""
+    return Response(content=registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+def require_profiling_token(request: Request):
+    """Profiling routes need PROFILING_TOKEN in the X-Profile-Token header"""
+    if not PROFILING_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not check_token(PROFILING_TOKEN, request.headers.get('X-Profile-Token')):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+
+@app.get("/api/profiling", dependencies=[Depends(require_profiling_token)])
+async def list_profiles():
+    """Captures kept in memory, newest first"""
+    return profile_store.list()
+
+
+@app.post("/api/profiling/capture", dependencies=[Depends(require_profiling_token)])
+async def capture_profile(seconds: float = 10, mode: str = "sample", threads: str = "loop"):
+    """Profile whatever the server runs (e.g. a publish job) for a number of seconds.
+
+    mode is "sample" (collapsed stacks for flamegraphs) or "cprofile" (the
+    event loop thread only); threads is "loop" or "all", the latter also
+    sampling the threads file reads and uploads are offloaded to.
+    """
+    if mode not in ('sample', 'cprofile'):
+        raise HTTPException(status_code=400, detail="mode must be sample or cprofile")
+    if threads not in ('loop', 'all'):
+        raise HTTPException(status_code=400, detail="threads must be loop or all")
+    seconds = max(0.1, min(seconds, PROFILING_MAX_SECONDS))
+    
+    capture_id = new_capture_id()
+    try:
+        capture = Capture(mode, [threading.get_ident()] if threads == "loop" else None).start()
+    except RuntimeError:
+        raise HTTPException(status_code=409, detail="Another cProfile capture is running")
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        data = capture.stop()
+    profile_store.add(capture_id, mode, f"{seconds:g}s of {threads} threads", data,
+                      capture.seconds, capture.samples)
+    return {"id": capture_id, "mode": mode, "seconds": round(capture.seconds, 3),
+            "samples": capture.samples, "url": f"/api/profiling/{capture_id}"}
+
+
+@app.get("/api/profiling/{capture_id}", dependencies=[Depends(require_profiling_token)])
+async def download_profile(capture_id: str, format: Optional[str] = None):
+    """Download a capture: sampled stacks as collapsed text (flamegraph.pl,
+    speedscope), cProfile runs as a .prof file (snakeviz, pstats) or, with
+    format=text, the top functions by cumulative time
+    """
+    entry = profile_store.get(capture_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if entry['mode'] == 'sample':
+        return Response(content=entry['data'], media_type="text/plain; charset=utf-8", headers={
+            "Content-Disposition": f'attachment; filename="{capture_id}.folded"'})
+    if format == "text":
+        return Response(content=cprofile_text(entry['data']), media_type="text/plain; charset=utf-8")
+    return Response(content=entry['data'], media_type="application/octet-stream", headers={
+        "Content-Disposition": f'attachment; filename="{capture_id}.prof"'})
+
+
 # Error handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -0,0 +1,227 @@
+"""
+In-process metrics in the Prometheus text exposition format
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import math
+import threading
+import time
+
+# Seconds; API routes answer in milliseconds, WordPress calls in up to a minute
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """(suffix, formatted labels, value) triples"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{self.name}{suffix}{labels} {_format_value(value)}"
+                     for suffix, labels, value in self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [("", _format_labels(self.labelnames, key), value) for key, value in items]
+
+
+class Gauge(Metric):
+    """A settable gauge, or one read from collect() at every scrape.
+
+    collect returns {label values tuple: value}; it runs on the scraping
+    request, so it must be cheap.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 collect: Optional[Callable[[], Dict[Tuple, float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self.collect = collect
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self.collect is not None:
+            items = list(self.collect().items())
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [("", _format_labels(self.labelnames, key), value) for key, value in items]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> (per-bucket counts, sum, count)
+        self._values: Dict[Tuple, List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(entry[0]), entry[1], entry[2]) for key, entry in self._values.items()]
+        samples = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames + ('le',), key + (_format_value(bound),))
+                samples.append(("_bucket", labels, cumulative))
+            labels = _format_labels(self.labelnames, key)
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.register(Counter(
+    "wpp_http_requests_total", "API requests by route and status", ("method", "route", "status")))
+HTTP_LATENCY = registry.register(Histogram(
+    "wpp_http_request_duration_seconds", "API request latency until the response is sent",
+    ("method", "route")))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    "wpp_http_requests_in_flight", "API requests being served"))
+UPSTREAM_REQUESTS = registry.register(Counter(
+    "wpp_wordpress_requests_total", "WordPress REST calls by outcome (HTTP status, timeout or error)",
+    ("profile", "endpoint", "status")))
+UPSTREAM_LATENCY = registry.register(Histogram(
+    "wpp_wordpress_request_duration_seconds", "WordPress REST call latency per attempt",
+    ("profile", "method", "endpoint"), UPSTREAM_BUCKETS))
+UPSTREAM_RETRIES = registry.register(Counter(
+    "wpp_wordpress_retries_total", "WordPress calls retried, by reason", ("profile", "endpoint", "reason")))
+UPSTREAM_TIMEOUTS = registry.register(Counter(
+    "wpp_wordpress_timeouts_total", "WordPress call attempts that timed out", ("profile", "endpoint")))
+PUBLISHED_ITEMS = registry.register(Counter(
+    "wpp_publish_items_total", "Articles processed by publish jobs (published, failed or queued)",
+    ("profile", "result")))
+EVENT_LOOP_LAG = registry.register(Histogram(
+    "wpp_event_loop_lag_seconds", "How late the event loop ran a periodic timer", (), LOOP_LAG_BUCKETS))
+EVENT_LOOP_BLOCKS = registry.register(Counter(
+    "wpp_event_loop_blocked_total", "Times a callback kept the event loop busy past the watchdog threshold"))
+
+
+def route_label(scope: Dict) -> str:
+    """Route template of a served request; unmatched paths share one label"""
+    route = scope.get('route')
+    return getattr(route, 'path', None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Count and time every HTTP request by its route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope: Dict, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = route_label(scope)
+            HTTP_REQUESTS.inc(method=scope['method'], route=route, status=status)
+            HTTP_LATENCY.observe(time.perf_counter() - started, method=scope['method'], route=route)
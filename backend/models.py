@@ -1,11 +1,15 @@
 """
 Data models for the WordPress Publisher application
 """
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 import json
+import threading
 from datetime import datetime
-from cryptography.fernet import Fernet
+from lazy_imports import lazy_import
+from server_timing import timed_call
+
+fernet_module = lazy_import("cryptography.fernet")
 
 
 class WordPressProfile:
@@ -18,6 +22,7 @@ class WordPressProfile:
         self.app_password = app_password
     
     def to_dict(self) -> dict:
+        """Full record, credentials included: only for the encrypted profiles file"""
         return {
             'name': self.name,
             'url': self.url,
@@ -25,6 +30,14 @@ class WordPressProfile:
             'app_password': self.app_password
         }
     
+    def to_public_dict(self) -> dict:
+        """What API responses may show: everything but the application password"""
+        return {
+            'name': self.name,
+            'url': self.url,
+            'username': self.username
+        }
+    
     @classmethod
     def from_dict(cls, data: dict) -> 'WordPressProfile':
         return cls(
@@ -42,8 +55,20 @@ class SecureStorage:
         self.storage_path = Path(storage_path)
         self.key_file = self.storage_path / 'key.key'
         self.profiles_file = self.storage_path / 'profiles.enc'
-        self._ensure_storage_dir()
-        self._key = self._load_or_create_key()
+        self._key_bytes: Optional[bytes] = None
+        self._key_lock = threading.Lock()
+        # Decrypted profiles and the (mtime, size) of the file they came from
+        self._profiles_cache: Optional[Tuple[Tuple[int, int], List[dict]]] = None
+    
+    @property
+    def _key(self) -> bytes:
+        """Encryption key, read or created on first use rather than at startup"""
+        if self._key_bytes is None:
+            with self._key_lock:
+                if self._key_bytes is None:
+                    self._ensure_storage_dir()
+                    self._key_bytes = self._load_or_create_key()
+        return self._key_bytes
     
     def _ensure_storage_dir(self):
         """Create storage directory if it doesn't exist"""
@@ -55,7 +80,7 @@ class SecureStorage:
             with open(self.key_file, 'rb') as f:
                 return f.read()
         else:
-            key = Fernet.generate_key()
+            key = fernet_module.Fernet.generate_key()
             with open(self.key_file, 'wb') as f:
                 f.write(key)
             return key
@@ -65,24 +90,40 @@ class SecureStorage:
         profiles_data = [profile.to_dict() for profile in profiles]
         json_data = json.dumps(profiles_data)
         
-        fernet = Fernet(self._key)
+        fernet = fernet_module.Fernet(self._key)
         encrypted_data = fernet.encrypt(json_data.encode())
         
         with open(self.profiles_file, 'wb') as f:
             f.write(encrypted_data)
+        self._profiles_cache = (self._file_signature(), profiles_data)
     
+    def _file_signature(self) -> Tuple[int, int]:
+        stat = self.profiles_file.stat()
+        return stat.st_mtime_ns, stat.st_size
+    
+    @timed_call("profile")
     def load_profiles(self) -> List[WordPressProfile]:
-        """Load profiles from encrypted file"""
+        """Load profiles from encrypted file.
+
+        The decrypted profiles are kept in memory until the file changes, so
+        requests of a running (or warm serverless) instance skip decryption.
+        """
         if not self.profiles_file.exists():
             return []
         
         try:
+            signature = self._file_signature()
+            cached = self._profiles_cache
+            if cached is not None and cached[0] == signature:
+                return [WordPressProfile.from_dict(profile_data) for profile_data in cached[1]]
+            
             with open(self.profiles_file, 'rb') as f:
                 encrypted_data = f.read()
             
-            fernet = Fernet(self._key)
+            fernet = fernet_module.Fernet(self._key)
             decrypted_data = fernet.decrypt(encrypted_data)
             profiles_data = json.loads(decrypted_data.decode())
+            self._profiles_cache = (signature, profiles_data)
             
             return [WordPressProfile.from_dict(profile_data) for profile_data in profiles_data]
         except Exception as e:
@@ -90,6 +131,26 @@ class SecureStorage:
             return []
 
 
+def parse_article_text(text: str, default_title: str) -> tuple[str, str]:
+    """Split article text into (title, content)"""
+    content = text.strip()
+    
+    # Use filename as title by default
+    title = default_title
+    
+    # Check if first line looks like a title (starts with # for markdown)
+    lines = content.split('\n', 1)
+    if lines[0].startswith('#'):
+        title = lines[0].lstrip('#').strip()
+        content = lines[1].strip() if len(lines) > 1 else ''
+    elif len(lines[0]) < 100 and len(lines) > 1:
+        # If first line is short, treat as title
+        title = lines[0].strip()
+        content = lines[1].strip()
+    
+    return title, content
+
+
 class ArticleFile:
     """Represents an article file"""
     
@@ -106,24 +167,14 @@ class ArticleFile:
         self.title = None
         self.content = None
     
+    @timed_call("parse")
     def parse(self) -> tuple[str, str]:
         """Parse article file and return (title, content)"""
         try:
             with open(self.path, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-            
-            # Use filename as title by default
-            title = self.path.stem
+                text = f.read()
             
-            # Check if first line looks like a title (starts with # for markdown)
-            lines = content.split('\n', 1)
-            if lines[0].startswith('#'):
-                title = lines[0].lstrip('#').strip()
-                content = lines[1].strip() if len(lines) > 1 else ''
-            elif len(lines[0]) < 100 and len(lines) > 1:
-                # If first line is short, treat as title
-                title = lines[0].strip()
-                content = lines[1].strip()
+            title, content = parse_article_text(text, self.path.stem)
             
             self.title = title
             self.content = content
@@ -146,16 +197,21 @@ class ArticleFile:
 class PublicationResult:
     """Represents the result of publishing an article"""
     
-    def __init__(self, filename: str, success: bool, details: str, url: Optional[str] = None):
+    def __init__(self, filename: str, success: bool, details: str, url: Optional[str] = None,
+                 trace: Optional[List[Dict]] = None):
         self.filename = filename
         self.success = success
         self.details = details
         self.url = url
+        self.trace = trace  # stage timing spans, see item_trace
     
     def to_dict(self) -> dict:
-        return {
+        result = {
             'filename': self.filename,
             'success': self.success,
             'details': self.details,
             'url': self.url
-        }
\ No newline at end of file
+        }
+        if self.trace is not None:
+            result['trace'] = self.trace
+        return result
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""
+Durable outbox for posts whose WordPress site was unreachable
+"""
+from typing import Callable, Awaitable, Dict, List, Optional
+from pathlib import Path
+import asyncio
+import time
+
+from job_store import JobStore
+from wordpress_api_async import WordPressAPIAsync, WordPressUnavailableError, TRANSIENT_STATUSES
+
+
+class OutboxFlusher:
+    """Replays parked posts once their site answers its health probe again.
+
+    A site that failed is probed with exponential backoff instead of having
+    every pending item run the client's full retry cycle against it. When
+    the probe succeeds the parked posts are sent in batches through the
+    WordPress batch route, or one by one on sites without it. Posts whose
+    first attempt may have reached WordPress are looked up by idempotency
+    key before being sent again.
+    """
+
+    def __init__(self, store: JobStore,
+                 get_api: Callable[[str], Optional[WordPressAPIAsync]],
+                 on_published: Callable[[Dict, Dict], Awaitable[None]],
+                 on_failed: Callable[[Dict, str], Awaitable[None]],
+                 batch_size: int = 25, min_backoff: float = 5.0, max_backoff: float = 600.0,
+                 max_sleep: float = 30.0):
+        self.store = store
+        self.get_api = get_api
+        self.on_published = on_published
+        self.on_failed = on_failed
+        self.batch_size = batch_size
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.max_sleep = max_sleep
+        self._delay: Dict[str, float] = {}
+        self._next_probe: Dict[str, float] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def is_down(self, profile: str) -> bool:
+        """Whether the profile's site failed and has not passed a probe since"""
+        return profile in self._next_probe
+
+    def mark_down(self, profile: str):
+        """Record a transient failure; the first probe follows after min_backoff"""
+        if profile not in self._next_probe:
+            self._delay[profile] = self.min_backoff
+            self._next_probe[profile] = time.time() + self.min_backoff
+        self._wakeup.set()
+
+    def status(self) -> Dict[str, Dict]:
+        """Parked items and probe schedule per profile"""
+        return {
+            profile: {
+                'parked': count,
+                'down': self.is_down(profile),
+                'next_probe_at': self._next_probe.get(profile),
+            }
+            for profile, count in self.store.outbox_profiles().items()
+        }
+
+    def _back_off(self, profile: str):
+        delay = min(self._delay.get(profile, self.min_backoff / 2) * 2, self.max_backoff)
+        self._delay[profile] = delay
+        self._next_probe[profile] = time.time() + delay
+
+    def _recover(self, profile: str):
+        self._delay.pop(profile, None)
+        self._next_probe.pop(profile, None)
+
+    async def _loop(self):
+        while True:
+            try:
+                now = time.time()
+                for profile in self.store.outbox_profiles():
+                    if self._next_probe.get(profile, 0) <= now:
+                        await self.flush_profile(profile)
+                pending = [self._next_probe.get(p, now) for p in self.store.outbox_profiles()]
+                delay = max(0.5, min(pending) - time.time()) if pending else self.max_sleep
+            except Exception as e:
+                print(f"Outbox error: {e}")
+                delay = self.max_sleep
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=min(delay, self.max_sleep))
+            except asyncio.TimeoutError:
+                pass
+
+    async def flush_profile(self, profile: str):
+        """Probe one site and, if it is up, send all of its parked posts"""
+        api = self.get_api(profile)
+        if api is None:
+            for entry in self.store.get_outbox(profile, limit=-1):
+                await self._fail(entry, f"Profile '{profile}' not found")
+            return
+        if not await api.ping():
+            self._back_off(profile)
+            return
+
+        self._recover(profile)
+        while True:
+            entries = self.store.get_outbox(profile, self.batch_size)
+            if not entries:
+                return
+            try:
+                await self._flush_batch(api, entries)
+            except WordPressUnavailableError as e:
+                # Entries already resolved are gone; the rest keep any uploaded media
+                for entry in entries:
+                    self.store.defer_outbox(entry['id'], str(e), e.maybe_sent, entry['payload'])
+                self._back_off(profile)
+                return
+
+    async def _flush_batch(self, api: WordPressAPIAsync, entries: List[Dict]):
+        to_send = []
+        for entry in entries:
+            payload = entry['payload']
+            if entry['maybe_sent']:
+                existing = await api.find_post(payload['idempotency_key'])
+                if existing:
+                    await self._publish(entry, existing)
+                    continue
+            if payload.get('image_path') and not payload['post'].get('featured_media'):
+                media_id = await api.upload_image(Path(payload['image_path']))
+                if not media_id:
+                    await self._fail(entry, "Failed to upload featured image")
+                    continue
+                payload['post']['featured_media'] = media_id
+            to_send.append(entry)
+        if not to_send:
+            return
+
+        responses = await api.batch_create_posts([entry['payload']['post'] for entry in to_send])
+        if responses is None:
+            for entry in to_send:
+                result = await api.create_post(**entry['payload']['post'])
+                if result:
+                    await self._publish(entry, result)
+                else:
+                    await self._fail(entry, "Unknown error during publication")
+            return
+
+        transient = None
+        for entry, response in zip(to_send, responses):
+            body = response.get('body') or {}
+            if response.get('status') in (200, 201):
+                await self._publish(entry, body)
+            elif response.get('status') in TRANSIENT_STATUSES:
+                transient = response.get('status')
+            else:
+                await self._fail(entry, body.get('message') or f"HTTP {response.get('status')}")
+        if transient:
+            raise WordPressUnavailableError(f"HTTP {transient} inside batch")
+
+    async def _publish(self, entry: Dict, post: Dict):
+        await self.on_published(entry, post)
+        self.store.remove_from_outbox(entry['id'])
+
+    async def _fail(self, entry: Dict, error: str):
+        await self.on_failed(entry, error)
+        self.store.remove_from_outbox(entry['id'])
@@ -0,0 +1,201 @@
+"""
+Preflight validation of publish jobs before anything is sent to WordPress
+"""
+from typing import Dict, List, Optional, Any, Tuple
+from pathlib import Path
+import asyncio
+import mimetypes
+import time
+
+from models import parse_article_text
+from wordpress_api_async import WordPressAPIAsync
+
+MAX_ARTICLE_BYTES = 8 * 1024 * 1024  # PHP's default post_max_size
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+
+# Leading bytes of the image formats WordPress accepts by default
+IMAGE_SIGNATURES = {
+    'image/jpeg': (b'\xff\xd8\xff',),
+    'image/png': (b'\x89PNG\r\n\x1a\n',),
+    'image/gif': (b'GIF87a', b'GIF89a'),
+    'image/webp': (b'RIFF',),
+}
+
+
+def check_article_file(path: str, max_bytes: int = MAX_ARTICLE_BYTES) -> Tuple[List[str], List[str]]:
+    """Errors and warnings for one article file"""
+    errors, warnings = [], []
+    file_path = Path(path)
+    try:
+        size = file_path.stat().st_size
+    except FileNotFoundError:
+        return [f"File not found: {path}"], warnings
+    except OSError as e:
+        return [f"Cannot access file: {e}"], warnings
+    if not file_path.is_file():
+        return [f"Not a file: {path}"], warnings
+    if size > max_bytes:
+        errors.append(f"Article is {size} bytes, above the {max_bytes} byte limit")
+        return errors, warnings
+    try:
+        text = file_path.read_bytes().decode('utf-8')
+    except PermissionError:
+        return [f"File is not readable: {path}"], warnings
+    except UnicodeDecodeError as e:
+        return [f"File is not valid UTF-8 (byte {e.start})"], warnings
+    title, content = parse_article_text(text, file_path.stem)
+    if not content.strip():
+        errors.append("Article has no content")
+    if title == file_path.stem:
+        warnings.append("No title line; the file name will be used as title")
+    return errors, warnings
+
+
+def check_image_data(filename: str, head: bytes, size: int, max_bytes: int = MAX_IMAGE_BYTES) -> List[str]:
+    """Errors for a featured image, given its first 16 bytes and its size"""
+    mime_type, _ = mimetypes.guess_type(filename)
+    if not mime_type or not mime_type.startswith('image/'):
+        return [f"Featured image {filename} is not an image file"]
+    if size > max_bytes:
+        return [f"Featured image is {size} bytes, above the {max_bytes} byte limit"]
+    signatures = IMAGE_SIGNATURES.get(mime_type)
+    if signatures and not head.startswith(signatures):
+        return [f"Featured image {filename} is not a valid {mime_type} file"]
+    return []
+
+
+def check_image_file(path: str, max_bytes: int = MAX_IMAGE_BYTES) -> List[str]:
+    """Errors for one featured image file"""
+    image_path = Path(path)
+    try:
+        size = image_path.stat().st_size
+        with open(image_path, 'rb') as f:
+            head = f.read(16)
+    except FileNotFoundError:
+        return [f"Featured image not found: {path}"]
+    except OSError as e:
+        return [f"Featured image is not readable: {e}"]
+    return check_image_data(image_path.name, head, size, max_bytes)
+
+
+class SiteCache:
+    """Per-profile category, tag and media IDs, refreshed after ttl seconds"""
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._terms: Dict[Tuple[str, str], Tuple[float, set]] = {}
+        self._media: Dict[str, Dict[int, Dict]] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+
+    async def term_ids(self, api: WordPressAPIAsync, taxonomy: str) -> set:
+        key = (api.profile.name, taxonomy)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            cached = self._terms.get(key)
+            if cached and time.time() - cached[0] < self.ttl:
+                return cached[1]
+            ids = set(await api.get_term_ids(taxonomy))
+            self._terms[key] = (time.time(), ids)
+            return ids
+
+    async def media(self, api: WordPressAPIAsync, media_ids: List[int]) -> Dict[int, Dict]:
+        """Known media items among media_ids; media rarely disappears, so hits never expire"""
+        known = self._media.setdefault(api.profile.name, {})
+        missing = [media_id for media_id in media_ids if media_id not in known]
+        if missing:
+            for item in await api.get_media(missing):
+                known[item['id']] = item
+        return {media_id: known[media_id] for media_id in media_ids if media_id in known}
+
+    def invalidate(self, profile_name: str):
+        for key in [key for key in self._terms if key[0] == profile_name]:
+            del self._terms[key]
+        self._media.pop(profile_name, None)
+
+
+async def run_preflight(items: List[Dict[str, Any]], api: Optional[WordPressAPIAsync],
+                        cache: SiteCache, featured_image_path: Optional[str] = None,
+                        max_article_bytes: int = MAX_ARTICLE_BYTES,
+                        max_image_bytes: int = MAX_IMAGE_BYTES) -> Dict:
+    """Validate every item of a job without writing anything to WordPress.
+
+    items are dicts with file_path and optional categories, tags,
+    featured_media and image_path; featured_image_path is the job-wide
+    image, whose errors are reported once. Local files are checked in worker
+    threads in parallel with the site lookups; the site's taxonomy and media
+    IDs come from the cache. Returns a report with per-item errors and
+    warnings; ok is False when any item has an error.
+    """
+    started = time.monotonic()
+    report = [{'seq': seq, 'file': Path(item.get('file_path') or '').name, 'errors': [], 'warnings': []}
+              for seq, item in enumerate(items)]
+
+    async def check_local(seq: int, item: Dict):
+        if not item.get('file_path'):
+            report[seq]['errors'].append("File path is required")
+            return
+        errors, warnings = await asyncio.to_thread(check_article_file, item['file_path'], max_article_bytes)
+        report[seq]['errors'].extend(errors)
+        report[seq]['warnings'].extend(warnings)
+        if item.get('image_path'):
+            report[seq]['errors'].extend(
+                await asyncio.to_thread(check_image_file, item['image_path'], max_image_bytes)
+            )
+
+    site_warnings: List[str] = []
+
+    async def check_site():
+        if api is None:
+            return
+        wanted = {
+            'categories': {int(i) for item in items for i in item.get('categories') or []},
+            'tags': {int(i) for item in items for i in item.get('tags') or []},
+        }
+        for taxonomy, ids in wanted.items():
+            if not ids:
+                continue
+            try:
+                known = await cache.term_ids(api, taxonomy)
+            except Exception as e:
+                site_warnings.append(f"Could not verify {taxonomy}: {e}")
+                continue
+            label = 'Category' if taxonomy == 'categories' else 'Tag'
+            for seq, item in enumerate(items):
+                for term_id in item.get(taxonomy) or []:
+                    if int(term_id) not in known:
+                        report[seq]['errors'].append(f"{label} {term_id} does not exist")
+
+        media_ids = sorted({int(item['featured_media']) for item in items if item.get('featured_media')})
+        if media_ids:
+            try:
+                known_media = await cache.media(api, media_ids)
+            except Exception as e:
+                site_warnings.append(f"Could not verify media: {e}")
+                return
+            for seq, item in enumerate(items):
+                if not item.get('featured_media'):
+                    continue
+                media = known_media.get(int(item['featured_media']))
+                if media is None:
+                    report[seq]['errors'].append(f"Media {item['featured_media']} does not exist")
+                elif media.get('media_type', 'image') != 'image':
+                    report[seq]['errors'].append(f"Media {item['featured_media']} is not an image")
+
+    job_errors: List[str] = []
+
+    async def check_featured_image():
+        if featured_image_path:
+            job_errors.extend(await asyncio.to_thread(check_image_file, featured_image_path, max_image_bytes))
+
+    await asyncio.gather(check_site(), check_featured_image(),
+                         *(check_local(seq, item) for seq, item in enumerate(items)))
+    failed = [entry for entry in report if entry['errors']]
+    return {
+        'ok': not failed and not job_errors,
+        'checked': len(items),
+        'failed': len(failed),
+        'errors': job_errors,
+        'warnings': site_warnings,
+        'items': failed + [entry for entry in report if not entry['errors'] and entry['warnings']],
+        'duration': round(time.monotonic() - started, 3),
+    }
@@ -0,0 +1,226 @@
+"""
+On-demand profiling: cProfile or stack sampling of one request or a time window
+"""
+from typing import Dict, Iterable, List, Optional
+from collections import Counter, OrderedDict
+import cProfile
+import hmac
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+
+PROFILE_HEADER = b'x-profile'
+TOKEN_HEADER = b'x-profile-token'
+MODES = ('cprofile', 'sample')
+SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+
+
+class SamplingProfiler:
+    """Samples the stacks of some threads from a background thread.
+
+    Stacks are counted in the collapsed format of flamegraph.pl and
+    speedscope ("outer;inner;leaf count"); threads is a list of thread
+    idents, or None for every thread but the sampler itself.
+    """
+
+    def __init__(self, threads: Optional[Iterable[int]] = None, interval: float = SAMPLE_INTERVAL):
+        self.threads = set(threads) if threads is not None else None
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'SamplingProfiler':
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> 'SamplingProfiler':
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.is_set():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (self.threads is not None and ident not in self.threads):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            self._stop.wait(self.interval)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def cprofile_data(profiler: cProfile.Profile) -> bytes:
+    """The profile as a .prof file (what pstats.dump_stats writes; snakeviz reads it)"""
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
+
+
+class _LoadedStats:
+    """What pstats.Stats accepts besides a file name: an object with create_stats() and stats"""
+
+    def __init__(self, data: bytes):
+        self.stats = marshal.loads(data)
+
+    def create_stats(self):
+        pass
+
+
+def cprofile_text(data: bytes, limit: int = 60) -> str:
+    """Top functions by cumulative time, as pstats prints them"""
+    out = io.StringIO()
+    pstats.Stats(_LoadedStats(data), stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+class ProfileStore:
+    """The last few captures, in memory"""
+
+    def __init__(self, max_entries: int = 20):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, capture_id: str, mode: str, label: str, data: bytes, seconds: float, samples: int = 0):
+        with self._lock:
+            self._entries[capture_id] = {
+                'id': capture_id, 'mode': mode, 'label': label, 'created': time.time(),
+                'seconds': round(seconds, 3), 'samples': samples, 'data': data,
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, capture_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._entries.get(capture_id)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            return [{key: value for key, value in entry.items() if key != 'data'}
+                    for entry in reversed(self._entries.values())]
+
+
+def new_capture_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def check_token(expected: Optional[str], given: Optional[str]) -> bool:
+    return bool(expected) and given is not None and hmac.compare_digest(expected, given)
+
+
+class Capture:
+    """One cProfile run (of the calling thread) or sampling run (of threads).
+
+    Only one cProfile can be active per interpreter; a second one raises
+    RuntimeError("busy") on start.
+    """
+    _cprofile_lock = threading.Lock()
+
+    def __init__(self, mode: str, threads: Optional[Iterable[int]] = None):
+        self.mode = mode
+        self.threads = threads
+        self.samples = 0
+        self._profiler = None
+        self._started = 0.0
+        self.seconds = 0.0
+
+    def start(self) -> 'Capture':
+        self._started = time.perf_counter()
+        if self.mode == 'cprofile':
+            if not self._cprofile_lock.acquire(blocking=False):
+                raise RuntimeError("busy")
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = SamplingProfiler(self.threads).start()
+        return self
+
+    def stop(self) -> bytes:
+        self.seconds = time.perf_counter() - self._started
+        if self.mode == 'cprofile':
+            self._profiler.disable()
+            self._cprofile_lock.release()
+            return cprofile_data(self._profiler)
+        self._profiler.stop()
+        self.samples = self._profiler.samples
+        return self._profiler.collapsed().encode('utf-8')
+
+
+class ProfilingMiddleware:
+    """Profile requests sent with an X-Profile: cprofile|sample header.
+
+    The X-Profile-Token header must match token; the capture is stored
+    under the ID returned in X-Profile-Id and downloaded from
+    X-Profile-Url. Only installed when a token is configured, so requests
+    pay nothing otherwise. cProfile sees everything the event loop runs
+    meanwhile, not only this request; sampling covers the loop thread.
+    """
+
+    def __init__(self, app, token: str, store: ProfileStore, download_path: str = "/api/profiling/"):
+        self.app = app
+        self.token = token
+        self.store = store
+        self.download_path = download_path
+
+    async def __call__(self, scope: Dict, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        mode = token = None
+        for name, value in scope['headers']:
+            if name == PROFILE_HEADER:
+                mode = value.decode('latin-1').strip().lower()
+            elif name == TOKEN_HEADER:
+                token = value.decode('latin-1')
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        capture_id = new_capture_id()
+        headers = []
+        capture = None
+        if mode not in MODES:
+            headers.append((b'x-profile-error', f"mode must be one of {', '.join(MODES)}".encode('latin-1')))
+        elif not check_token(self.token, token):
+            headers.append((b'x-profile-error', b'invalid token'))
+        else:
+            try:
+                capture = Capture(mode, [threading.get_ident()]).start()
+                headers.append((b'x-profile-id', capture_id.encode('latin-1')))
+                headers.append((b'x-profile-url', f"{self.download_path}{capture_id}".encode('latin-1')))
+            except RuntimeError:
+                capture = None
+                headers.append((b'x-profile-error', b'another cProfile capture is running'))
+
+        async def send_with_headers(message):
+            if message['type'] == 'http.response.start':
+                message = {**message, 'headers': list(message.get('headers', [])) + headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            if capture is not None:
+                data = capture.stop()
+                self.store.add(capture_id, mode, f"{scope['method']} {scope['path']}", data,
+                               capture.seconds, capture.samples)
@@ -0,0 +1,152 @@
+"""
+Staged publish pipeline: parse -> media upload -> post creation
+"""
+from typing import Callable, Awaitable, Dict, Iterable, Optional, Any
+import asyncio
+import time
+
+from item_trace import ItemTrace
+
+# Trace span of the work each stage does
+STAGE_SPANS = {'parse': 'parse', 'media': 'media_upload', 'post': 'post_create'}
+
+
+class PipelineItem:
+    """One article travelling through the pipeline"""
+
+    def __init__(self, seq: int, path: str, options: Optional[Dict[str, Any]] = None):
+        self.seq = seq
+        self.path = path
+        self.options = options or {}
+        self.title: Optional[str] = None
+        self.content: Optional[str] = None
+        self.needs_media = False
+        self.media_id: Optional[int] = None
+        self.trace = ItemTrace()
+        self._queued_at = (time.time(), time.perf_counter())
+
+
+class StageStats:
+    """Counters for one pipeline stage"""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.active = 0
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.max_depth = 0
+
+    def to_dict(self, queue: asyncio.Queue) -> Dict:
+        return {
+            'workers': self.workers,
+            'queued': queue.qsize(),
+            'max_queued': self.max_depth,
+            'active': self.active,
+            'processed': self.processed,
+            'failed': self.failed,
+            'busy_seconds': round(self.busy_seconds, 3),
+        }
+
+
+class PublishPipeline:
+    """Bounded asyncio queues between parse, media and post worker pools.
+
+    Disk reads, image uploads and post creation for different articles
+    overlap; the bounded queues apply back-pressure so a fast stage cannot
+    run arbitrarily far ahead of a slow one. Stage callables raise to fail
+    an item, which is then handed to on_error and dropped. Every item's
+    trace records its queue waits and stage work; on_finished gets the item
+    once it has left the pipeline, either way.
+    """
+
+    def __init__(self,
+                 parse: Callable[[PipelineItem], Awaitable[None]],
+                 media: Callable[[PipelineItem], Awaitable[None]],
+                 post: Callable[[PipelineItem], Awaitable[None]],
+                 on_error: Callable[[PipelineItem, Exception], Awaitable[None]],
+                 parse_workers: int = 2, media_workers: int = 2, post_workers: int = 4,
+                 queue_size: int = 16,
+                 on_finished: Optional[Callable[[PipelineItem], None]] = None):
+        self._stages = {'parse': parse, 'media': media, 'post': post}
+        self._on_error = on_error
+        self._on_finished = on_finished
+        self._queues = {name: asyncio.Queue(queue_size) for name in self._stages}
+        self._stats = {
+            'parse': StageStats('parse', max(1, parse_workers)),
+            'media': StageStats('media', max(1, media_workers)),
+            'post': StageStats('post', max(1, post_workers)),
+        }
+
+    def _next_stage(self, stage: str, item: PipelineItem) -> Optional[str]:
+        if stage == 'parse':
+            return 'media' if item.needs_media else 'post'
+        if stage == 'media':
+            return 'post'
+        return None
+
+    async def _worker(self, stage: str):
+        queue = self._queues[stage]
+        stats = self._stats[stage]
+        handler = self._stages[stage]
+        while True:
+            item = await queue.get()
+            stats.active += 1
+            started = time.monotonic()
+            queued_wall, queued = item._queued_at
+            item.trace.add(f"{stage}_queue", queued_wall, time.perf_counter() - queued)
+            finished = True
+            try:
+                with item.trace.activate(), item.trace.span(STAGE_SPANS[stage]):
+                    await handler(item)
+                next_stage = self._next_stage(stage, item)
+                if next_stage:
+                    finished = False
+                    await self._put(next_stage, item)
+                stats.processed += 1
+            except Exception as e:
+                stats.failed += 1
+                try:
+                    await self._on_error(item, e)
+                except Exception as handler_error:
+                    print(f"Pipeline error handler failed for {item.path}: {handler_error}")
+            finally:
+                if finished and self._on_finished is not None:
+                    try:
+                        self._on_finished(item)
+                    except Exception as e:
+                        print(f"Pipeline finish handler failed for {item.path}: {e}")
+                stats.busy_seconds += time.monotonic() - started
+                stats.active -= 1
+                queue.task_done()
+
+    async def _put(self, stage: str, item: PipelineItem):
+        queue = self._queues[stage]
+        item._queued_at = (time.time(), time.perf_counter())
+        await queue.put(item)
+        stats = self._stats[stage]
+        stats.max_depth = max(stats.max_depth, queue.qsize())
+
+    async def run(self, items: Iterable[PipelineItem]):
+        """Push all items through every stage and wait until they are done"""
+        workers = [
+            asyncio.create_task(self._worker(stage))
+            for stage, stats in self._stats.items()
+            for _ in range(stats.workers)
+        ]
+        try:
+            for item in items:
+                await self._put('parse', item)
+            # Upstream stages hand items on before task_done, so joining in
+            # order guarantees nothing is still on its way downstream
+            for stage in ('parse', 'media', 'post'):
+                await self._queues[stage].join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Queue depth and worker activity per stage"""
+        return {name: stats.to_dict(self._queues[name]) for name, stats in self._stats.items()}
@@ -0,0 +1,93 @@
+"""
+Rate-smoothed publication scheduler backed by the job store
+"""
+from typing import Callable, Awaitable, List, Optional
+from datetime import datetime, timezone
+import asyncio
+import time
+
+from job_store import JobStore
+
+
+def parse_time(value) -> float:
+    """Accept a Unix timestamp or an ISO 8601 string (naive means UTC)"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def plan_times(count: int, start_at: float, rate_per_hour: Optional[float] = None,
+               explicit: Optional[List[Optional[float]]] = None) -> List[float]:
+    """Release time per item: explicit times win, the rest are spaced by rate"""
+    interval = 3600.0 / rate_per_hour if rate_per_hour else 0.0
+    times = []
+    slot = 0
+    for i in range(count):
+        if explicit and i < len(explicit) and explicit[i] is not None:
+            times.append(explicit[i])
+        else:
+            times.append(start_at + slot * interval)
+            slot += 1
+    return times
+
+
+class PublishScheduler:
+    """Releases scheduled job items when they fall due.
+
+    The job store's (status, scheduled_at) index acts as the priority queue:
+    the scheduler only keeps the next due time in memory, so tens of
+    thousands of pending items across many profiles cost one indexed query
+    per wake-up and no task per item. Items are released with an atomic
+    status update, so several workers sharing the store never release the
+    same item twice.
+    """
+
+    def __init__(self, store: JobStore, release: Callable[[str, List[int]], Awaitable[None]],
+                 max_sleep: float = 30.0, batch_size: int = 100):
+        self.store = store
+        self.release = release
+        self.max_sleep = max_sleep
+        self.batch_size = batch_size
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._running: set = set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, *self._running, return_exceptions=True)
+            self._task = None
+
+    def notify(self):
+        """Re-check the schedule now (call after adding items)"""
+        self._wakeup.set()
+
+    async def _loop(self):
+        while True:
+            try:
+                released = self.store.release_due_items(time.time(), self.batch_size)
+                for job_id, seqs in released.items():
+                    task = asyncio.create_task(self.release(job_id, seqs))
+                    self._running.add(task)
+                    task.add_done_callback(self._running.discard)
+                if sum(len(seqs) for seqs in released.values()) >= self.batch_size:
+                    continue
+
+                next_due = self.store.next_scheduled_time()
+                delay = self.max_sleep if next_due is None else max(0.0, next_due - time.time())
+            except Exception as e:
+                print(f"Scheduler error: {e}")
+                delay = self.max_sleep
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=min(delay, self.max_sleep))
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,324 @@
+"""
+Full-text search index over the articles directory
+"""
+from typing import List, Dict, Optional, Tuple
+from pathlib import Path
+from contextlib import contextmanager
+import hashlib
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from models import parse_article_text
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+PHRASE_RE = re.compile(r'"([^"]*)"')
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+INDEX_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    positions TEXT NOT NULL  -- JSON {term: [positions]}
+);
+"""
+
+
+def normalize_token(token: str) -> str:
+    """Lowercase and strip accents so 'Publicación' matches 'publicacion'"""
+    decomposed = unicodedata.normalize('NFKD', token.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized tokens"""
+    return [normalize_token(t) for t in TOKEN_RE.findall(text)]
+
+
+def parse_query(query: str) -> Tuple[List[str], List[List[str]]]:
+    """Split a query into loose terms and quoted phrases"""
+    phrases = [tokenize(p) for p in PHRASE_RE.findall(query)]
+    phrases = [p for p in phrases if p]
+    terms = tokenize(PHRASE_RE.sub(' ', query))
+    return terms, phrases
+
+
+class SearchIndex:
+    """Incrementally maintained inverted index with positional postings.
+
+    Documents are keyed by path and re-indexed only when their mtime or size
+    changes, so refreshing a large directory costs one ``stat`` per file.
+    Each document is a row in a SQLite file next to the encrypted profiles,
+    so a change writes only that document's row and restarts only pick up
+    the files that changed in the meantime. The file is read on first use.
+    """
+
+    def __init__(self, articles_dir: Path, index_file: Path, refresh_interval: float = 2.0):
+        self.articles_dir = Path(articles_dir)
+        self.index_file = Path(index_file)
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        # Held while writing changes, taken before _lock is released so
+        # consecutive refreshes reach the database in order
+        self._save_lock = threading.Lock()
+        self._last_refresh = 0.0
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        """Empty the index"""
+        self._next_id = 0
+        # doc_id -> {path, mtime, size, length, title, terms}
+        self.docs: Dict[int, Dict] = {}
+        self.path_ids: Dict[str, int] = {}
+        # term -> {doc_id: [positions]}
+        self.postings: Dict[str, Dict[int, List[int]]] = {}
+        self._total_length = 0
+
+    @classmethod
+    def for_directory(cls, articles_dir: Path, storage_dir: Path) -> 'SearchIndex':
+        """Create an index persisted under storage_dir for the given directory"""
+        digest = hashlib.sha1(str(Path(articles_dir).resolve()).encode()).hexdigest()[:12]
+        return cls(articles_dir, Path(storage_dir) / f"search_index_{digest}.db")
+
+    # Persistence
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(str(self.index_file), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _load(self):
+        """Load the persisted index, starting over if it belongs to another version or directory"""
+        self._loaded = True
+        # Written by earlier versions as a single JSON file
+        self.index_file.with_suffix('.json').unlink(missing_ok=True)
+        try:
+            self.index_file.parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.executescript(SCHEMA)
+                meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+                if meta != {'version': str(INDEX_VERSION), 'directory': str(self.articles_dir)}:
+                    conn.execute("DELETE FROM documents")
+                    conn.execute("DELETE FROM meta")
+                    conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)",
+                                     [('version', str(INDEX_VERSION)), ('directory', str(self.articles_dir))])
+                    return
+                rows = conn.execute(
+                    "SELECT id, path, mtime, size, length, title, positions FROM documents"
+                ).fetchall()
+            for doc_id, path, mtime, size, length, title, positions in rows:
+                term_positions = json.loads(positions)
+                for term, term_entries in term_positions.items():
+                    self.postings.setdefault(term, {})[doc_id] = term_entries
+                self.docs[doc_id] = {
+                    'path': path, 'mtime': mtime, 'size': size, 'length': length,
+                    'title': title, 'terms': list(term_positions),
+                }
+                self.path_ids[path] = doc_id
+                self._total_length += length
+            self._next_id = max(self.docs, default=-1) + 1
+        except Exception as e:
+            print(f"Error loading search index {self.index_file}: {e}")
+            self._reset()
+
+    def _save(self, removed: List[int], added: List[Tuple]):
+        """Write the rows of changed documents"""
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM documents WHERE id = ?", [(doc_id,) for doc_id in removed])
+            conn.executemany(
+                "INSERT OR REPLACE INTO documents (id, path, mtime, size, length, title, positions) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", added
+            )
+
+    # Maintenance
+
+    def refresh(self, force: bool = False) -> bool:
+        """Re-index files whose mtime/size changed; returns True if anything changed.
+
+        Searches wait only for the in-memory update; the changed rows are
+        written after _lock is released.
+        """
+        removed: List[int] = []
+        added: List[Tuple] = []
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            now = time.monotonic()
+            if not force and now - self._last_refresh < self.refresh_interval:
+                return False
+            self._last_refresh = now
+
+            seen = set()
+            if self.articles_dir.exists():
+                for ext in ['*.txt', '*.md']:
+                    for path in self.articles_dir.glob(ext):
+                        key = str(path)
+                        seen.add(key)
+                        try:
+                            stat = path.stat()
+                        except OSError:
+                            continue
+                        doc_id = self.path_ids.get(key)
+                        if doc_id is not None:
+                            doc = self.docs[doc_id]
+                            if doc['mtime'] == stat.st_mtime and doc['size'] == stat.st_size:
+                                continue
+                            self._remove(doc_id)
+                            removed.append(doc_id)
+                        row = self._add(path, stat.st_mtime, stat.st_size)
+                        if row is not None:
+                            added.append(row)
+
+            for key in [k for k in self.path_ids if k not in seen]:
+                doc_id = self.path_ids[key]
+                self._remove(doc_id)
+                removed.append(doc_id)
+
+            if not removed and not added:
+                return False
+            self._save_lock.acquire()
+
+        try:
+            self._save(removed, added)
+        except Exception as e:
+            print(f"Error saving search index {self.index_file}: {e}")
+        finally:
+            self._save_lock.release()
+        return True
+
+    def _add(self, path: Path, mtime: float, size: int) -> Optional[Tuple]:
+        """Index a file; returns its database row, or None if it can't be read"""
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read()
+        except OSError as e:
+            print(f"Error indexing {path}: {e}")
+            return None
+
+        title, _ = parse_article_text(text, path.stem)
+        tokens = tokenize(text)
+
+        doc_id = self._next_id
+        self._next_id += 1
+        term_positions: Dict[str, List[int]] = {}
+        for position, token in enumerate(tokens):
+            term_positions.setdefault(token, []).append(position)
+        for term, positions in term_positions.items():
+            self.postings.setdefault(term, {})[doc_id] = positions
+
+        self.docs[doc_id] = {
+            'path': str(path),
+            'mtime': mtime,
+            'size': size,
+            'length': len(tokens),
+            'title': title,
+            'terms': list(term_positions),
+        }
+        self.path_ids[str(path)] = doc_id
+        self._total_length += len(tokens)
+        return (doc_id, str(path), mtime, size, len(tokens), title,
+                json.dumps(term_positions, ensure_ascii=False, separators=(',', ':')))
+
+    def _remove(self, doc_id: int):
+        doc = self.docs.pop(doc_id)
+        self.path_ids.pop(doc['path'], None)
+        self._total_length -= doc['length']
+        for term in doc['terms']:
+            entries = self.postings.get(term)
+            if entries is None:
+                continue
+            entries.pop(doc_id, None)
+            if not entries:
+                del self.postings[term]
+
+    # Querying
+
+    def _phrase_matches(self, doc_id: int, phrase: List[str]) -> bool:
+        starts = set(self.postings[phrase[0]][doc_id])
+        for offset, term in enumerate(phrase[1:], start=1):
+            positions = self.postings[term][doc_id]
+            starts &= {p - offset for p in positions}
+            if not starts:
+                return False
+        return True
+
+    def search(self, query: str, limit: int = 20) -> List[Dict]:
+        """Return documents containing every term and phrase, ranked by BM25"""
+        terms, phrases = parse_query(query)
+        required = set(terms)
+        for phrase in phrases:
+            required.update(phrase)
+        if not required:
+            return []
+
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if any(term not in self.postings for term in required):
+                return []
+
+            # Intersect postings starting from the rarest term
+            ordered = sorted(required, key=lambda t: len(self.postings[t]))
+            candidates = set(self.postings[ordered[0]])
+            for term in ordered[1:]:
+                candidates &= self.postings[term].keys()
+                if not candidates:
+                    return []
+
+            candidates = [
+                doc_id for doc_id in candidates
+                if all(self._phrase_matches(doc_id, phrase) for phrase in phrases if len(phrase) > 1)
+            ]
+
+            total_docs = len(self.docs)
+            avg_length = self._total_length / total_docs if total_docs else 0.0
+            scored = []
+            for doc_id in candidates:
+                doc = self.docs[doc_id]
+                score = 0.0
+                for term in required:
+                    entries = self.postings[term]
+                    tf = len(entries[doc_id])
+                    idf = math.log(1 + (total_docs - len(entries) + 0.5) / (len(entries) + 0.5))
+                    norm = 1 - BM25_B + BM25_B * (doc['length'] / avg_length if avg_length else 0)
+                    score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+                scored.append((score, doc_id))
+
+            scored.sort(key=lambda item: (-item[0], self.docs[item[1]]['path']))
+            return [
+                {
+                    'path': self.docs[doc_id]['path'],
+                    'name': Path(self.docs[doc_id]['path']).name,
+                    'title': self.docs[doc_id]['title'],
+                    'score': round(score, 4),
+                }
+                for score, doc_id in scored[:limit]
+            ]
+
+    def stats(self) -> Dict:
+        return {
+            'documents': len(self.docs),
+            'terms': len(self.postings),
+        }
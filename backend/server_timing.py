@@ -0,0 +1,146 @@
+"""
+Request size limit and Server-Timing breakdown as pure ASGI middleware
+"""
+from typing import Dict, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import asyncio
+import json
+import time
+
+# Milliseconds spent per phase by the request being served; None outside requests
+_phases: ContextVar[Optional[Dict[str, float]]] = ContextVar('server_timing_phases', default=None)
+
+
+def record(phase: str, milliseconds: float):
+    """Add time to a phase of the current request (no-op outside a request)"""
+    phases = _phases.get()
+    if phases is not None:
+        phases[phase] = phases.get(phase, 0.0) + milliseconds
+
+
+@contextmanager
+def timed(phase: str):
+    """Time a block as part of phase; concurrent blocks of one phase add up"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, (time.perf_counter() - started) * 1000)
+
+
+def timed_call(phase: str):
+    """Decorator form of timed() for sync and async functions"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timed(phase):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class RequestTooLarge(Exception):
+    """The request body went over the size limit while being received"""
+
+
+def format_server_timing(phases: Dict[str, float], total: float) -> str:
+    entries = [f"{name};dur={duration:.1f}" for name, duration in phases.items()]
+    entries.append(f"total;dur={total:.1f}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """Enforce the request body limit and report per-phase timings.
+
+    Bodies are passed through as they arrive and counted, so chunked uploads
+    and lying Content-Length headers are caught too; going over max_body_size
+    answers 413 if the response has not started yet. Response bodies are
+    never buffered: the Server-Timing header (phases recorded with timed()
+    plus the total up to the response start) is added to the start message.
+    """
+
+    def __init__(self, app, max_body_size: int):
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope: Dict, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        for name, value in scope['headers']:
+            if name == b'content-length':
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > self.max_body_size:
+                    await self._send_too_large(send)
+                    return
+                break
+
+        received = 0
+        too_large = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.max_body_size:
+                    too_large = True
+                    raise RequestTooLarge()
+            return message
+
+        async def timed_send(message):
+            nonlocal response_started
+            if message['type'] == 'http.response.start':
+                if too_large:
+                    # Whatever the app made of the aborted body, the answer is 413
+                    return
+                response_started = True
+                total = (time.perf_counter() - started) * 1000
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', format_server_timing(phases, total).encode('latin-1')))
+                headers.append((b'x-process-time', f"{total / 1000:.6f}".encode('latin-1')))
+                message = {**message, 'headers': headers}
+            elif too_large and not response_started:
+                return
+            await send(message)
+
+        phases: Dict[str, float] = {}
+        token = _phases.set(phases)
+        try:
+            await self.app(scope, limited_receive, timed_send)
+        except Exception:
+            # RequestTooLarge, or whatever the app raised after seeing it
+            if not too_large:
+                raise
+        finally:
+            _phases.reset(token)
+        if too_large and not response_started:
+            await self._send_too_large(send)
+
+    async def _send_too_large(self, send):
+        limit = self.max_body_size
+        limit_text = f"{limit // (1024 * 1024)}MB" if limit >= 1024 * 1024 else f"{limit} bytes"
+        body = json.dumps({"detail": f"Request too large. Maximum size: {limit_text}"}).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': 413,
+            'headers': [(b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode('latin-1')),
+                        (b'connection', b'close')],
+        })
+        await send({'type': 'http.response.body', 'body': body})
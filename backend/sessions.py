@@ -0,0 +1,119 @@
+"""
+Per-client UI sessions stored in SQLite, shared by every worker process
+"""
+from typing import Dict, Optional
+from pathlib import Path
+from contextlib import contextmanager
+import secrets
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    profile TEXT,
+    directory TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+"""
+
+SESSION_FIELDS = ('profile', 'directory')
+
+
+class SessionStore:
+    """Selected profile and articles directory per browser or API client.
+
+    Nothing is kept in process memory, so any worker (or node sharing the
+    database file) can serve any request of a session. A new session lives
+    only in the request until its first update() stores it, so anonymous
+    readers (crawlers, health checks) never add rows. Sessions unused for
+    ttl_seconds are deleted, and rows that never got a value after
+    empty_ttl_seconds.
+    """
+
+    def __init__(self, db_path: Path, ttl_seconds: float = 30 * 24 * 3600,
+                 empty_ttl_seconds: float = 24 * 3600):
+        self.db_path = Path(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.empty_ttl_seconds = empty_ttl_seconds
+        self._last_purge = 0.0
+        self._ready = False
+        self._init_lock = threading.Lock()
+
+    def _initialize(self):
+        """Create the database on first use instead of at import"""
+        with self._init_lock:
+            if self._ready:
+                return
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            try:
+                with conn:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(SCHEMA)
+            finally:
+                conn.close()
+            self._ready = True
+
+    @contextmanager
+    def _connect(self):
+        if not self._ready:
+            self._initialize()
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def new(self) -> Dict:
+        """A fresh session, not stored until its first update()"""
+        return {'id': secrets.token_urlsafe(24), 'profile': None, 'directory': None}
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        """Session values, or None if unknown or expired"""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None or row['updated_at'] < now - self.ttl_seconds:
+                return None
+            # Refresh the expiry at most hourly to keep reads write-free
+            if row['updated_at'] < now - 3600:
+                conn.execute("UPDATE sessions SET updated_at = ? WHERE id = ?", (now, session_id))
+        return {'id': row['id'], 'profile': row['profile'], 'directory': row['directory']}
+
+    def update(self, session_id: str, **values):
+        """Set session fields (profile, directory), storing the session if it is new"""
+        fields = {key: value for key, value in values.items() if key in SESSION_FIELDS}
+        if not fields:
+            return
+        self._maybe_purge()
+        now = time.time()
+        columns = ", ".join(fields)
+        placeholders = ", ".join("?" for _ in fields)
+        assignments = ", ".join(f"{key} = excluded.{key}" for key in fields)
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT INTO sessions (id, {columns}, created_at, updated_at) "
+                f"VALUES (?, {placeholders}, ?, ?) "
+                f"ON CONFLICT(id) DO UPDATE SET {assignments}, updated_at = excluded.updated_at",
+                (session_id, *fields.values(), now, now)
+            )
+
+    def purge_expired(self) -> int:
+        self._last_purge = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ? "
+                "OR (profile IS NULL AND directory IS NULL AND updated_at < ?)",
+                (self._last_purge - self.ttl_seconds, self._last_purge - self.empty_ttl_seconds)
+            )
+        return cursor.rowcount
+
+    def _maybe_purge(self):
+        if time.time() - self._last_purge > 3600:
+            self.purge_expired()
@@ -0,0 +1,214 @@
+"""
+Near-duplicate detection with MinHash signatures and LSH banding
+"""
+from typing import List, Dict, Optional, Iterable, Tuple
+from pathlib import Path
+from array import array
+import hashlib
+import html
+import re
+import sqlite3
+import threading
+
+from search_index import tokenize
+
+MAX_HASH = 0xFFFFFFFF
+# Offset added per hop when an empty bin borrows from a neighbour
+DENSIFY_OFFSET = 0x9E3779B1
+
+TAG_RE = re.compile(r"<[^>]+>")
+
+
+def strip_html(text: str) -> str:
+    """Turn rendered WordPress content into plain text"""
+    return html.unescape(TAG_RE.sub(' ', text))
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class MinHasher:
+    """Computes MinHash signatures over word shingles.
+
+    Uses one-permutation hashing with rotation densification: every shingle
+    is hashed once and lands in one of ``num_perm`` bins, keeping the minimum
+    per bin. This costs a single pass per document instead of one pass per
+    permutation, while still estimating Jaccard similarity. Signatures are
+    persisted in SQLite keyed by the SHA-1 of the text, so an article is only
+    hashed once no matter how often it is checked.
+    """
+
+    def __init__(self, db_path: Path, num_perm: int = 128, shingle_size: int = 5):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS signatures ("
+            "content_hash TEXT NOT NULL, num_perm INTEGER NOT NULL, signature BLOB NOT NULL, "
+            "PRIMARY KEY (content_hash, num_perm))"
+        )
+        self._conn.commit()
+
+    def _shingle_hashes(self, text: str) -> List[int]:
+        tokens = tokenize(text)
+        size = self.shingle_size
+        if len(tokens) < size:
+            shingles = {' '.join(tokens)} if tokens else set()
+        else:
+            shingles = {' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+        return [
+            int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little')
+            for s in shingles
+        ]
+
+    def compute(self, text: str) -> List[int]:
+        """Compute a signature without touching the cache"""
+        hashes = self._shingle_hashes(text)
+        num_perm = self.num_perm
+        if not hashes:
+            return [MAX_HASH] * num_perm
+
+        bins = [MAX_HASH + 1] * num_perm
+        for h in hashes:
+            slot = h % num_perm
+            value = (h // num_perm) & MAX_HASH
+            if value < bins[slot]:
+                bins[slot] = value
+
+        # Densify: empty bins borrow the next non-empty bin to the right
+        signature = bins[:]
+        for i in range(num_perm):
+            if bins[i] > MAX_HASH:
+                distance = 1
+                while bins[(i + distance) % num_perm] > MAX_HASH:
+                    distance += 1
+                signature[i] = (bins[(i + distance) % num_perm] + distance * DENSIFY_OFFSET) & MAX_HASH
+        return signature
+
+    def signatures(self, texts: Iterable[str]) -> List[List[int]]:
+        """Signatures for many texts, reusing and filling the persistent cache"""
+        texts = list(texts)
+        keys = [content_hash(text) for text in texts]
+        cached = self._fetch_cached(set(keys))
+        fresh = {}
+        result = []
+        for key, text in zip(keys, texts):
+            signature = cached.get(key) or fresh.get(key)
+            if signature is None:
+                signature = self.compute(text)
+                fresh[key] = signature
+            result.append(signature)
+        if fresh:
+            self._store(fresh)
+        return result
+
+    def _fetch_cached(self, keys: set) -> Dict[str, List[int]]:
+        found = {}
+        keys = list(keys)
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT content_hash, signature FROM signatures "
+                    f"WHERE num_perm = ? AND content_hash IN ({','.join('?' * len(chunk))})",
+                    [self.num_perm, *chunk]
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array('I', blob).tolist()
+        return found
+
+    def _store(self, signatures: Dict[str, List[int]]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO signatures (content_hash, num_perm, signature) VALUES (?, ?, ?)",
+                [(key, self.num_perm, array('I', sig).tobytes()) for key, sig in signatures.items()]
+            )
+            self._conn.commit()
+
+
+def estimate_similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+class LSHIndex:
+    """Locality-sensitive hashing over signature bands.
+
+    Only documents sharing at least one band bucket are compared, so lookups
+    stay close to constant time regardless of how many documents are indexed.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+        self.signatures: Dict[str, List[int]] = {}
+
+    def _band_keys(self, signature: List[int]) -> List[bytes]:
+        rows = self.rows
+        return [
+            array('I', signature[band * rows:(band + 1) * rows]).tobytes()
+            for band in range(self.bands)
+        ]
+
+    def add(self, key: str, signature: List[int]):
+        self.signatures[key] = signature
+        for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(band_key, []).append(key)
+
+    def query(self, signature: List[int], threshold: float) -> List[Tuple[str, float]]:
+        """Indexed keys whose estimated similarity reaches threshold, best first"""
+        candidates = set()
+        for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(bucket.get(band_key, ()))
+        matches = []
+        for key in candidates:
+            similarity = estimate_similarity(signature, self.signatures[key])
+            if similarity >= threshold:
+                matches.append((key, similarity))
+        matches.sort(key=lambda item: -item[1])
+        return matches
+
+
+def find_near_duplicates(hasher: MinHasher, local_docs: Dict[str, str],
+                         remote_docs: Optional[Dict[str, str]] = None,
+                         threshold: float = 0.8, bands: int = 16) -> Dict[str, List[Dict]]:
+    """Flag near-duplicates among local_docs and between local_docs and remote_docs.
+
+    Both arguments map an identifier (file path, post ID) to plain text.
+    """
+    local_keys = list(local_docs)
+    local_sigs = hasher.signatures(local_docs[k] for k in local_keys)
+
+    local_index = LSHIndex(hasher.num_perm, bands)
+    local_matches = []
+    for key, signature in zip(local_keys, local_sigs):
+        matches = local_index.query(signature, threshold)
+        if matches:
+            local_matches.append({
+                'file': key,
+                'matches': [{'file': other, 'similarity': round(sim, 3)} for other, sim in matches]
+            })
+        local_index.add(key, signature)
+
+    remote_matches = []
+    if remote_docs:
+        remote_keys = list(remote_docs)
+        remote_index = LSHIndex(hasher.num_perm, bands)
+        for key, signature in zip(remote_keys, hasher.signatures(remote_docs[k] for k in remote_keys)):
+            remote_index.add(key, signature)
+        for key, signature in zip(local_keys, local_sigs):
+            matches = remote_index.query(signature, threshold)
+            if matches:
+                remote_matches.append({
+                    'file': key,
+                    'matches': [{'post': other, 'similarity': round(sim, 3)} for other, sim in matches]
+                })
+
+    return {'local': local_matches, 'remote': remote_matches}
@@ -0,0 +1,169 @@
+"""
+In-memory, precompressed static assets with content-hashed URLs
+"""
+from typing import Dict, Optional
+from pathlib import Path
+import gzip
+import hashlib
+import mimetypes
+import re
+import threading
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+MIN_COMPRESS_SIZE = 1024
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# src/href attributes pointing into /static, with an optional ?v= cache-buster
+ASSET_REFERENCE = re.compile(r'((?:src|href)=")/static/([^"?#]+)(?:\?[^"#]*)?(")')
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Map each coding in an Accept-Encoding header to its q-value"""
+    codings = {}
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        q = 1.0
+        match = re.search(r'q=([0-9.]+)', params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        codings[name.strip().lower()] = q
+    return codings
+
+
+def choose_encoding(header: str, available) -> Optional[str]:
+    """Best of br/gzip the client accepts among the available variants"""
+    codings = parse_accept_encoding(header or "")
+    wildcard = codings.get('*', 0.0)
+    for encoding in ('br', 'gzip'):
+        if encoding in available and codings.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+class StaticAsset:
+    """One file held in memory with its compressed variants"""
+
+    def __init__(self, name: str, data: bytes, content_type: Optional[str] = None):
+        self.name = name
+        self.content_type = content_type or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        self.digest = hashlib.sha256(data).hexdigest()[:16]
+        self.variants: Dict[Optional[str], bytes] = {None: data}
+        if self.content_type.startswith(COMPRESSIBLE_TYPES) and len(data) >= MIN_COMPRESS_SIZE:
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) < len(data):
+                self.variants['gzip'] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=11)
+                if len(compressed) < len(data):
+                    self.variants['br'] = compressed
+
+    @property
+    def hashed_name(self) -> str:
+        path = Path(self.name)
+        return str(path.with_name(f"{path.stem}.{self.digest[:10]}{path.suffix}"))
+
+    def etag(self, encoding: Optional[str]) -> str:
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def response(self, request: Request, cache_control: str) -> Response:
+        """200 with the best variant for the client, or 304 if its copy is current"""
+        encoding = choose_encoding(request.headers.get('accept-encoding', ''), self.variants)
+        headers = {
+            'ETag': self.etag(encoding),
+            'Cache-Control': cache_control,
+            'Vary': 'Accept-Encoding',
+        }
+        if encoding:
+            headers['Content-Encoding'] = encoding
+
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match:
+            tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            # Any representation of the same content is still valid
+            if '*' in tags or tags & {self.etag(e) for e in self.variants}:
+                return Response(status_code=304, headers=headers)
+
+        media_type = self.content_type
+        if media_type.startswith('text/') or media_type == 'application/javascript':
+            media_type += '; charset=utf-8'
+        return Response(content=self.variants[encoding], media_type=media_type, headers=headers)
+
+
+class AssetBundle:
+    """Static files and the index page, read and compressed on first use.
+
+    Every file under static_dir is served both at its plain URL (revalidated
+    through its ETag) and at a content-hashed URL cached as immutable. The
+    index page's /static references are rewritten to the hashed URLs, so a
+    deploy changes the URLs and browsers never need to revalidate assets.
+    """
+
+    def __init__(self, static_dir: Path, index_file: Path, url_prefix: str = "/static"):
+        self.static_dir = static_dir
+        self.index_file = index_file
+        self.url_prefix = url_prefix
+        self.assets: Dict[str, StaticAsset] = {}
+        self.hashed: Dict[str, StaticAsset] = {}
+        self.index: Optional[StaticAsset] = None
+        self._ready = False
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        """Read and compress the files on first use instead of at import"""
+        with self._load_lock:
+            if self._ready:
+                return
+            if self.static_dir.is_dir():
+                for path in sorted(self.static_dir.rglob('*')):
+                    if path.is_file():
+                        name = path.relative_to(self.static_dir).as_posix()
+                        asset = StaticAsset(name, path.read_bytes())
+                        self.assets[name] = asset
+                        self.hashed[asset.hashed_name] = asset
+            if self.index_file.is_file():
+                html = ASSET_REFERENCE.sub(self._rewrite, self.index_file.read_text(encoding='utf-8'))
+                self.index = StaticAsset(self.index_file.name, html.encode('utf-8'), 'text/html')
+            self._ready = True
+
+    def _rewrite(self, match: re.Match) -> str:
+        asset = self.assets.get(match.group(2))
+        if asset is None:
+            return match.group(0)
+        return f"{match.group(1)}{self.url_prefix}/{asset.hashed_name}{match.group(3)}"
+
+    def url(self, name: str) -> str:
+        """Hashed URL of an asset, for templates and redirects"""
+        if not self._ready:
+            self.load()
+        asset = self.assets.get(name)
+        return f"{self.url_prefix}/{asset.hashed_name if asset else name}"
+
+    def serve(self, request: Request, name: str) -> Optional[Response]:
+        if not self._ready:
+            self.load()
+        asset = self.hashed.get(name)
+        if asset is not None:
+            return asset.response(request, IMMUTABLE)
+        asset = self.assets.get(name)
+        if asset is not None:
+            return asset.response(request, REVALIDATE)
+        return None
+
+    def serve_index(self, request: Request) -> Optional[Response]:
+        if not self._ready:
+            self.load()
+        return self.index.response(request, REVALIDATE) if self.index else None
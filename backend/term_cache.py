@@ -0,0 +1,82 @@
+"""
+Category and tag lists cached in memory and on local disk
+"""
+from typing import Dict, List, Tuple
+from pathlib import Path
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+from wordpress_api_async import WordPressAPIAsync
+
+TAXONOMIES = ('categories', 'tags')
+
+
+class TermCache:
+    """Per-profile taxonomy lists shared by every request of an instance.
+
+    Lists live in memory and are also written as JSON under cache_dir (/tmp
+    on serverless), so a fresh process on the same instance starts warm.
+    Entries older than ttl seconds are fetched again; empty results are not
+    cached since the API client returns [] on errors.
+    """
+
+    def __init__(self, cache_dir: Path, ttl: float = 300):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self._memory: Dict[Tuple[str, str], Tuple[float, List[Dict]]] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+
+    def _path(self, profile_name: str, taxonomy: str) -> Path:
+        digest = hashlib.sha256(profile_name.encode('utf-8')).hexdigest()[:16]
+        return self.cache_dir / f"{digest}-{taxonomy}.json"
+
+    def _read_disk(self, path: Path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            return entry['fetched_at'], entry['terms']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, path: Path, fetched_at: float, terms: List[Dict]):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'fetched_at': fetched_at, 'terms': terms}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing term cache {path}: {e}")
+
+    async def get(self, api: WordPressAPIAsync, taxonomy: str, refresh: bool = False) -> List[Dict]:
+        if taxonomy not in TAXONOMIES:
+            raise ValueError(f"Unknown taxonomy: {taxonomy}")
+        key = (api.profile.name, taxonomy)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            now = time.time()
+            path = self._path(*key)
+            if not refresh:
+                cached = self._memory.get(key) or self._read_disk(path)
+                if cached and now - cached[0] < self.ttl:
+                    self._memory[key] = cached
+                    return cached[1]
+            if taxonomy == 'categories':
+                terms = await api.get_categories()
+            else:
+                terms = await api.get_tags()
+            if terms:
+                self._memory[key] = (now, terms)
+                self._write_disk(path, now, terms)
+            return terms
+
+    def invalidate(self, profile_name: str):
+        for taxonomy in TAXONOMIES:
+            self._memory.pop((profile_name, taxonomy), None)
+            try:
+                self._path(profile_name, taxonomy).unlink()
+            except FileNotFoundError:
+                pass
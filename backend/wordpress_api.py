@@ -2,10 +2,12 @@
 WordPress REST API client for the web application
 """
 from typing import List, Dict, Optional
-import requests
 import mimetypes
 from pathlib import Path
 from models import WordPressProfile
+from lazy_imports import lazy_import
+
+requests = lazy_import("requests")
 
 
 class WordPressAPI:
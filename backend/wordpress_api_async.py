@@ -3,11 +3,104 @@ WordPress REST API client - Fully Async Version
 Optimized for non-blocking operations
 """
 from typing import List, Dict, Optional
-import aiohttp
 import asyncio
 import mimetypes
+import re
+import time
 from pathlib import Path
 from models import WordPressProfile
+from lazy_imports import lazy_import
+from server_timing import timed_call
+from item_trace import span
+from metrics import UPSTREAM_REQUESTS, UPSTREAM_LATENCY, UPSTREAM_RETRIES, UPSTREAM_TIMEOUTS
+
+aiohttp = lazy_import("aiohttp")
+
+# One pooled client session per event loop, reused by every API instance so
+# keep-alive connections and DNS lookups survive across requests (and across
+# warm serverless invocations) instead of being rebuilt for each call
+_shared_sessions: Dict[asyncio.AbstractEventLoop, "aiohttp.ClientSession"] = {}
+
+
+def endpoint_label(endpoint: str) -> str:
+    """REST route of an endpoint with IDs folded, for metric labels"""
+    path = endpoint.split('?', 1)[0].strip('/')
+    return re.sub(r'(^|/)\d+(?=/|$)', r'\1{id}', path) or "root"
+
+
+async def _on_request_start(session, ctx, params):
+    ctx.started = time.perf_counter()
+
+
+async def _on_request_end(session, ctx, params):
+    _observe(ctx, params.method, params.response.status)
+
+
+async def _on_request_exception(session, ctx, params):
+    if isinstance(params.exception, asyncio.TimeoutError):
+        labels = ctx.trace_request_ctx
+        if labels:
+            UPSTREAM_TIMEOUTS.inc(profile=labels['profile'], endpoint=labels['endpoint'])
+        _observe(ctx, params.method, "timeout")
+    else:
+        _observe(ctx, params.method, "error")
+
+
+def _observe(ctx, method: str, status):
+    """Record one attempt of a request made with trace_request_ctx labels"""
+    labels = ctx.trace_request_ctx
+    if not labels or not hasattr(ctx, 'started'):
+        return
+    UPSTREAM_LATENCY.observe(time.perf_counter() - ctx.started, profile=labels['profile'],
+                             method=method, endpoint=labels['endpoint'])
+    UPSTREAM_REQUESTS.inc(profile=labels['profile'], endpoint=labels['endpoint'], status=status)
+
+
+def _trace_config() -> "aiohttp.TraceConfig":
+    config = aiohttp.TraceConfig()
+    config.on_request_start.append(_on_request_start)
+    config.on_request_end.append(_on_request_end)
+    config.on_request_exception.append(_on_request_exception)
+    return config
+
+
+def shared_session() -> "aiohttp.ClientSession":
+    """The running loop's client session, created on first use"""
+    loop = asyncio.get_running_loop()
+    session = _shared_sessions.get(loop)
+    if session is None or session.closed:
+        for stale in [other for other in _shared_sessions if other.is_closed()]:
+            del _shared_sessions[stale]
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, limit_per_host=20, ttl_dns_cache=300),
+            trace_configs=[_trace_config()]
+        )
+        _shared_sessions[loop] = session
+    return session
+
+
+async def close_shared_session():
+    """Close the running loop's client session (at shutdown)"""
+    session = _shared_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+
+# Statuses worth retrying later; the request may have reached WordPress for 5xx
+TRANSIENT_STATUSES = {429, 502, 503, 504}
+
+
+class WordPressUnavailableError(Exception):
+    """The site could not be reached or kept answering with transient errors.
+
+    maybe_sent is False when the request certainly never reached WordPress
+    (e.g. connection refused), so it can be replayed without a duplicate check.
+    """
+
+    def __init__(self, message: str, maybe_sent: bool = True):
+        super().__init__(message)
+        self.maybe_sent = maybe_sent
+
 
 class WordPressAPIAsync:
     """Fully async WordPress REST API client"""
@@ -20,61 +113,95 @@ class WordPressAPIAsync:
         self.max_retries = 3
         self.retry_delay = 1.0  # seconds
     
-    async def _make_request(self, method: str, endpoint: str, **kwargs) -> Optional[Dict]:
+    async def _backoff(self, attempt: int):
+        """Wait before retrying, as a retry_backoff span of the article being published"""
+        with span("retry_backoff"):
+            await asyncio.sleep(self.retry_delay * (2 ** attempt))
+    
+    def _labels(self, endpoint: str) -> Dict[str, str]:
+        """Metric labels of a request, passed to aiohttp as trace_request_ctx"""
+        return {'profile': self.profile.name, 'endpoint': endpoint_label(endpoint)}
+    
+    @timed_call("wordpress")
+    async def _make_request(self, method: str, endpoint: str, base_url: Optional[str] = None,
+                            **kwargs) -> Optional[Dict]:
         """Make async HTTP request with proper error handling and retries"""
-        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        url = f"{base_url or self.base_url}/{endpoint.lstrip('/')}"
+        labels = self._labels(endpoint)
         
         for attempt in range(self.max_retries):
             try:
-                async with aiohttp.ClientSession(
-                    auth=self.auth, 
-                    timeout=self.timeout,
-                    connector=aiohttp.TCPConnector(
-                        limit=10,
-                        limit_per_host=5,
-                        ttl_dns_cache=300,
-                        use_dns_cache=True
-                    )
-                ) as session:
-                    async with session.request(method, url, **kwargs) as response:
-                        if response.status in [200, 201]:
-                            return await response.json()
-                        elif response.status in [429, 502, 503, 504]:
-                            # Retry on rate limit or server errors
-                            if attempt < self.max_retries - 1:
-                                await asyncio.sleep(self.retry_delay * (2 ** attempt))
-                                continue
-                        
-                        error_text = await response.text()
-                        print(f"HTTP {response.status} on attempt {attempt + 1}: {error_text}")
-                        if attempt == self.max_retries - 1:
-                            raise aiohttp.ClientResponseError(
-                                request_info=response.request_info,
-                                history=response.history,
-                                status=response.status,
-                                message=error_text
+                async with shared_session().request(method, url, auth=self.auth, timeout=self.timeout,
+                                                    trace_request_ctx=labels, **kwargs) as response:
+                    if response.status in [200, 201, 207]:
+                        return await response.json()
+                    elif response.status in TRANSIENT_STATUSES:
+                        # Retry on rate limit or server errors
+                        if attempt < self.max_retries - 1:
+                            UPSTREAM_RETRIES.inc(reason=str(response.status), **labels)
+                            await self._backoff(attempt)
+                            continue
+                    
+                    error_text = await response.text()
+                    print(f"HTTP {response.status} on attempt {attempt + 1}: {error_text}")
+                    if attempt == self.max_retries - 1:
+                        if response.status in TRANSIENT_STATUSES:
+                            raise WordPressUnavailableError(
+                                f"HTTP {response.status} from {self.profile.url}",
+                                maybe_sent=response.status != 429
                             )
-                        
-            except asyncio.TimeoutError:
+                        raise aiohttp.ClientResponseError(
+                            request_info=response.request_info,
+                            history=response.history,
+                            status=response.status,
+                            message=error_text
+                        )
+                    
+            except WordPressUnavailableError:
+                raise
+            
+            except aiohttp.ClientConnectorError as e:
+                # Nothing listening or DNS failure: retrying right away is wasted time
+                print(f"Cannot connect for {method} {endpoint}: {e}")
+                raise WordPressUnavailableError(f"{self.profile.url} is unreachable: {e}",
+                                                maybe_sent=False) from e
+            
+            except asyncio.TimeoutError as e:
                 print(f"Timeout for {method} {endpoint} on attempt {attempt + 1}")
                 if attempt == self.max_retries - 1:
-                    raise
-                await asyncio.sleep(self.retry_delay * (2 ** attempt))
+                    raise WordPressUnavailableError(f"{self.profile.url} timed out") from e
+                UPSTREAM_RETRIES.inc(reason="timeout", **labels)
+                await self._backoff(attempt)
                 
             except aiohttp.ClientError as e:
                 print(f"Client error for {method} {endpoint} on attempt {attempt + 1}: {e}")
                 if attempt == self.max_retries - 1:
+                    if isinstance(e, aiohttp.ClientConnectionError):
+                        raise WordPressUnavailableError(f"{self.profile.url} dropped the connection: {e}") from e
                     raise
-                await asyncio.sleep(self.retry_delay * (2 ** attempt))
+                UPSTREAM_RETRIES.inc(reason="client_error", **labels)
+                await self._backoff(attempt)
                 
             except Exception as e:
                 print(f"Unexpected error for {method} {endpoint} on attempt {attempt + 1}: {e}")
                 if attempt == self.max_retries - 1:
                     raise
-                await asyncio.sleep(self.retry_delay * (2 ** attempt))
+                UPSTREAM_RETRIES.inc(reason="error", **labels)
+                await self._backoff(attempt)
         
         return None
     
+    @timed_call("wordpress")
+    async def ping(self, timeout: float = 10) -> bool:
+        """Single cheap health probe of the REST API root, without retries"""
+        try:
+            async with shared_session().get(f"{self.profile.url}/wp-json/",
+                                            timeout=aiohttp.ClientTimeout(total=timeout),
+                                            trace_request_ctx=self._labels("")) as response:
+                return response.status < 500
+        except Exception:
+            return False
+    
     async def test_connection(self) -> bool:
         """Test API connection asynchronously"""
         try:
@@ -102,6 +229,68 @@ class WordPressAPIAsync:
             print(f"Error getting tags: {e}")
             return []
     
+    async def get_posts(self, fields: str = "id,link,title,content", max_pages: int = 1000) -> List[Dict]:
+        """Get all published posts asynchronously, following pagination"""
+        posts = []
+        per_page = 100
+        for page in range(1, max_pages + 1):
+            try:
+                result = await self._make_request(
+                    "GET", "posts",
+                    params={"per_page": per_page, "page": page, "_fields": fields}
+                )
+            except Exception as e:
+                # WordPress answers 400 past the last page
+                if page == 1:
+                    print(f"Error getting posts: {e}")
+                break
+            if not result:
+                break
+            posts.extend(result)
+            if len(result) < per_page:
+                break
+        return posts
+
+    async def get_term_ids(self, taxonomy: str, max_pages: int = 100) -> List[int]:
+        """IDs of every term of a taxonomy ('categories' or 'tags'), following pagination"""
+        ids = []
+        per_page = 100
+        for page in range(1, max_pages + 1):
+            result = await self._make_request(
+                "GET", taxonomy, params={"per_page": per_page, "page": page, "_fields": "id"}
+            )
+            if not result:
+                break
+            ids.extend(term['id'] for term in result)
+            if len(result) < per_page:
+                break
+        return ids
+    
+    async def get_media(self, media_ids: List[int]) -> List[Dict]:
+        """Look up media items by ID, 100 per request"""
+        media = []
+        for start in range(0, len(media_ids), 100):
+            chunk = media_ids[start:start + 100]
+            result = await self._make_request(
+                "GET", "media",
+                params={"include": ",".join(map(str, chunk)), "per_page": len(chunk),
+                        "_fields": "id,mime_type,media_type"}
+            )
+            media.extend(result or [])
+        return media
+    
+    async def find_post(self, search: str) -> Optional[Dict]:
+        """Find a post of any status whose title or content contains search"""
+        result = await self._make_request(
+            "GET", "posts",
+            params={
+                "search": search,
+                "status": "publish,future,draft,pending,private",
+                "_fields": "id,link,status"
+            }
+        )
+        return result[0] if result else None
+
     async def upload_image(self, image_path: Path) -> Optional[int]:
         """Upload image asynchronously and return media ID"""
         try:
@@ -114,25 +303,49 @@ class WordPressAPIAsync:
             if not image_data:
                 return None
             
+            return await self.upload_image_data(image_data, image_path.name)
+                    
+        except WordPressUnavailableError:
+            raise
+        except Exception as e:
+            print(f"Error uploading image: {e}")
+            return None
+    
+    @timed_call("wordpress")
+    async def upload_image_data(self, image_data: bytes, filename: str) -> Optional[int]:
+        """Upload in-memory image bytes asynchronously and return media ID"""
+        try:
+            mime_type, _ = mimetypes.guess_type(filename)
+            if not mime_type or not mime_type.startswith('image/'):
+                raise ValueError("File is not a valid image")
+            
             headers = {
-                'Content-Disposition': f'attachment; filename="{image_path.name}"',
+                'Content-Disposition': f'attachment; filename="{filename}"',
                 'Content-Type': mime_type
             }
             
-            async with aiohttp.ClientSession(
-                auth=self.auth, 
-                timeout=aiohttp.ClientTimeout(total=60)  # Longer timeout for uploads
-            ) as session:
-                async with session.post(
-                    f"{self.base_url}/media",
-                    headers=headers,
-                    data=image_data
-                ) as response:
-                    if response.status == 201:
-                        result = await response.json()
-                        return result.get('id')
-                    return None
+            async with shared_session().post(
+                f"{self.base_url}/media",
+                headers=headers,
+                data=image_data,
+                auth=self.auth,
+                timeout=aiohttp.ClientTimeout(total=60),  # Longer timeout for uploads
+                trace_request_ctx=self._labels("media")
+            ) as response:
+                if response.status == 201:
+                    result = await response.json()
+                    return result.get('id')
+                if response.status in TRANSIENT_STATUSES:
+                    raise WordPressUnavailableError(f"HTTP {response.status} from {self.profile.url}")
+                return None
                     
+        except WordPressUnavailableError:
+            raise
+        except aiohttp.ClientConnectorError as e:
+            raise WordPressUnavailableError(f"{self.profile.url} is unreachable: {e}",
+                                            maybe_sent=False) from e
+        except asyncio.TimeoutError as e:
+            raise WordPressUnavailableError(f"{self.profile.url} timed out") from e
         except Exception as e:
             print(f"Error uploading image: {e}")
             return None
@@ -154,8 +367,8 @@ class WordPressAPIAsync:
     
     async def create_post(self, title: str, content: str, status: str = 'publish',
                          categories: List[int] = None, tags: List[int] = None,
-                         featured_media: int = None) -> Optional[Dict]:
-        """Create a new post asynchronously"""
+                         featured_media: int = None, date_gmt: str = None) -> Optional[Dict]:
+        """Create a new post asynchronously (status 'future' with date_gmt schedules it)"""
         try:
             post_data = {
                 'title': title,
@@ -169,14 +382,43 @@ class WordPressAPIAsync:
                 post_data['tags'] = tags
             if featured_media:
                 post_data['featured_media'] = featured_media
+            if date_gmt:
+                post_data['date_gmt'] = date_gmt
             
             result = await self._make_request("POST", "posts", json=post_data)
             return result
             
+        except WordPressUnavailableError:
+            raise
         except Exception as e:
             print(f"Error creating post: {e}")
             return None
     
+    async def batch_create_posts(self, posts: List[Dict]) -> Optional[List[Dict]]:
+        """Create up to 25 posts in one call to the WordPress 5.6+ batch route.
+
+        Returns one {status, body} per post in order, or None when the site
+        has no batch route and the posts must be created one by one.
+        """
+        try:
+            result = await self._make_request(
+                "POST", "batch/v1", base_url=f"{self.profile.url}/wp-json",
+                json={
+                    "validation": "normal",
+                    "requests": [{"method": "POST", "path": "/wp/v2/posts", "body": post} for post in posts]
+                }
+            )
+        except aiohttp.ClientResponseError as e:
+            if e.status in (400, 404, 405):
+                return None
+            raise
+        if not result or 'responses' not in result:
+            return None
+        return [
+            {"status": response.get('status'), "body": response.get('body')}
+            for response in result['responses']
+        ]
+    
     async def create_category(self, name: str, description: str = "") -> Optional[Dict]:
         """Create a new category asynchronously"""
         try:
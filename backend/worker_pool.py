@@ -0,0 +1,158 @@
+"""
+Fair scheduling of WordPress requests across profiles
+"""
+from typing import Deque, Dict, Optional, Tuple
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+import asyncio
+import time
+
+from item_trace import span
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BULK: 'bulk'}
+
+
+class FairWorkerPool:
+    """Grants request slots with per-profile fairness and priorities.
+
+    Callers wrap each WordPress request in `async with pool.slot(profile)`.
+    Interactive requests always go before bulk ones, and bulk work can never
+    take the last interactive_reserve slots, so a single publish does not
+    wait behind a 5,000-post job. Within a priority, profiles share slots by
+    deficit round-robin weighted per profile, and no profile holds more than
+    per_profile slots at once.
+    """
+
+    def __init__(self, max_workers: int = 8, per_profile: int = 4, interactive_reserve: int = 2,
+                 quantum: float = 1.0, weights: Optional[Dict[str, float]] = None):
+        self.max_workers = max(1, max_workers)
+        self.per_profile = max(1, per_profile)
+        self.interactive_reserve = min(interactive_reserve, self.max_workers - 1)
+        self.quantum = quantum
+        self.weights = dict(weights or {})
+        self._queues: Dict[int, 'OrderedDict[str, Deque[Tuple[asyncio.Future, float]]]'] = {
+            INTERACTIVE: OrderedDict(), BULK: OrderedDict()
+        }
+        self._deficit: Dict[Tuple[int, str], float] = {}
+        self._active: Dict[str, int] = {}
+        self._running = 0
+        self._granted = {INTERACTIVE: 0, BULK: 0}
+        self._wait_seconds = {INTERACTIVE: 0.0, BULK: 0.0}
+
+    @asynccontextmanager
+    async def slot(self, profile: str, priority: int = BULK, cost: float = 1.0):
+        """Hold one request slot for profile while the block runs"""
+        with span("pool_wait"):
+            await self.acquire(profile, priority, cost)
+        try:
+            yield
+        finally:
+            self.release(profile)
+
+    async def acquire(self, profile: str, priority: int = BULK, cost: float = 1.0):
+        future = asyncio.get_running_loop().create_future()
+        waiter = (future, cost)
+        self._queues[priority].setdefault(profile, deque()).append(waiter)
+        started = time.monotonic()
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just before the cancellation arrived
+                self.release(profile)
+            else:
+                self._remove(priority, profile, waiter)
+            raise
+        self._granted[priority] += 1
+        self._wait_seconds[priority] += time.monotonic() - started
+
+    def release(self, profile: str):
+        self._running -= 1
+        self._active[profile] -= 1
+        if not self._active[profile]:
+            del self._active[profile]
+        self._dispatch()
+
+    def _remove(self, priority: int, profile: str, waiter):
+        queue = self._queues[priority].get(profile)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            pass
+        if not queue:
+            del self._queues[priority][profile]
+            self._deficit.pop((priority, profile), None)
+
+    def _capacity(self, priority: int) -> int:
+        if priority == INTERACTIVE:
+            return self.max_workers
+        return self.max_workers - self.interactive_reserve
+
+    def _dispatch(self):
+        while True:
+            picked = self._pick()
+            if picked is None:
+                return
+            profile, future = picked
+            self._running += 1
+            self._active[profile] = self._active.get(profile, 0) + 1
+            future.set_result(None)
+
+    def _pick(self) -> Optional[Tuple[str, asyncio.Future]]:
+        """Next waiter to run: highest priority first, then deficit round-robin"""
+        for priority in (INTERACTIVE, BULK):
+            if self._running >= self._capacity(priority):
+                continue
+            ring = self._queues[priority]
+            # Waiters cancelled but not yet woken still sit in the queues
+            for profile, queue in list(ring.items()):
+                for waiter in [w for w in queue if w[0].cancelled()]:
+                    self._remove(priority, profile, waiter)
+            if not any(self._active.get(p, 0) < self.per_profile for p in ring):
+                continue
+            # Each pass over the ring tops up every eligible profile's deficit
+            # by its weighted quantum, so the loop ends once one can afford
+            # the request at its head
+            while True:
+                profile, queue = next(iter(ring.items()))
+                key = (priority, profile)
+                future, cost = queue[0]
+                if self._active.get(profile, 0) >= self.per_profile:
+                    ring.move_to_end(profile)
+                    continue
+                if self._deficit.get(key, 0.0) < cost:
+                    self._deficit[key] = self._deficit.get(key, 0.0) + \
+                        self.quantum * self.weights.get(profile, 1.0)
+                    ring.move_to_end(profile)
+                    continue
+                self._deficit[key] -= cost
+                queue.popleft()
+                if not queue:
+                    del ring[profile]
+                    self._deficit.pop(key, None)
+                return profile, future
+        return None
+
+    def stats(self) -> Dict:
+        """Slot usage, queue lengths and mean wait per priority"""
+        return {
+            'max_workers': self.max_workers,
+            'per_profile': self.per_profile,
+            'interactive_reserve': self.interactive_reserve,
+            'running': self._running,
+            'active': dict(self._active),
+            'waiting': {
+                PRIORITY_NAMES[priority]: {profile: len(queue) for profile, queue in ring.items()}
+                for priority, ring in self._queues.items()
+            },
+            'granted': {PRIORITY_NAMES[p]: count for p, count in self._granted.items()},
+            'mean_wait_seconds': {
+                PRIORITY_NAMES[p]: round(self._wait_seconds[p] / count, 4) if count else 0.0
+                for p, count in self._granted.items()
+            },
+        }
@@ -0,0 +1,139 @@
+"""
+Serverless cold-start harness for api/index.py.
+
+Runs the Vercel entry point the way an instance does: a fresh interpreter
+imports api/index.py and invocations are passed straight to the ASGI app
+(no lifespan, no server). For each route it reports the first (cold)
+invocation, the median warm one, and which heavy dependencies that route
+pulled in. A second process is then started on the same STORAGE_DIR, as a
+recycled instance would be, to show what the /tmp-backed caches save.
+
+WordPress is simulated by mock_wordpress.py answering after --latency-ms.
+
+    python benchmarks/bench_coldstart.py [--warm 20] [--latency-ms 80]
+"""
+from pathlib import Path
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_wordpress import MockWordPress
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# api/index.py only serves the API with a token configured
+API_TOKEN = "bench-token"
+
+HEAVY_MODULES = {
+    'aiohttp': 'aiohttp.client',
+    'requests': 'requests.sessions',
+    'cryptography': 'cryptography.hazmat.primitives.ciphers',
+}
+
+CHILD = r"""
+import asyncio, json, statistics, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+from api.index import app
+import_ms = (time.perf_counter() - started) * 1000
+heavy = {heavy!r}
+
+async def call(method, path, body=None):
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {{
+        "type": "http", "asgi": {{"version": "3.0"}}, "http_version": "1.1", "method": method,
+        "scheme": "https", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "client": ("127.0.0.1", 1), "server": ("bench", 443),
+        "headers": [(b"host", b"bench"), (b"content-type", b"application/json"),
+                    (b"authorization", b"Bearer {token}"),
+                    (b"content-length", str(len(payload)).encode())],
+    }}
+    sent = False
+    status = []
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.sleep(3600)
+        sent = True
+        return {{"type": "http.request", "body": payload, "more_body": False}}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    t = time.perf_counter()
+    await app(scope, receive, send)
+    return (time.perf_counter() - t) * 1000, status[0]
+
+async def main():
+    rows = []
+    for method, path, body in {steps!r}:
+        before = {{name for name, marker in heavy.items() if marker in sys.modules}}
+        cold, status = await call(method, path, body)
+        loaded = sorted({{name for name, marker in heavy.items() if marker in sys.modules}} - before)
+        warm = [(await call(method, path, body))[0] for _ in range({warm})] if method == "GET" else []
+        rows.append({{"route": f"{{method}} {{path}}", "status": status, "cold": cold,
+                     "warm": statistics.median(warm) if warm else None, "loaded": loaded}})
+    print(json.dumps({{"import": import_ms, "rows": rows}}), flush=True)
+
+asyncio.run(main())
+"""
+
+
+def run_instance(storage: str, steps, warm: int) -> dict:
+    code = CHILD.format(root=str(ROOT), heavy=HEAVY_MODULES, steps=steps, warm=warm, token=API_TOKEN)
+    env = {**os.environ, 'STORAGE_DIR': storage, 'ARTICLES_DIR': storage, 'WPP_API_TOKEN': API_TOKEN}
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, timeout=120)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr[-2000:])
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result['wall'] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def report(title: str, result: dict):
+    print(f"\n{title}: import {result['import']:.0f} ms, process total {result['wall']:.0f} ms")
+    print(f"{'route':<36} {'status':>6} {'cold ms':>9} {'warm ms':>9}  loaded")
+    for row in result['rows']:
+        warm = f"{row['warm']:.2f}" if row['warm'] is not None else "-"
+        print(f"{row['route']:<36} {row['status']:>6} {row['cold']:>9.2f} {warm:>9}  "
+              f"{', '.join(row['loaded']) or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--warm", type=int, default=20, help="warm invocations per GET route")
+    parser.add_argument("--latency-ms", type=float, default=80, help="simulated WordPress latency")
+    args = parser.parse_args()
+
+    site = MockWordPress(latency=args.latency_ms / 1000, categories=100, tags=100)
+    profile = {'name': 'bench', 'url': site.start(), 'username': 'bench', 'app_password': 'bench'}
+    first_steps = [
+        ("GET", "/api/health", None),
+        ("GET", "/", None),
+        ("GET", "/api/profiles", None),
+        ("POST", "/api/profiles", profile),
+        ("GET", "/api/profiles", None),
+        ("GET", "/api/categories/bench", None),
+        ("GET", "/api/tags/bench", None),
+        ("POST", "/api/profiles/bench/test", None),
+    ]
+    recycled_steps = [
+        ("GET", "/api/health", None),
+        ("GET", "/api/profiles", None),
+        ("GET", "/api/categories/bench", None),
+    ]
+    with tempfile.TemporaryDirectory() as storage:
+        report("new instance", run_instance(storage, first_steps, args.warm))
+        report("recycled instance, same /tmp", run_instance(storage, recycled_steps, args.warm))
+    site.stop()
+
+
+if __name__ == "__main__":
+    main()
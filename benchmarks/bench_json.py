@@ -0,0 +1,128 @@
+"""
+Benchmark of the API JSON response path: latency and bytes on the wire.
+
+Compares the stock FastAPI JSONResponse with FastJSONResponse (orjson when
+installed, gzip/brotli negotiation, ?fields= projection) on payloads shaped
+like /api/files, taxonomy lists and job results, both as the app's default
+response class and returned directly by the endpoint (which also skips
+FastAPI's jsonable_encoder pass, as the large routes in main.py do).
+Requests are driven straight through the ASGI app, so no server or HTTP
+client is needed.
+
+    python benchmarks/bench_json.py [--repeat 50]
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import json_responses  # noqa: E402
+from json_responses import FastJSONResponse, ResponseOptionsMiddleware  # noqa: E402
+
+
+def make_payloads():
+    files = [
+        {"name": f"article-{i:05d}.md", "path": f"/home/user/Articles/article-{i:05d}.md",
+         "size": 1000 + i, "modified": "2025-07-12T10:%02d:00" % (i % 60)}
+        for i in range(5000)
+    ]
+    tags = [
+        {"id": i, "count": i % 97, "description": "", "link": f"https://example.com/tag/tag-{i}/",
+         "name": f"Tag number {i}", "slug": f"tag-{i}", "taxonomy": "post_tag", "meta": []}
+        for i in range(20000)
+    ]
+    results = {
+        "task_id": "0" * 32, "status": "completed", "total": 3000, "completed": 3000, "failed": 0,
+        "results": [
+            {"filename": f"article-{i:05d}.md", "success": True, "details": "Published successfully",
+             "url": f"https://example.com/?p={i}"}
+            for i in range(3000)
+        ],
+    }
+    return {"files": files, "tags": tags, "results": results}
+
+
+def make_app(payloads, response_class, direct: bool = False):
+    app = FastAPI(default_response_class=response_class)
+    if response_class is FastJSONResponse:
+        app.add_middleware(ResponseOptionsMiddleware)
+    for name, payload in payloads.items():
+        app.add_api_route(f"/{name}", make_endpoint(payload, direct), methods=["GET"])
+    return app
+
+
+def make_endpoint(payload, direct: bool):
+    # A closure rather than a default argument, which FastAPI would take for
+    # a query parameter and deep-copy on every request
+    if direct:
+        return lambda: FastJSONResponse(payload)
+    return lambda: payload
+
+
+async def request(app, path: str, query: str = "", accept_encoding: str = "gzip, deflate, br"):
+    """Run one GET through the ASGI app and return (seconds, body bytes)"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(b"host", b"bench"), (b"accept-encoding", accept_encoding.encode())],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    body = bytearray()
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.extend(message.get("body", b""))
+
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    return time.perf_counter() - started, len(body)
+
+
+async def measure(app, path: str, repeat: int, **kwargs):
+    await request(app, path, **kwargs)  # warm up routing and caches
+    timings, size = [], 0
+    for _ in range(repeat):
+        elapsed, size = await request(app, path, **kwargs)
+        timings.append(elapsed)
+    return statistics.median(timings) * 1000, size
+
+
+async def main(repeat: int):
+    payloads = make_payloads()
+    stock = make_app(payloads, JSONResponse)
+    fast = make_app(payloads, FastJSONResponse)
+    direct = make_app(payloads, FastJSONResponse, direct=True)
+    print(f"encoder: {'orjson' if json_responses.orjson else 'json'}, "
+          f"brotli: {'yes' if json_responses.brotli else 'no'}, repeat: {repeat}")
+    print(f"{'payload':<10} {'variant':<30} {'median ms':>10} {'bytes':>12}")
+    for name in payloads:
+        path = f"/{name}"
+        fields = {"files": "name,size", "tags": "id,name", "results": "filename,url"}[name]
+        variants = [
+            ("stock JSONResponse", stock, {}),
+            ("default class, identity", fast, {"accept_encoding": "identity"}),
+            ("default class, negotiated", fast, {}),
+            ("direct, identity", direct, {"accept_encoding": "identity"}),
+            ("direct, negotiated", direct, {}),
+            (f"direct, ?fields={fields}", direct, {"query": f"fields={fields}"}),
+        ]
+        for label, app, kwargs in variants:
+            ms, size = await measure(app, path, repeat, **kwargs)
+            print(f"{name:<10} {label:<30} {ms:>10.2f} {size:>12,}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(main(parser.parse_args().repeat))
@@ -0,0 +1,112 @@
+"""
+Startup benchmark: backend import time and time to first response.
+
+Each run starts a fresh interpreter (as a native-app launch or a serverless
+cold start does) with an empty STORAGE_DIR and measures:
+
+  * import: seconds to `import main`, measured inside the child;
+  * first response: from spawning the child to the first /api/health
+    response served through server_launcher.EmbeddedServer.
+
+It also checks that aiohttp, requests and cryptography were not loaded to
+serve that response. Medians above the budgets, or an eagerly loaded heavy
+dependency, exit with status 1 so the script can gate CI.
+
+    python benchmarks/bench_startup.py [--runs 5] [--max-import-ms 1500] [--max-first-response-ms 2500]
+"""
+from pathlib import Path
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Submodules that only appear in sys.modules once the lazy parent has loaded
+HEAVY_MODULES = {
+    'aiohttp': 'aiohttp.client',
+    'requests': 'requests.sessions',
+    'cryptography': 'cryptography.hazmat.primitives.ciphers',
+}
+
+CHILD = """
+import json, sys, time, urllib.request
+started = time.perf_counter()
+sys.path[:0] = [{root!r}, {backend!r}]
+import main
+imported = time.perf_counter() - started
+loaded = [name for name, marker in {heavy!r}.items() if marker in sys.modules]
+if {serve!r}:
+    from server_launcher import EmbeddedServer
+    server = EmbeddedServer()
+    server.start()
+    urllib.request.urlopen(server.url + "/api/health", timeout=10).read()
+    print(json.dumps({{"import": imported, "loaded": loaded}}), flush=True)
+    server.stop()
+else:
+    print(json.dumps({{"import": imported, "loaded": loaded}}), flush=True)
+"""
+
+
+def run_once(serve: bool) -> dict:
+    """Start a fresh interpreter; returns its import time, wall time and loaded heavy modules"""
+    code = CHILD.format(root=str(ROOT), backend=str(ROOT / "backend"), heavy=HEAVY_MODULES, serve=serve)
+    with tempfile.TemporaryDirectory() as storage:
+        env = {**os.environ, 'STORAGE_DIR': storage, 'ARTICLES_DIR': storage}
+        started = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, env=env, text=True)
+        line = proc.stdout.readline()
+        wall = time.perf_counter() - started
+        proc.wait(timeout=30)
+    if not line:
+        raise RuntimeError(f"child exited with status {proc.returncode} before reporting")
+    result = json.loads(line)
+    result['wall'] = wall
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=1500)
+    parser.add_argument("--max-first-response-ms", type=float, default=2500)
+    args = parser.parse_args()
+
+    imports, first_responses, loaded = [], [], set()
+    run_once(serve=True)  # warm the OS file cache and __pycache__
+    for _ in range(args.runs):
+        result = run_once(serve=False)
+        imports.append(result['import'] * 1000)
+        loaded.update(result['loaded'])
+        result = run_once(serve=True)
+        first_responses.append(result['wall'] * 1000)
+        loaded.update(result['loaded'])
+
+    import_ms = statistics.median(imports)
+    first_ms = statistics.median(first_responses)
+    print(f"runs: {args.runs}")
+    print(f"{'metric':<28} {'median ms':>10} {'min ms':>10} {'budget ms':>10}")
+    print(f"{'import main':<28} {import_ms:>10.1f} {min(imports):>10.1f} {args.max_import_ms:>10.0f}")
+    print(f"{'spawn to first response':<28} {first_ms:>10.1f} {min(first_responses):>10.1f} "
+          f"{args.max_first_response_ms:>10.0f}")
+    print(f"heavy modules loaded at startup: {', '.join(sorted(loaded)) or 'none'}")
+
+    failures = []
+    if import_ms > args.max_import_ms:
+        failures.append(f"import time {import_ms:.0f} ms exceeds {args.max_import_ms:.0f} ms")
+    if first_ms > args.max_first_response_ms:
+        failures.append(f"first response {first_ms:.0f} ms exceeds {args.max_first_response_ms:.0f} ms")
+    if loaded:
+        failures.append(f"loaded eagerly: {', '.join(sorted(loaded))}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
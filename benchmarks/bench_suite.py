@@ -0,0 +1,298 @@
+"""
+End-to-end benchmark suite against a local mock WordPress site.
+
+Drives backend/main.py through its ASGI app (no server, no network besides
+the mock site from mock_wordpress.py) and measures the paths users wait on:
+
+  * directory listing: /api/files over a directory of --files articles;
+  * taxonomy loading: categories and tags fetched from WordPress (cold,
+    ?refresh=true) and served from the term cache (warm);
+  * media upload: /api/upload-image/{profile} with a --image-kb image;
+  * bulk publishing: a /api/publish/batch job of --articles articles, on a
+    healthy site, one answering --error-rate of requests with 5xx, and one
+    throttling to --rate-limit requests per second with 429s.
+
+Each run is saved as JSON in benchmarks/results/ (named by time and git
+commit; the directory is git-ignored, results are per machine) and
+compared with the previous run made with the same options, so a
+regression between two versions shows up as a slower row; --fail-above makes it exit with status 1. Runs with different options
+are not compared (status 2 with --fail-above) unless --ignore-config.
+
+    python benchmarks/bench_suite.py [--latency-ms 20] [--articles 100] [--compare FILE]
+"""
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import httpx  # noqa: E402
+
+from mock_wordpress import MockWordPress  # noqa: E402
+
+# Figures compared between runs, lower is better
+COMPARED = ('p50_ms', 'p95_ms', 'seconds')
+PROFILE = 'bench'
+
+
+def git_version() -> str:
+    try:
+        out = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def latency_stats(samples: List[float], errors: int = 0) -> Dict:
+    from item_trace import percentile
+
+    values = sorted(samples)
+    total = sum(values)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'p50_ms': round(percentile(values, 50) * 1000, 2),
+        'p95_ms': round(percentile(values, 95) * 1000, 2),
+        'max_ms': round(values[-1] * 1000, 2) if values else 0.0,
+        'per_second': round(len(values) / total, 1) if total else 0.0,
+    }
+
+
+async def timed_requests(client: httpx.AsyncClient, repeat: int, method: str, url: str, **kwargs) -> Dict:
+    samples, errors = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        samples.append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            errors += 1
+    return latency_stats(samples, errors)
+
+
+def write_articles(directory: Path, count: int, words: int = 600):
+    body = " ".join(f"word{i % 97}" for i in range(words))
+    for i in range(count):
+        (directory / f"article-{i:05d}.md").write_text(f"# Article {i}\n\n{body}\n", encoding='utf-8')
+
+
+async def bench_listing(client, directory: Path, repeat: int) -> Dict:
+    return await timed_requests(client, repeat, "GET", "/api/files", params={'directory': str(directory)})
+
+
+async def bench_taxonomy(client, repeat: int) -> Dict[str, Dict]:
+    results = {}
+    for taxonomy in ('categories', 'tags'):
+        url = f"/api/{taxonomy}/{PROFILE}"
+        results[f"taxonomy_{taxonomy}_cold"] = await timed_requests(
+            client, repeat, "GET", url, params={'refresh': 'true'})
+        results[f"taxonomy_{taxonomy}_cached"] = await timed_requests(client, repeat, "GET", url)
+    return results
+
+
+async def bench_media(client, image: bytes, repeat: int) -> Dict:
+    return await timed_requests(client, repeat, "POST", f"/api/upload-image/{PROFILE}",
+                                files={'file': ('bench.jpg', image, 'image/jpeg')})
+
+
+async def bench_publish(client, directory: Path, count: int, image: Optional[bytes]) -> Dict:
+    """One batch job; the ASGI transport returns once its background task is done"""
+    paths = sorted(directory.glob("*.md"))[:count]
+    articles = [{'file_path': str(path), 'status': 'publish'} for path in paths]
+    files = {}
+    if image is not None:
+        for seq, article in enumerate(articles):
+            article['image'] = f"image_{seq}"
+            files[f"image_{seq}"] = (f"image_{seq}.jpg", image, 'image/jpeg')
+
+    started = time.perf_counter()
+    response = await client.post(f"/api/publish/batch/{PROFILE}",
+                                 data={'articles': json.dumps(articles)}, files=files or None)
+    response.raise_for_status()
+    task_id = response.json()['task_id']
+    while True:
+        status = (await client.get(f"/api/publish/status/{task_id}", params={'trace': 'true'})).json()
+        if status['status'] not in ('pending', 'running'):
+            break
+        await asyncio.sleep(0.05)
+    seconds = time.perf_counter() - started
+
+    timing = status.get('timing') or {}
+    return {
+        'items': status['total'],
+        'failed': status['failed'],
+        'seconds': round(seconds, 3),
+        'per_second': round(status['total'] / seconds, 1),
+        'bound_by': timing.get('bound_by'),
+        'stage_p50_ms': {name: round(stage['p50'] * 1000, 2) for name, stage in timing.get('stages', {}).items()},
+    }
+
+
+async def run_suite(args, site: MockWordPress, storage: Path) -> Dict:
+    import main
+    from wordpress_api_async import close_shared_session
+
+    logging.getLogger().setLevel(logging.WARNING)
+    articles_dir = storage / "articles"
+    articles_dir.mkdir()
+    write_articles(articles_dir, max(args.files, args.articles))
+    image = os.urandom(args.image_kb * 1024)
+
+    transport = httpx.ASGITransport(app=main.app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        response = await client.post("/api/profiles", json={
+            'name': PROFILE, 'url': site.url, 'username': 'bench', 'app_password': 'bench'})
+        response.raise_for_status()
+
+        results['directory_listing'] = await bench_listing(client, articles_dir, args.repeat)
+        results.update(await bench_taxonomy(client, args.repeat))
+        results['media_upload'] = await bench_media(client, image, args.repeat)
+
+        results['publish'] = await bench_publish(client, articles_dir, args.articles, None)
+        results['publish_with_images'] = await bench_publish(client, articles_dir, args.articles, image)
+
+        site.error_rate = args.error_rate
+        results['publish_errors'] = await bench_publish(client, articles_dir, args.articles, None)
+        site.error_rate = 0.0
+
+        site.rate_limit, site.burst = args.rate_limit, 5
+        results['publish_throttled'] = await bench_publish(client, articles_dir, args.articles, None)
+        site.rate_limit, site.burst = None, None
+    await close_shared_session()
+    return results
+
+
+def previous_result(exclude: Optional[Path], config: Dict) -> Optional[Path]:
+    """Latest stored run made with the same options"""
+    for path in sorted(RESULTS_DIR.glob("*.json"), reverse=True):
+        if path == exclude:
+            continue
+        try:
+            if json.loads(path.read_text(encoding='utf-8')).get('config') == config:
+                return path
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def config_differences(old: Dict, new: Dict) -> List[str]:
+    keys = sorted(set(old) | set(new))
+    return [f"{key}: {old.get(key)} -> {new.get(key)}" for key in keys if old.get(key) != new.get(key)]
+
+
+def compare(old: Dict, new: Dict, ignore_config: bool = False) -> Optional[float]:
+    """Print both runs side by side; returns the worst slowdown ratio.
+
+    Figures of runs made with different options say nothing about the code,
+    so those are only compared with ignore_config (flagged); otherwise the
+    differences are printed and None returned.
+    """
+    print(f"\ncompared with {old['version']} ({old['created']})")
+    differences = config_differences(old.get('config', {}), new['config'])
+    if differences:
+        print("options differ: " + "; ".join(differences))
+        if not ignore_config:
+            print("not comparing (use --ignore-config to compare anyway)")
+            return None
+    print(f"{'scenario':<32} {'figure':<8} {'before':>10} {'after':>10} {'change':>8}")
+    worst = 0.0
+    for name, figures in new['scenarios'].items():
+        before = old['scenarios'].get(name, {})
+        for key in COMPARED:
+            if key not in figures or not before.get(key):
+                continue
+            change = figures[key] / before[key] - 1
+            worst = max(worst, change)
+            print(f"{name:<32} {key:<8} {before[key]:>10} {figures[key]:>10} {change:>+7.0%}")
+    return worst
+
+
+def report(results: Dict):
+    print(f"{'scenario':<32} {'p50 ms':>9} {'p95 ms':>9} {'per s':>8} {'errors':>7}")
+    for name, figures in results.items():
+        if 'seconds' in figures:
+            print(f"{name:<32} {'-':>9} {'-':>9} {figures['per_second']:>8} {figures['failed']:>7}"
+                  f"   {figures['items']} items in {figures['seconds']} s, bound by {figures['bound_by']}")
+        else:
+            print(f"{name:<32} {figures['p50_ms']:>9} {figures['p95_ms']:>9} "
+                  f"{figures['per_second']:>8} {figures['errors']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency-ms", type=float, default=20, help="mock WordPress latency")
+    parser.add_argument("--jitter-ms", type=float, default=5)
+    parser.add_argument("--error-rate", type=float, default=0.05, help="5xx share in the errors scenario")
+    parser.add_argument("--rate-limit", type=float, default=20, help="requests/s in the throttled scenario")
+    parser.add_argument("--files", type=int, default=2000, help="articles in the listed directory")
+    parser.add_argument("--articles", type=int, default=100, help="articles per publish job")
+    parser.add_argument("--image-kb", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20, help="requests per latency scenario")
+    parser.add_argument("--compare", type=Path, help="result file to compare with (default: latest)")
+    parser.add_argument("--ignore-config", action="store_true",
+                        help="compare with a run made with different options")
+    parser.add_argument("--no-save", action="store_true", help="do not store this run")
+    parser.add_argument("--fail-above", type=float, default=None,
+                        help="exit 1 if any figure got slower by more than this ratio (e.g. 0.25)")
+    args = parser.parse_args()
+
+    site = MockWordPress(args.latency_ms / 1000, args.jitter_ms / 1000)
+    site.start()
+    with tempfile.TemporaryDirectory() as storage:
+        # main reads these at import time
+        os.environ['STORAGE_DIR'] = str(Path(storage) / "storage")
+        os.environ['ARTICLES_DIR'] = str(Path(storage) / "articles")
+        try:
+            results = asyncio.run(run_suite(args, site, Path(storage)))
+        finally:
+            site.stop()
+
+    run = {
+        'version': git_version(),
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': {key: value for key, value in vars(args).items()
+                   if key not in ('compare', 'ignore_config', 'no_save', 'fail_above')},
+        'mock': site.stats,
+        'scenarios': results,
+    }
+    report(results)
+
+    saved = None
+    if not args.no_save:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        saved = RESULTS_DIR / f"{stamp}-{run['version']}.json"
+        saved.write_text(json.dumps(run, indent=2), encoding='utf-8')
+        print(f"\nsaved {saved.relative_to(ROOT)}")
+
+    baseline = args.compare or previous_result(saved, run['config'])
+    if baseline is None:
+        print("\nno earlier run with the same options to compare with")
+    else:
+        worst = compare(json.loads(baseline.read_text(encoding='utf-8')), run, args.ignore_config)
+        if worst is None:
+            if args.fail_above is not None:
+                print("\ncannot check the --fail-above budget against that run")
+                sys.exit(2)
+        elif args.fail_above is not None and worst > args.fail_above:
+            print(f"\nregression: {worst:+.0%} above the {args.fail_above:.0%} budget")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""
+Load test of the API: how many users and publish jobs one instance handles.
+
+Virtual users run scenarios (browse files, preview articles, open the
+taxonomy modal, publish batches) started at a fixed --rate per second for
+--duration seconds, whatever the app's latency (an open model, so a slow
+app builds up concurrency as real traffic would). Requests go straight
+through the ASGI app (--mode asgi) or over a local socket to the backend
+served by server_launcher.EmbeddedServer (--mode socket); WordPress is
+the local mock site from mock_wordpress.py, so no network is needed.
+
+Reported per request: count, error rate and p50/p95/p99 latency, plus the
+event-loop lag of the loop serving the app (how late a 10 ms timer fires),
+which shows when handlers block every other user.
+
+In asgi mode a publish request only returns once its background job has
+finished (httpx runs the whole ASGI call); use socket mode to measure
+the request alone.
+
+Extra scenarios can be scripted in a Python file passed with --scenarios;
+it defines SCENARIOS = {name: async function(user)}:
+
+    async def search_and_preview(user):
+        found = await user.get("/api/files/search", name="search", params={'q': 'word5'})
+        for hit in found.json()['results'][:3]:
+            await user.get(f"/api/articles/parse/{hit['path']}", name="preview")
+
+    SCENARIOS = {'search_and_preview': search_and_preview}
+
+    python benchmarks/load_test.py [--mode asgi|socket] [--rate 20] [--duration 30]
+        [--mix browse=4,preview=3,taxonomy=2,publish=1] [--scenarios FILE] [--json FILE]
+"""
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import importlib.util
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "backend"), str(Path(__file__).resolve().parent)]
+
+import httpx  # noqa: E402
+
+from mock_wordpress import MockWordPress  # noqa: E402
+
+PROFILE = 'bench'
+LAG_INTERVAL = 0.01  # seconds between event-loop lag probes
+
+
+class LoadContext:
+    """What scenarios can use: the article files, the profile and a seeded random"""
+
+    def __init__(self, articles_dir: Path, site_url: str, batch_size: int, seed: int):
+        self.articles_dir = articles_dir
+        self.site_url = site_url
+        self.files = sorted(str(path) for path in articles_dir.glob("*.md"))
+        self.profile = PROFILE
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+
+
+class Recorder:
+    """Latencies and errors per request name"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def add(self, name: str, seconds: float, ok: bool):
+        self.latencies.setdefault(name, []).append(seconds)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self) -> Dict[str, Dict]:
+        rows = {name: stats(values, self.errors.get(name, 0)) for name, values in self.latencies.items()}
+        everything = [value for values in self.latencies.values() for value in values]
+        rows['all'] = stats(everything, sum(self.errors.values()))
+        return rows
+
+
+def stats(values: List[float], errors: int = 0) -> Dict:
+    from item_trace import percentile
+
+    values = sorted(values)
+    return {
+        'count': len(values),
+        'error_rate': round(errors / len(values), 4) if values else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 2),
+        'p95_ms': round(percentile(values, 95) * 1000, 2),
+        'p99_ms': round(percentile(values, 99) * 1000, 2),
+        'max_ms': round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+class VirtualUser:
+    """One browser: its own client (and session cookie) against the app"""
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, context: LoadContext):
+        self.client = client
+        self.recorder = recorder
+        self.context = context
+
+    async def request(self, method: str, path: str, name: Optional[str] = None, **kwargs) -> httpx.Response:
+        """Send a request, recorded under name (default: method and path)"""
+        name = name or f"{method} {path}"
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.add(name, time.perf_counter() - started, False)
+            raise
+        self.recorder.add(name, time.perf_counter() - started, response.status_code < 400)
+        return response
+
+    async def get(self, path: str, name: Optional[str] = None, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, name, **kwargs)
+
+    async def post(self, path: str, name: Optional[str] = None, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, name, **kwargs)
+
+    async def setup(self):
+        """Point the user's session at the articles directory and the profile"""
+        await self.post("/api/articles/directory", name="setup",
+                        json={'directory': str(self.context.articles_dir)})
+        await self.post(f"/api/profiles/{self.context.profile}/select", name="setup")
+
+
+# Scenarios
+
+async def browse(user: VirtualUser):
+    await user.get("/api/files")
+    await user.get("/api/files/search", name="GET /api/files/search",
+                   params={'q': f"word{user.context.random.randrange(97)}"})
+
+
+async def preview(user: VirtualUser):
+    path = user.context.random.choice(user.context.files)
+    await user.get(f"/api/articles/parse/{path}", name="GET /api/articles/parse/{file_path}")
+
+
+async def taxonomy(user: VirtualUser):
+    await asyncio.gather(user.get("/api/wordpress/categories"), user.get("/api/wordpress/tags"))
+
+
+async def publish(user: VirtualUser):
+    context = user.context
+    files = context.random.sample(context.files, min(context.batch_size, len(context.files)))
+    articles = [{'file_path': path, 'status': 'publish'} for path in files]
+    response = await user.post(f"/api/publish/batch/{context.profile}",
+                               name="POST /api/publish/batch/{profile_name}",
+                               data={'articles': json.dumps(articles)})
+    if response.status_code >= 400:
+        return
+    task_id = response.json()['task_id']
+    while True:
+        status = await user.get(f"/api/publish/status/{task_id}", name="GET /api/publish/status/{task_id}")
+        if status.status_code >= 400 or status.json()['status'] not in ('pending', 'running'):
+            return
+        await asyncio.sleep(0.5)
+
+
+SCENARIOS: Dict[str, Callable[[VirtualUser], Awaitable]] = {
+    'browse': browse,
+    'preview': preview,
+    'taxonomy': taxonomy,
+    'publish': publish,
+}
+
+
+def load_scenarios(path: Path) -> Dict[str, Callable]:
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return dict(module.SCENARIOS)
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# Event-loop lag
+
+async def measure_lag(samples: List[float], stop: threading.Event):
+    """Record how much later than asked each short sleep wakes up"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + LAG_INTERVAL
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+# Runner
+
+async def run_load(args, clients: List[httpx.AsyncClient], context: LoadContext,
+                   scenarios: Dict[str, Callable], mix: Dict[str, float],
+                   server_loop: Optional[asyncio.AbstractEventLoop]) -> Dict:
+    recorder = Recorder()
+    response = await clients[0].post("/api/profiles", json={
+        'name': context.profile, 'url': context.site_url, 'username': 'bench', 'app_password': 'bench'})
+    response.raise_for_status()
+    users = [VirtualUser(client, recorder, context) for client in clients]
+    await asyncio.gather(*(user.setup() for user in users))
+    recorder.latencies.pop("setup", None)
+    recorder.errors.pop("setup", None)
+
+    lag: List[float] = []
+    stop = threading.Event()
+    if server_loop is None:
+        probe = asyncio.ensure_future(measure_lag(lag, stop))
+    else:
+        probe = asyncio.wrap_future(asyncio.run_coroutine_threadsafe(measure_lag(lag, stop), server_loop))
+
+    names, weights = list(mix), list(mix.values())
+    picker = random.Random(args.seed)
+    user_cycle = itertools.cycle(users)
+    running = set()
+    started_counts: Dict[str, int] = {}
+    failures: Dict[str, int] = {}
+    dropped = 0
+
+    async def run_one(name: str, user: VirtualUser):
+        try:
+            await scenarios[name](user)
+        except Exception as e:
+            failures[f"{name}: {type(e).__name__}"] = failures.get(f"{name}: {type(e).__name__}", 0) + 1
+
+    interval = 1 / args.rate
+    started = time.perf_counter()
+    for tick in range(int(args.duration * args.rate)):
+        delay = started + tick * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(running) >= args.max_concurrency:
+            dropped += 1
+            continue
+        name = picker.choices(names, weights)[0]
+        started_counts[name] = started_counts.get(name, 0) + 1
+        task = asyncio.ensure_future(run_one(name, next(user_cycle)))
+        running.add(task)
+        task.add_done_callback(running.discard)
+    offered = time.perf_counter() - started
+    if running:
+        await asyncio.wait(running, timeout=args.drain)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    summary = recorder.summary()
+    return {
+        'mode': args.mode,
+        'target_rate': args.rate,
+        'achieved_rate': round(sum(started_counts.values()) / offered, 2) if offered else 0.0,
+        'duration': round(elapsed, 2),
+        'requests_per_second': round(summary['all']['count'] / elapsed, 1) if elapsed else 0.0,
+        'scenarios': started_counts,
+        'dropped': dropped,
+        'unfinished': len(running),
+        'failures': failures,
+        'requests': summary,
+        'loop_lag': {key: value for key, value in stats(lag).items() if key != 'error_rate'},
+    }
+
+
+def report(result: Dict):
+    print(f"\n{result['mode']} mode: {sum(result['scenarios'].values())} scenarios at "
+          f"{result['achieved_rate']}/s (target {result['target_rate']}/s), "
+          f"{result['requests_per_second']} requests/s over {result['duration']} s")
+    print(f"scenarios: {result['scenarios']}, dropped {result['dropped']}, unfinished {result['unfinished']}")
+    if result['failures']:
+        print(f"failures: {result['failures']}")
+    print(f"\n{'request':<44} {'count':>6} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, row in result['requests'].items():
+        print(f"{name:<44} {row['count']:>6} {row['error_rate']:>7.1%} {row['p50_ms']:>9} "
+              f"{row['p95_ms']:>9} {row['p99_ms']:>9} {row['max_ms']:>9}")
+    lag = result['loop_lag']
+    print(f"\nevent-loop lag: p50 {lag['p50_ms']} ms, p95 {lag['p95_ms']} ms, "
+          f"p99 {lag['p99_ms']} ms, max {lag['max_ms']} ms over {lag['count']} probes")
+
+
+async def run_asgi(args, context, scenarios, mix) -> Dict:
+    import main
+    from wordpress_api_async import close_shared_session
+
+    logging.getLogger().setLevel(logging.WARNING)
+    transport = httpx.ASGITransport(app=main.app)
+    clients = [httpx.AsyncClient(transport=transport, base_url="http://load", timeout=args.timeout)
+               for _ in range(args.users)]
+    try:
+        return await run_load(args, clients, context, scenarios, mix, None)
+    finally:
+        await asyncio.gather(*(client.aclose() for client in clients))
+        await close_shared_session()
+
+
+async def run_socket(args, context, scenarios, mix, server) -> Dict:
+    limits = httpx.Limits(max_connections=args.max_concurrency)
+    clients = [httpx.AsyncClient(base_url=server.url, timeout=args.timeout, limits=limits)
+               for _ in range(args.users)]
+    try:
+        return await run_load(args, clients, context, scenarios, mix, server.loop)
+    finally:
+        await asyncio.gather(*(client.aclose() for client in clients))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mode", choices=("asgi", "socket"), default="asgi")
+    parser.add_argument("--rate", type=float, default=20, help="scenarios started per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--drain", type=float, default=120, help="seconds to wait for running scenarios")
+    parser.add_argument("--users", type=int, default=20, help="virtual users (sessions)")
+    parser.add_argument("--max-concurrency", type=int, default=200,
+                        help="scenarios in flight before new arrivals are dropped")
+    parser.add_argument("--mix", default="browse=4,preview=3,taxonomy=2,publish=1",
+                        help="scenario weights, name=weight,...")
+    parser.add_argument("--scenarios", type=Path, help="Python file defining extra SCENARIOS")
+    parser.add_argument("--files", type=int, default=500, help="articles in the directory")
+    parser.add_argument("--batch-size", type=int, default=10, help="articles per publish scenario")
+    parser.add_argument("--latency-ms", type=float, default=30, help="mock WordPress latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="mock WordPress 5xx share")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", type=Path, help="also write the result to this file")
+    args = parser.parse_args()
+
+    scenarios = dict(SCENARIOS)
+    if args.scenarios:
+        scenarios.update(load_scenarios(args.scenarios))
+    mix = parse_mix(args.mix)
+    unknown = set(mix) - set(scenarios)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))} (known: {', '.join(scenarios)})")
+
+    site = MockWordPress(args.latency_ms / 1000, args.latency_ms / 4000, args.error_rate)
+    site.start()
+    server = None
+    with tempfile.TemporaryDirectory() as storage:
+        storage = Path(storage)
+        articles_dir = storage / "articles"
+        articles_dir.mkdir()
+        body = " ".join(f"word{i % 97}" for i in range(600))
+        for i in range(args.files):
+            (articles_dir / f"article-{i:05d}.md").write_text(f"# Article {i}\n\n{body}\n", encoding='utf-8')
+        # main reads these at import time
+        os.environ['STORAGE_DIR'] = str(storage / "storage")
+        os.environ['ARTICLES_DIR'] = str(articles_dir)
+        context = LoadContext(articles_dir, site.url, args.batch_size, args.seed)
+        try:
+            if args.mode == "socket":
+                from server_launcher import EmbeddedServer
+                server = EmbeddedServer(log_level="warning")
+                server.start()
+                result = asyncio.run(run_socket(args, context, scenarios, mix, server))
+            else:
+                result = asyncio.run(run_asgi(args, context, scenarios, mix))
+        finally:
+            if server:
+                server.stop()
+            site.stop()
+
+    result['mock'] = site.stats
+    report(result)
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2), encoding='utf-8')
+
+
+if __name__ == "__main__":
+    main()
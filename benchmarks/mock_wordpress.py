@@ -0,0 +1,282 @@
+"""
+Local stand-in for the WordPress REST API, for benchmarks and load tests.
+
+Implements the routes the backend calls (posts, media, categories, tags,
+users/me, the REST root and the /batch/v1 route) with WordPress'
+pagination (page/per_page, X-WP-Total and X-WP-TotalPages headers, 400
+past the last page). Latency, random server errors and 429 throttling
+with Retry-After are configurable. It runs on its own event loop in a
+background thread, so it does not add lag to the app being measured.
+
+    from mock_wordpress import MockWordPress
+    site = MockWordPress(latency=0.05, error_rate=0.02, rate_limit=200)
+    url = site.start()
+    ...
+    site.stop()
+
+Or standalone: python benchmarks/mock_wordpress.py --port 8089 --latency-ms 50
+"""
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import math
+import random
+import socket
+import threading
+import time
+
+from aiohttp import web
+
+BATCH_MAX_REQUESTS = 25
+
+
+class MockWordPress:
+    """Configurable fake WordPress site.
+
+    latency and jitter are seconds added to every request; error_rate is
+    the share of requests answered with a 500/502/503; rate_limit is the
+    requests per second allowed before answering 429 (a token bucket
+    holding burst requests, one second's worth by default); batch=False
+    makes /batch/v1 answer 404 like a site older than 5.6.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit: Optional[float] = None, burst: Optional[float] = None,
+                 categories: int = 40, tags: int = 400, batch: bool = True, seed: int = 1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.batch = batch
+        self.random = random.Random(seed)
+        self.posts: List[Dict] = []
+        self.media: List[Dict] = []
+        self.terms = {
+            'categories': [self._term(i, 'category') for i in range(1, categories + 1)],
+            'tags': [self._term(i, 'post_tag') for i in range(1, tags + 1)],
+        }
+        self.stats: Dict[str, int] = {}
+        self._tokens = burst or rate_limit or 0.0
+        self._refilled = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+        self.url: Optional[str] = None
+
+    @staticmethod
+    def _term(term_id: int, taxonomy: str) -> Dict:
+        return {'id': term_id, 'count': term_id % 17, 'description': '', 'name': f"Term {term_id}",
+                'slug': f"term-{term_id}", 'taxonomy': taxonomy, 'parent': 0, 'meta': [],
+                'link': f"http://mock.local/{taxonomy}/term-{term_id}/"}
+
+    def _count(self, key: str):
+        self.stats[key] = self.stats.get(key, 0) + 1
+
+    # Middleware: latency, throttling and injected errors
+
+    def _take_token(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self.burst or self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+        self._refilled = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    @web.middleware
+    async def _conditions(self, request: web.Request, handler):
+        self._count('requests')
+        if self.rate_limit and not self._take_token():
+            self._count('throttled')
+            retry_after = max(1, math.ceil(1 / self.rate_limit))
+            return web.json_response({'code': 'rest_too_many_requests'}, status=429,
+                                     headers={'Retry-After': str(retry_after)})
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self._count('errors')
+            return web.json_response({'code': 'internal_server_error'},
+                                     status=self.random.choice((500, 502, 503)))
+        return await handler(request)
+
+    # Helpers
+
+    @staticmethod
+    def _fields(items: List[Dict], request: web.Request) -> List[Dict]:
+        fields = request.query.get('_fields')
+        if not fields:
+            return items
+        wanted = fields.split(',')
+        return [{key: item[key] for key in wanted if key in item} for item in items]
+
+    def _paginate(self, items: List[Dict], request: web.Request) -> web.Response:
+        try:
+            per_page = min(100, max(1, int(request.query.get('per_page', 10))))
+            page = max(1, int(request.query.get('page', 1)))
+        except ValueError:
+            return web.json_response({'code': 'rest_invalid_param'}, status=400)
+        total_pages = max(1, math.ceil(len(items) / per_page))
+        if page > total_pages:
+            return web.json_response({'code': 'rest_post_invalid_page_number'}, status=400)
+        chunk = items[(page - 1) * per_page:page * per_page]
+        return web.json_response(self._fields(chunk, request), headers={
+            'X-WP-Total': str(len(items)), 'X-WP-TotalPages': str(total_pages)
+        })
+
+    def _create_post(self, data: Dict) -> Dict:
+        post_id = len(self.posts) + 1
+        title = data.get('title', '')
+        post = {
+            'id': post_id,
+            'link': f"http://mock.local/?p={post_id}",
+            'status': data.get('status', 'publish'),
+            'title': {'rendered': title if isinstance(title, str) else title.get('raw', '')},
+            'content': {'rendered': data.get('content', '')},
+            'categories': data.get('categories', []),
+            'tags': data.get('tags', []),
+            'featured_media': data.get('featured_media', 0),
+            'date_gmt': data.get('date_gmt'),
+        }
+        self.posts.append(post)
+        self._count('posts_created')
+        return post
+
+    # Routes
+
+    async def _root(self, request):
+        return web.json_response({'name': 'Mock WordPress', 'namespaces': ['wp/v2', 'batch/v1']})
+
+    async def _me(self, request):
+        return web.json_response({'id': 1, 'name': 'bench'})
+
+    async def _list_posts(self, request):
+        search = request.query.get('search')
+        posts = self.posts
+        if search:
+            posts = [p for p in posts if search in p['title']['rendered'] or search in p['content']['rendered']]
+        return self._paginate(posts, request)
+
+    async def _new_post(self, request):
+        return web.json_response(self._create_post(await request.json()), status=201)
+
+    async def _upload_media(self, request):
+        data = await request.read()
+        media_id = 1000 + len(self.media) + 1
+        self.media.append({'id': media_id, 'media_type': 'image',
+                           'mime_type': request.headers.get('Content-Type', 'image/jpeg'),
+                           'size': len(data)})
+        self._count('media_uploaded')
+        return web.json_response({'id': media_id, 'source_url': f"http://mock.local/media/{media_id}"},
+                                 status=201)
+
+    async def _list_media(self, request):
+        include = {int(i) for i in request.query.get('include', '').split(',') if i.strip().isdigit()}
+        media = [m for m in self.media if not include or m['id'] in include]
+        return self._paginate(media, request)
+
+    def _taxonomy(self, taxonomy: str):
+        async def list_terms(request):
+            return self._paginate(self.terms[taxonomy], request)
+
+        async def create_term(request):
+            data = await request.json()
+            terms = self.terms[taxonomy]
+            term = self._term(len(terms) + 1, 'category' if taxonomy == 'categories' else 'post_tag')
+            term['name'] = data.get('name', term['name'])
+            terms.append(term)
+            return web.json_response(term, status=201)
+        return list_terms, create_term
+
+    async def _batch(self, request):
+        if not self.batch:
+            return web.json_response({'code': 'rest_no_route'}, status=404)
+        data = await request.json()
+        requests = data.get('requests', [])
+        if len(requests) > BATCH_MAX_REQUESTS:
+            return web.json_response({'code': 'rest_batch_max_requests_exceeded'}, status=400)
+        self._count('batches')
+        responses = []
+        for sub_request in requests:
+            if sub_request.get('path') == '/wp/v2/posts' and sub_request.get('method', 'POST') == 'POST':
+                responses.append({'status': 201, 'body': self._create_post(sub_request.get('body', {})),
+                                  'headers': {}})
+            else:
+                responses.append({'status': 404, 'body': {'code': 'rest_no_route'}, 'headers': {}})
+        return web.json_response({'responses': responses}, status=207)
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=200 * 1024 * 1024, middlewares=[self._conditions])
+        app.router.add_get('/wp-json/', self._root)
+        app.router.add_post('/wp-json/batch/v1', self._batch)
+        app.router.add_get('/wp-json/wp/v2/users/me', self._me)
+        app.router.add_get('/wp-json/wp/v2/posts', self._list_posts)
+        app.router.add_post('/wp-json/wp/v2/posts', self._new_post)
+        app.router.add_get('/wp-json/wp/v2/media', self._list_media)
+        app.router.add_post('/wp-json/wp/v2/media', self._upload_media)
+        for taxonomy in ('categories', 'tags'):
+            list_terms, create_term = self._taxonomy(taxonomy)
+            app.router.add_get(f'/wp-json/wp/v2/{taxonomy}', list_terms)
+            app.router.add_post(f'/wp-json/wp/v2/{taxonomy}', create_term)
+        return app
+
+    # Lifecycle
+
+    def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Serve from a background thread; returns the site URL"""
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        self.url = f"http://{host}:{sock.getsockname()[1]}"
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._runner = web.AppRunner(self.make_app(), access_log=None)
+            self._loop.run_until_complete(self._runner.setup())
+            self._loop.run_until_complete(web.SockSite(self._runner, sock).start())
+            ready.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self._runner.cleanup())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="mock-wordpress", daemon=True)
+        self._thread.start()
+        if not ready.wait(10):
+            raise RuntimeError("Mock WordPress did not start")
+        return self.url
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(10)
+            self._loop = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a mock WordPress REST API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--rate-limit", type=float, default=None, help="requests per second before 429")
+    parser.add_argument("--burst", type=float, default=None, help="requests allowed at once")
+    parser.add_argument("--no-batch", action="store_true", help="answer 404 on /batch/v1")
+    args = parser.parse_args()
+
+    site = MockWordPress(args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate,
+                         args.rate_limit, args.burst, batch=not args.no_batch)
+    print(f"Mock WordPress at {site.start(args.host, args.port)} (Ctrl+C to stop)", flush=True)
+    try:
+        while True:
+            time.sleep(60)
+            print(json.dumps(site.stats), flush=True)
+    except KeyboardInterrupt:
+        site.stop()
+
+
+if __name__ == "__main__":
+    main()
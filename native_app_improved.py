@@ -1,126 +1,49 @@
 #!/usr/bin/env python3
 """
 WordPress Publisher - Improved Native macOS Application
-Separates server and webview to prevent threading issues
+Serves the backend on a pre-bound socket and opens the window once it is ready
 """
 import webview
-import threading
-import subprocess
 import sys
 import os
-import time
 import signal
-import psutil
-import socket
 from pathlib import Path
 import atexit
 
+from server_launcher import EmbeddedServer
+
 class WordPressPublisherApp:
     def __init__(self):
-        self.server_process = None
-        self.server_port = 8001
-        self.max_retries = 30
-        self.backend_dir = Path(__file__).parent / "backend"
+        self.server = None
+        self.server_port = None
+        self.startup_timeout = 30
+        # The server runs in a thread of this process; set WPP_SERVER_PROCESS=1
+        # to serve from a child process instead
+        self.in_process = os.environ.get("WPP_SERVER_PROCESS") != "1"
         
-    def find_free_port(self):
-        """Find a free port to avoid conflicts"""
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.bind(('', 0))
-            s.listen(1)
-            port = s.getsockname()[1]
-        return port
-    
-    def is_server_running(self):
-        """Check if server is responding"""
-        try:
-            import urllib.request
-            response = urllib.request.urlopen(f"http://127.0.0.1:{self.server_port}/api/health", timeout=2)
-            return response.status == 200
-        except:
-            return False
-    
     def start_server_process(self):
-        """Start FastAPI server as separate process"""
+        """Start the FastAPI server on a pre-bound socket and wait until it serves"""
         try:
-            # Find a free port
-            self.server_port = self.find_free_port()
-            
-            print(f"🚀 Starting server on port {self.server_port}...")
-            
-            # Prepare server command
-            python_exe = sys.executable
-            server_script = self.backend_dir / "main.py"
-            
-            # Create startup script
-            startup_code = f'''
-import sys
-import os
-from pathlib import Path
+            print("🚀 Starting server...")
+            self.server = EmbeddedServer(in_process=self.in_process)
+            elapsed = self.server.start(timeout=self.startup_timeout)
+            self.server_port = self.server.port
+            print(f"✅ Server ready on port {self.server_port} in {elapsed:.2f}s")
+            return True
 
-# Add backend to path
-backend_dir = Path(__file__).parent
-sys.path.insert(0, str(backend_dir))
-os.chdir(backend_dir)
-
-# Start server
-import uvicorn
-uvicorn.run(
-    "main:app",
-    host="127.0.0.1",
-    port={self.server_port},
-    log_level="error",
-    access_log=False
-)
-'''
-            
-            # Write temporary server launcher
-            temp_server = self.backend_dir / "temp_server.py"
-            with open(temp_server, 'w') as f:
-                f.write(startup_code)
-            
-            # Start server process
-            self.server_process = subprocess.Popen(
-                [python_exe, str(temp_server)],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                preexec_fn=os.setsid  # Create new process group
-            )
-            
-            # Wait for server to start
-            print("⏳ Waiting for server to start...")
-            for attempt in range(self.max_retries):
-                if self.is_server_running():
-                    print("✅ Server started successfully!")
-                    return True
-                time.sleep(0.5)
-            
-            print("❌ Server failed to start")
-            return False
-            
         except Exception as e:
             print(f"❌ Error starting server: {e}")
+            self.server = None
             return False
     
     def stop_server_process(self):
-        """Stop the server process cleanly"""
-        if self.server_process:
+        """Stop the server cleanly"""
+        if self.server:
             try:
-                # Terminate the entire process group
-                os.killpg(os.getpgid(self.server_process.pid), signal.SIGTERM)
-                self.server_process.wait(timeout=5)
-            except:
-                try:
-                    # Force kill if needed
-                    os.killpg(os.getpgid(self.server_process.pid), signal.SIGKILL)
-                except:
-                    pass
-            
-            self.server_process = None
-            
-        # Clean up temp file
-        temp_file = self.backend_dir / "temp_server.py"
-        if temp_file.exists():
-            temp_file.unlink()
+                self.server.stop()
+            except Exception as e:
+                print(f"Error stopping server: {e}")
+            self.server = None
     
     def create_webview_api(self):
         """Create API functions for webview"""
@@ -206,7 +129,7 @@ uvicorn.run(
         # Register cleanup function
         atexit.register(self.stop_server_process)
         
-        # Start server in separate process
+        # Start server before opening the window
         if not self.start_server_process():
             print("❌ Failed to start server. Exiting.")
             return
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Embedded server launcher for the native app and for startup measurements
+
+The listening socket is bound before the backend is imported, so the URL
+is known immediately, and uvicorn signals readiness once the application
+has finished its startup: no HTTP polling is needed to know it is serving.
+"""
+import asyncio
+import multiprocessing
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import uvicorn
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+
+
+def bind_socket(host: str = "127.0.0.1", port: int = 0) -> socket.socket:
+    """Listening socket on host:port (a free port when port is 0)"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class _ReadyServer(uvicorn.Server):
+    """uvicorn server that calls on_ready once its startup has completed"""
+
+    def __init__(self, config: uvicorn.Config, on_ready):
+        super().__init__(config)
+        self.on_ready = on_ready
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def startup(self, sockets=None):
+        self.loop = asyncio.get_running_loop()
+        await super().startup(sockets=sockets)
+        if self.started:
+            self.on_ready()
+
+
+def _load_app():
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    from main import app
+    return app
+
+
+def _make_server(log_level: str, on_ready) -> _ReadyServer:
+    config = uvicorn.Config(_load_app(), log_level=log_level, access_log=False, lifespan="on")
+    return _ReadyServer(config, on_ready)
+
+
+def _serve_child(sock: socket.socket, ready_conn, log_level: str):
+    """Entry point of the pre-forked server process"""
+    server = _make_server(log_level, lambda: ready_conn.send(True))
+    try:
+        server.run(sockets=[sock])
+    finally:
+        ready_conn.close()
+
+
+class EmbeddedServer:
+    """The backend served on a pre-bound socket, in a thread or a child process.
+
+    start() returns once the app accepts requests (or raises if its startup
+    failed or took longer than timeout); the thread mode keeps a single
+    interpreter, the process mode keeps the server off the GUI process.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 in_process: bool = True, log_level: str = "error"):
+        self.host = host
+        self.port = port
+        self.in_process = in_process
+        self.log_level = log_level
+        self.startup_time: Optional[float] = None
+        self._sock: Optional[socket.socket] = None
+        self._server: Optional[_ReadyServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._process: Optional[multiprocessing.Process] = None
+        self._error: Optional[BaseException] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        """Event loop serving the app in thread mode (None in process mode)"""
+        return self._server.loop if self._server is not None else None
+
+    def start(self, timeout: float = 30) -> float:
+        """Start serving; returns the seconds it took to be ready"""
+        started = time.perf_counter()
+        self._sock = bind_socket(self.host, self.port)
+        self.port = self._sock.getsockname()[1]
+        if self.in_process:
+            self._start_thread(timeout)
+        else:
+            self._start_process(timeout)
+        self.startup_time = time.perf_counter() - started
+        return self.startup_time
+
+    def _start_thread(self, timeout: float):
+        ready = threading.Event()
+
+        def run():
+            try:
+                self._server = _make_server(self.log_level, ready.set)
+                self._server.run(sockets=[self._sock])
+            except BaseException as e:  # startup failures raise SystemExit
+                self._error = e
+            finally:
+                ready.set()
+
+        self._thread = threading.Thread(target=run, name="embedded-server", daemon=True)
+        self._thread.start()
+        ready.wait(timeout)
+        if not (self._server and self._server.started):
+            self.stop()
+            raise RuntimeError(f"Server did not start: {self._error or 'timed out'}")
+
+    def _start_process(self, timeout: float):
+        parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(
+            target=_serve_child, args=(self._sock, child_conn, self.log_level),
+            name="embedded-server", daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+        try:
+            ready = parent_conn.poll(timeout) and parent_conn.recv()
+        except EOFError:  # the child exited before its startup completed
+            ready = False
+        finally:
+            parent_conn.close()
+        if not ready:
+            self.stop()
+            raise RuntimeError("Server did not start: " +
+                               ("timed out" if self._process is None or self._process.exitcode is None
+                                else f"exit code {self._process.exitcode}"))
+
+    def stop(self, timeout: float = 5):
+        """Shut down gracefully (running the app's shutdown), then close the socket"""
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.kill()
+                self._process.join()
+            self._process = None
+        self._server = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+def main():
+    """Headless start: print the startup time and serve until interrupted"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Start the WordPress Publisher backend")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--process", action="store_true", help="serve from a child process")
+    parser.add_argument("--exit-when-ready", action="store_true",
+                        help="stop as soon as the server is ready (for startup measurements)")
+    args = parser.parse_args()
+
+    server = EmbeddedServer(args.host, args.port, in_process=not args.process)
+    elapsed = server.start()
+    print(f"ready {server.url} {elapsed * 1000:.1f} ms", flush=True)
+    if args.exit_when_ready:
+        server.stop()
+        return
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
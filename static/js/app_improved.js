@@ -22,6 +22,8 @@ class WordPressPublisherImproved {
         
         // Request queue to prevent flooding
         this.requestQueue = new Map();
+        this.loginPromise = null;
+        this.loginDeclined = false;
         
         this.init();
     }
@@ -99,7 +101,7 @@ class WordPressPublisherImproved {
                     options.body = JSON.stringify(data);
                 }
 
-                const response = await fetch(`/api${endpoint}`, options);
+                const response = await this.fetchApi(`/api${endpoint}`, options);
                 clearTimeout(timeoutId);
                 
                 if (!response.ok) {
@@ -127,6 +129,40 @@ class WordPressPublisherImproved {
         }
     }
 
+    async fetchApi(url, options) {
+        // A deployment guarded by WPP_API_TOKEN answers 401 until we log in
+        let response = await fetch(url, options);
+        if (response.status === 401 && await this.login()) {
+            response = await fetch(url, options);
+        }
+        return response;
+    }
+
+    login() {
+        // One prompt for all the requests that got a 401 at the same time
+        if (this.loginDeclined) {
+            return Promise.resolve(false);
+        }
+        if (!this.loginPromise) {
+            this.loginPromise = (async () => {
+                const token = window.prompt('Introduce el token de acceso de este despliegue (WPP_API_TOKEN):');
+                if (!token) {
+                    this.loginDeclined = true; // don't ask again on every retry
+                    return false;
+                }
+                const response = await fetch('/api/login', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ token })
+                });
+                return response.ok;
+            })().finally(() => {
+                this.loginPromise = null;
+            });
+        }
+        return this.loginPromise;
+    }
+
     async retryRequest(requestFn, retries) {
         let lastError;
         
@@ -166,7 +202,7 @@ class WordPressPublisherImproved {
                 const formData = new FormData();
                 formData.append('file', file);
 
-                const response = await fetch(`/api${endpoint}`, {
+                const response = await this.fetchApi(`/api${endpoint}`, {
                     method: 'POST',
                     body: formData,
                     signal: controller.signal
@@ -409,56 +445,53 @@ class WordPressPublisherImproved {
         try {
             this.showLoading('Publicando artículos...');
             
-            const results = [];
-            let completed = 0;
-            
-            for (const article of selectedArticles) {
-                try {
-                    this.updateStatus(`Publicando ${completed + 1}/${selectedArticles.length}: ${article.name}`);
-                    
-                    // Upload featured image if exists
-                    let featuredMediaId = null;
-                    if (article.featured_image) {
-                        const imageResult = await this.uploadFile(article.featured_image, `/upload-image/${this.selectedProfileName}`);
-                        featuredMediaId = imageResult.media_id;
-                    }
-
-                    // Use individual categories/tags if set, otherwise use global ones
-                    const categories = article.categories.length > 0 ? article.categories : this.selectedCategories;
-                    const tags = article.tags.length > 0 ? article.tags : this.selectedTags;
-                    
-                    // Publish article
-                    const publishData = {
-                        file_path: article.path,
-                        status: article.status,
-                        categories: categories,
-                        tags: tags,
-                        featured_media: featuredMediaId
-                    };
-
-                    const result = await this.apiCall(`/publish/${this.selectedProfileName}`, 'POST', publishData);
-                    results.push({
-                        filename: article.name,
-                        success: true,
-                        url: result.url,
-                        status: article.status
-                    });
-                    
-                    completed++;
-                    
-                } catch (error) {
-                    results.push({
-                        filename: article.name,
-                        success: false,
-                        error: error.message
-                    });
-                    completed++;
+            // One request for the whole batch; images travel as form fields
+            const formData = new FormData();
+            const articles = selectedArticles.map((article, index) => {
+                // Use individual categories/tags if set, otherwise use global ones
+                const categories = article.categories.length > 0 ? article.categories : this.selectedCategories;
+                const tags = article.tags.length > 0 ? article.tags : this.selectedTags;
+                const entry = {
+                    file_path: article.path,
+                    status: article.status,
+                    categories: categories,
+                    tags: tags
+                };
+                if (article.featured_image) {
+                    entry.image = `image_${index}`;
+                    formData.append(entry.image, article.featured_image);
                 }
+                return entry;
+            });
+            formData.append('articles', JSON.stringify(articles));
+
+            const response = await this.fetchApi(`/api/publish/batch/${encodeURIComponent(this.selectedProfileName)}`, {
+                method: 'POST',
+                body: formData
+            });
+            if (!response.ok) {
+                const errorData = await response.json();
+                throw new Error(errorData.detail || `HTTP ${response.status}`);
             }
+            const { task_id } = await response.json();
+
+            await this.followPublishJob(task_id, selectedArticles.length);
+            const job = await this.apiCall(`/publish/status/${task_id}`);
+            
+            const byName = new Map(selectedArticles.map(article => [article.name, article]));
+            const results = job.results.map(result => ({
+                filename: result.filename,
+                success: result.success,
+                url: result.url,
+                status: byName.has(result.filename) ? byName.get(result.filename).status : null,
+                error: result.details
+            }));
 
             this.hideLoading();
-            this.updateStatus('🟢 Listo');
-            this.showPublishResults(results);
+            this.updateStatus(job.parked && job.parked.length
+                ? `🟡 ${job.parked.length} en espera de WordPress`
+                : '🟢 Listo');
+            this.showPublishResults(results, job.parked || []);
             
         } catch (error) {
             this.hideLoading();
@@ -467,6 +500,38 @@ class WordPressPublisherImproved {
         }
     }
 
+    followPublishJob(taskId, total) {
+        // Live progress over Server-Sent Events; resolves when the job is done,
+        // or when what is left waits for the site to come back (outbox)
+        return new Promise((resolve) => {
+            const source = new EventSource(`/api/publish/events/${taskId}`);
+            const finish = () => {
+                source.close();
+                resolve();
+            };
+            const showProgress = (data) => {
+                const done = (data.completed || 0) + (data.failed || 0);
+                const rate = data.items_per_minute ? ` • ${data.items_per_minute}/min` : '';
+                this.updateStatus(`Publicando ${done}/${data.total || total}${rate}`);
+            };
+
+            source.addEventListener('snapshot', (e) => showProgress(JSON.parse(e.data)));
+            source.addEventListener('progress', (e) => showProgress(JSON.parse(e.data)));
+            source.addEventListener('item_started', (e) => {
+                const data = JSON.parse(e.data);
+                this.showLoading(`Publicando ${data.file}...`);
+            });
+            source.addEventListener('done', finish);
+            source.addEventListener('waiting', finish);
+            source.onerror = () => {
+                // Fall back to the final status if the stream drops
+                if (source.readyState === EventSource.CLOSED) {
+                    finish();
+                }
+            };
+        });
+    }
+
     // Profile Management - Enhanced
     async loadProfiles() {
         try {
@@ -677,7 +742,7 @@ class WordPressPublisherImproved {
         }
     }
 
-    showPublishResults(results) {
+    showPublishResults(results, parked = []) {
         const modal = document.getElementById('results-modal');
         const content = document.getElementById('results-content');
         
@@ -710,6 +775,18 @@ class WordPressPublisherImproved {
             });
         }
         
+        if (parked.length > 0) {
+            html += '<h3 style="color: #d97706; margin-bottom: 1rem; margin-top: 2rem;">⏸️ En espera (WordPress no responde):</h3>';
+            parked.forEach(filename => {
+                html += `
+                    <div style="padding: 0.75rem; margin-bottom: 0.5rem; background: #fffbeb; border-left: 4px solid #f59e0b; border-radius: 0.5rem;">
+                        <strong>${filename}</strong><br>
+                        <span style="color: #b45309;">Se publicará automáticamente cuando el sitio vuelva a responder</span>
+                    </div>
+                `;
+            });
+        }
+        
         html += '</div>';
         content.innerHTML = html;
         this.showModal('results-modal');